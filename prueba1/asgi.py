@@ -2,6 +2,8 @@
 ASGI config for prueba1 project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with an ASGI server (e.g. ``uvicorn prueba1.asgi:application``) to enable the
+dashboard's live ticket events (usuarios.views.eventos_tickets).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -12,5 +14,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prueba1.settings')
+# Las acciones JSON del dashboard se sirven con sus vistas async (settings.VISTAS_ASYNC)
+os.environ.setdefault('DJANGO_VISTAS_ASYNC', '1')
 
 application = get_asgi_application()
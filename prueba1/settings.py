@@ -49,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'usuarios.middleware.UsuarioActualMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -135,6 +136,75 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Configuración para archivos de media (imágenes)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Media la sirve la vista servir_media (revisa permisos). En producción el servidor web puede
+# mandar los bytes: 'x-accel-redirect' (nginx, con una location `internal` en
+# MEDIA_PREFIJO_INTERNO que apunte a MEDIA_ROOT) o 'x-sendfile' (Apache con mod_xsendfile).
+# None: los manda Django
+MEDIA_ENVIO = None
+MEDIA_PREFIJO_INTERNO = '/media-interno/'
+
+# Eventos en vivo del dashboard (SSE, solo bajo ASGI). 'postgres' reparte entre procesos con
+# LISTEN/NOTIFY; 'local' solo dentro del proceso. None: 'postgres' si la base de datos lo es
+EVENTOS_DIFUSOR = None
+# Segundos entre latidos de una conexión SSE sin eventos
+LATIDO_EVENTOS = 25
+# Acciones JSON del dashboard con vistas async (usuarios/views_async.py). Solo convienen bajo
+# ASGI: prueba1/asgi.py lo activa y con WSGI se quedan las vistas síncronas
+VISTAS_ASYNC = os.environ.get('DJANGO_VISTAS_ASYNC') == '1'
+
+# Autoasignación de tickets nuevos al equipo de su categoría: None (quedan en disponibles),
+# 'turnos' (round-robin), 'menor_carga' (carga abierta ponderada por urgencia), 'experiencia'
+# (carga relativa a los tickets ya cerrados en la categoría) o la ruta de una función propia
+AUTOASIGNACION = None
+
+# Paginación del dashboard por pestaña: 'numeros' (páginas numeradas, usa COUNT + OFFSET)
+# o 'cursor' (Anterior/Siguiente con token opaco, sin COUNT ni OFFSET)
+PAGINACION_DASHBOARD = {
+    'creados': 'numeros',
+    'asignados': 'numeros',
+    'disponibles': 'cursor',
+    'todos': 'cursor',
+}
+# Total mostrado en pestañas con cursor: 'exacto', 'aproximado' (estimación de PostgreSQL
+# cuando no hay filtros activos) o 'ninguno'
+PAGINACION_CONTEO = 'aproximado'
+
+# Caché compartida entre los procesos del servidor (usuario actual y HTML de las pestañas).
+# FileBasedCache sirve para un solo servidor con pocos usuarios: cada set() recorre el
+# directorio para ver si hay que depurar. Con más carga o varios servidores (para que las
+# invalidaciones lleguen a todos) usar Redis (pip install redis):
+#     'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#     'LOCATION': 'redis://127.0.0.1:6379/1',
+#
+# MAX_ENTRIES según las claves que genera cada usuario activo dentro de
+# FRAGMENTOS_DASHBOARD_TIMEOUT: usuario y su versión (2), sellos de creador y asignado (2),
+# contadores (1) y 4 pestañas × ~10 combinaciones de filtros y página (40), unas 45; más
+# ~10 sellos compartidos (categorías y globales). 200 usuarios activos ≈ 9 000 claves.
+# Al llegar al tope se borra al azar 1/CULL_FREQUENCY de las entradas: perder un sello
+# equivale a invalidar su ámbito, nunca a servir HTML viejo.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 12000,
+            'CULL_FREQUENCY': 4,
+        },
+    }
+}
+
+# Segundos que un usuario puede quedarse en caché sin ser invalidado
+USUARIO_ACTUAL_TIMEOUT = 300
+
+# Segundos que el HTML de una pestaña del dashboard puede quedarse en caché; antes de eso
+# se regenera en cuanto cambia un ticket de su ámbito (ver usuarios/fragmentos.py)
+FRAGMENTOS_DASHBOARD_TIMEOUT = 600
+
+# Subidas: cada archivo se valida mientras llega (magic bytes y cabecera con Pillow) y se
+# rechaza sin guardarse si no es imagen o pasa los límites (ver usuarios/subidas.py)
+FILE_UPLOAD_HANDLERS = ['usuarios.subidas.ImagenesSegurasUploadHandler']
+SUBIDAS_MAX_BYTES_ARCHIVO = 10 * 1024 * 1024   # por archivo
+SUBIDAS_MAX_BYTES_PETICION = 40 * 1024 * 1024  # por envío (todas las imágenes juntas)
 
 # AGREGADO: Configuraciones adicionales para desarrollo
 if DEBUG:
@@ -17,37 +17,44 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.conf import settings
-from django.conf.urls.static import static
 from usuarios import views as usuarios_views
+from usuarios import views_async
+
+# Acciones JSON del dashboard: async bajo ASGI, síncronas bajo WSGI (ver usuarios/views_async.py)
+acciones = views_async if getattr(settings, 'VISTAS_ASYNC', False) else usuarios_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', usuarios_views.list_usuarios, name='list_usuarios'),
     path('dashboard/', usuarios_views.dashboard, name='dashboard'),
+    path('dashboard/pestana/<str:pestana>/', usuarios_views.dashboard_pestana, name='dashboard_pestana'),
     path('crear-ticket/', usuarios_views.crear_ticket, name='crear_ticket'),
     path('completar-ticket/<int:ticket_id>/', usuarios_views.completar_ticket, name='completar_ticket'),
     path('ver-reporte/<int:ticket_id>/', usuarios_views.ver_reporte, name='ver_reporte'),
     path('editar-ticket/<int:ticket_id>/', usuarios_views.editar_ticket, name='editar_ticket'),
-    path('eliminar-ticket/<int:ticket_id>/', usuarios_views.eliminar_ticket, name='eliminar_ticket'),
-    path('cambiar-estatus/<int:ticket_id>/', usuarios_views.cambiar_estatus, name='cambiar_estatus'),
+    path('eliminar-ticket/<int:ticket_id>/', acciones.eliminar_ticket, name='eliminar_ticket'),
+    path('cambiar-estatus/<int:ticket_id>/', acciones.cambiar_estatus, name='cambiar_estatus'),
     path('admin-usuarios/', usuarios_views.admin_usuarios, name='admin_usuarios'),
     path('rechazar-usuario/<int:usuario_id>/', usuarios_views.rechazar_usuario, name='rechazar_usuario'),
     path('editar-usuario/<int:usuario_id>/', usuarios_views.editar_usuario, name='editar_usuario'),
     path('eliminar-usuario/<int:usuario_id>/', usuarios_views.eliminar_usuario, name='eliminar_usuario'),
-    path('aceptar-ticket/<int:ticket_id>/', usuarios_views.aceptar_ticket, name='aceptar_ticket'),
-    path('asignar-ticket/<int:ticket_id>/', usuarios_views.asignar_ticket, name='asignar_ticket'),
-    path('cambiar-urgencia/<int:ticket_id>/', usuarios_views.cambiar_urgencia, name='cambiar_urgencia'),
-    path('reasignar-ticket/<int:ticket_id>/', usuarios_views.reasignar_ticket, name='reasignar_ticket'),
+    path('siguiente-ticket/', acciones.siguiente_ticket, name='siguiente_ticket'),
+    path('aceptar-ticket/<int:ticket_id>/', acciones.aceptar_ticket, name='aceptar_ticket'),
+    path('asignar-ticket/<int:ticket_id>/', acciones.asignar_ticket, name='asignar_ticket'),
+    path('cambiar-urgencia/<int:ticket_id>/', acciones.cambiar_urgencia, name='cambiar_urgencia'),
+    path('reasignar-ticket/<int:ticket_id>/', acciones.reasignar_ticket, name='reasignar_ticket'),
     path('poner-en-espera/<int:ticket_id>/', usuarios_views.poner_en_espera, name='poner_en_espera'),
     path('ver-motivo-espera/<int:ticket_id>/', usuarios_views.poner_en_espera, name='ver_motivo_espera'),
 path('visualizar-ticket/<int:ticket_id>/', usuarios_views.visualizar_ticket, name='visualizar_ticket'),
+    path('descargar-imagenes/<int:ticket_id>/', usuarios_views.descargar_adjuntos, name='descargar_adjuntos'),
     path('cancelar-ticket/<int:ticket_id>/', usuarios_views.cancelar_ticket, name='cancelar_ticket'),
     path('aceptar-usuario/<int:usuario_id>/', usuarios_views.aceptar_usuario, name='aceptar_usuario'),
     path('subir-foto-perfil/', usuarios_views.subir_foto_perfil, name='subir_foto_perfil'),
 path('eliminar-foto-perfil/', usuarios_views.eliminar_foto_perfil, name='eliminar_foto_perfil'),
+    path('eventos/tickets/', usuarios_views.eventos_tickets, name='eventos_tickets'),
+    path('cambiar-notificaciones/', usuarios_views.cambiar_notificaciones, name='cambiar_notificaciones'),
     path('logout/', usuarios_views.logout_view, name='logout'),
-]
-
-# Configuración para servir archivos de media en desarrollo
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Archivos de media (imágenes de tickets y fotos de perfil) con control de acceso, en
+    # desarrollo y en producción; con MEDIA_ENVIO el servidor web manda los bytes
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:nombre>", usuarios_views.servir_media, name='servir_media'),
+]
\ No newline at end of file
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import tempfile
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F, Q
+
+# Los archivos se guardan una sola vez por contenido: blobs/ab/cd/abcd…(sha256).ext
+CARPETA_BLOBS = 'blobs'
+TAMANO_BLOQUE = 64 * 1024
+
+# Campos que guardan sus archivos en este storage: (modelo, campos)
+CAMPOS_ADJUNTOS = (
+    ('usuarios.ImagenTicket', ('imagen', 'miniatura', 'pantalla')),
+    ('usuarios.ImagenReporte', ('imagen', 'miniatura', 'pantalla')),
+    ('usuarios.Usuario', ('foto_perfil', 'avatar', 'avatar_chico')),
+)
+
+
+def ruta_blob(sha256, extension):
+    # Dos niveles de carpetas por prefijo del hash para no juntar miles de archivos en una
+    return f'{CARPETA_BLOBS}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}'
+
+
+def es_blob(nombre):
+    return bool(nombre) and nombre.startswith(f'{CARPETA_BLOBS}/')
+
+
+def calcular_sha256(contenido):
+    """SHA-256 de un File de Django leyendo por bloques; deja el archivo al inicio"""
+    resumen = hashlib.sha256()
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    for bloque in contenido.chunks(TAMANO_BLOQUE):
+        resumen.update(bloque)
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    return resumen.hexdigest()
+
+
+class AlmacenamientoDeduplicado(FileSystemStorage):
+    """
+    FileSystemStorage direccionado por contenido: el nombre que propone upload_to solo aporta
+    la extensión. Subir dos veces la misma imagen reutiliza el mismo archivo, y la tabla
+    ArchivoContenido lleva cuántos campos lo usan; delete() solo lo borra del disco cuando
+    nadie más lo referencia. Los archivos de antes de la conversión (fuera de blobs/) se
+    siguen sirviendo y borrando como siempre.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre final lo decide el hash en _save; no hace falta buscar uno libre
+        return name
+
+    def _save(self, name, content):
+        ArchivoContenido = apps.get_model('usuarios', 'ArchivoContenido')
+        sha256 = calcular_sha256(content)
+        nombre = ruta_blob(sha256, os.path.splitext(name)[1].lower())
+
+        with transaction.atomic():
+            # El bloqueo de la fila serializa esta alta con un delete() simultáneo del mismo blob
+            archivo, _ = ArchivoContenido.objects.select_for_update().get_or_create(
+                nombre=nombre, defaults={'sha256': sha256, 'tamano': content.size, 'referencias': 0}
+            )
+            if self.exists(nombre):
+                # Reutilizado: se renueva la fecha para que limpiar_media lo trate como reciente
+                # hasta que la fila que lo va a usar se guarde
+                os.utime(self.path(nombre))
+            else:
+                self._escribir(nombre, content)
+            ArchivoContenido.objects.filter(id=archivo.id).update(referencias=F('referencias') + 1)
+        return nombre
+
+    def _escribir(self, nombre, content):
+        """Escribe a un temporal en la misma carpeta y lo renombra: nunca queda un blob a medias"""
+        ruta = self.path(nombre)
+        carpeta = os.path.dirname(ruta)
+        os.makedirs(carpeta, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(carpeta, self.directory_permissions_mode)
+        descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix='.subida-')
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                for bloque in content.chunks(TAMANO_BLOQUE):
+                    destino.write(bloque)
+            os.chmod(temporal, self.file_permissions_mode or 0o644)
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+    def delete(self, name):
+        """Quita una referencia; el archivo se borra al quitar la última"""
+        if not es_blob(name):
+            return super().delete(name)
+
+        ArchivoContenido = apps.get_model('usuarios', 'ArchivoContenido')
+        with transaction.atomic():
+            archivo = ArchivoContenido.objects.select_for_update().filter(nombre=name).first()
+            if archivo is not None and archivo.referencias > 1:
+                ArchivoContenido.objects.filter(id=archivo.id).update(referencias=F('referencias') - 1)
+                return
+            if archivo is not None:
+                archivo.delete()
+            super().delete(name)
+
+
+def nombres_en_uso(chunk_size=2000):
+    """Nombres de archivo de todos los CAMPOS_ADJUNTOS, leídos por bloques (con repeticiones)"""
+    for etiqueta, campos in CAMPOS_ADJUNTOS:
+        modelo = apps.get_model(etiqueta)
+        for fila in modelo.objects.values_list(*campos).iterator(chunk_size=chunk_size):
+            yield from (nombre for nombre in fila if nombre)
+
+
+def nombres_referenciados(nombres):
+    """
+    Los de `nombres` que algún CAMPOS_ADJUNTOS usa: una consulta por modelo sobre los
+    índices de los campos, sin leer los demás nombres de la tabla
+    """
+    nombres = set(nombres)
+    en_uso = set()
+    for etiqueta, campos in CAMPOS_ADJUNTOS:
+        modelo = apps.get_model(etiqueta)
+        condicion = Q()
+        for campo in campos:
+            condicion |= Q(**{f'{campo}__in': nombres})
+        for fila in modelo.objects.filter(condicion).values_list(*campos):
+            en_uso.update(fila)
+    return en_uso & nombres
+
+
+def referencias_en_uso():
+    """Counter {nombre: cuántos campos lo usan} leyendo todos los CAMPOS_ADJUNTOS"""
+    return Counter(nombres_en_uso())
+
+
+def recontar_referencias():
+    """
+    Ajusta ArchivoContenido.referencias a los campos que de verdad usan cada blob (p. ej. tras
+    una caída entre guardar el archivo y guardar la fila). Devuelve cuántos contadores cambiaron
+    """
+    ArchivoContenido = apps.get_model('usuarios', 'ArchivoContenido')
+    cambiados = 0
+    with transaction.atomic():
+        # Primero se bloquean los contadores para que nadie los mueva mientras se cuenta
+        archivos = list(ArchivoContenido.objects.select_for_update())
+        en_uso = referencias_en_uso()
+        for archivo in archivos:
+            if archivo.referencias != en_uso[archivo.nombre]:
+                ArchivoContenido.objects.filter(id=archivo.id).update(referencias=en_uso[archivo.nombre])
+                cambiados += 1
+    return cambiados
+
+
+def eliminar_huerfano(nombre, limite):
+    """
+    Borra un archivo que ninguna fila usa si no se modificó después de `limite` (timestamp).
+    En los blobs se bloquea su fila de ArchivoContenido, la misma que toma _save al reutilizarlo,
+    así que un blob no se borra a la mitad de una subida que lo está reutilizando.
+    Devuelve True si se borró.
+    """
+    ArchivoContenido = apps.get_model('usuarios', 'ArchivoContenido')
+    with transaction.atomic():
+        if es_blob(nombre):
+            list(ArchivoContenido.objects.select_for_update().filter(nombre=nombre))
+        ruta = almacenamiento.path(nombre)
+        try:
+            if os.stat(ruta).st_mtime > limite:
+                return False
+            os.remove(ruta)
+        except FileNotFoundError:
+            return False
+        ArchivoContenido.objects.filter(nombre=nombre).delete()
+    return True
+
+
+def liberar(nombres):
+    """Quita una referencia de cada archivo (para llamar tras el COMMIT que dejó de usarlos)"""
+    for nombre in nombres:
+        almacenamiento.delete(nombre)
+
+
+almacenamiento = AlmacenamientoDeduplicado()
+
+
+def almacenamiento_adjuntos():
+    """Storage de ImagenTicket, ImagenReporte y Usuario.foto_perfil (callable para las migraciones)"""
+    return almacenamiento
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UsuariosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'usuarios'
+
+    def ready(self):
+        # Registrar las señales que invalidan la caché de usuarios
+        from . import signals  # noqa: F401
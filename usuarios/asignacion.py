@@ -0,0 +1,257 @@
+"""
+Asignación de tickets sin carreras.
+
+Cada cambio de asignación es un solo UPDATE condicional (compare-and-set): solo se aplica si
+el ticket sigue como se leyó. Si dos personas aceptan el mismo ticket a la vez, la base de
+datos deja pasar una sola actualización y la otra cuenta 0 filas. No se bloquea la fila más
+allá de esa sentencia.
+
+queryset.update() no pasa por save() ni por sus señales: al ganar, la instancia queda con los
+valores que se escribieron y se llama a ticket_actualizado (las mismas invalidaciones de caché
+y eventos en vivo que un save() normal).
+
+Los demás cambios del ticket (estatus, urgencia, edición) guardan con guardar_ticket, que relee
+la asignación con la fila bloqueada: quien tomó el ticket después de que la vista lo leyó no
+se pierde ni en la fila ni en la caché.
+
+La autoasignación de tickets nuevos (settings.AUTOASIGNACION) elige a alguien del equipo de la
+categoría con una estrategia intercambiable y lo asigna con el mismo UPDATE condicional.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Ticket, Usuario
+from .signals import ticket_actualizado
+
+ESTATUS_CERRADOS = ('finalizado', 'cancelado')
+# Candidatos que se leen por consulta cuando la base de datos no tiene SKIP LOCKED
+LOTE_SIGUIENTE = 10
+# Estrategia de autoasignación de tickets nuevos; None: quedan en disponibles
+AUTOASIGNACION_DEFAULT = None
+
+
+def _toma(ticket, usuario, por_admin):
+    """Solo un ticket libre y sin atender se puede tomar"""
+    condicion = Ticket.objects.filter(id=ticket.id, asignado_a__isnull=True, estatus='generado')
+    cambios = {'asignado_a': usuario, 'estatus': 'en_proceso', 'asignado_por_admin': por_admin}
+    return condicion, cambios | {'fecha_edicion': timezone.now()}
+
+
+def _reasignacion(ticket, usuario):
+    """Reasignar solo si el asignado y el estatus siguen siendo los que se leyeron"""
+    condicion = Ticket.objects.filter(
+        id=ticket.id, asignado_a_id=ticket.asignado_a_id, estatus=ticket.estatus,
+    ).exclude(estatus__in=ESTATUS_CERRADOS)
+    if usuario is None:
+        cambios = {'asignado_a': None, 'estatus': 'generado'}
+    else:
+        cambios = {'asignado_a': usuario, 'estatus': 'en_proceso' if ticket.estatus == 'generado' else ticket.estatus}
+    return condicion, cambios | {'fecha_edicion': timezone.now()}
+
+
+def _aplicar(ticket, cambios):
+    """Deja la instancia como quedó la fila: la condición garantiza que el UPDATE escribió esto"""
+    for campo, valor in cambios.items():
+        setattr(ticket, campo, valor)
+
+
+def _quien_lo_tiene(ticket):
+    return Usuario.objects.filter(tickets_asignados=ticket.id)
+
+
+def _cambiar(ticket, condicion, cambios):
+    if condicion.update(**cambios):
+        _aplicar(ticket, cambios)
+        ticket_actualizado(ticket)
+        return True, ticket.asignado_a
+    return False, _quien_lo_tiene(ticket).first()
+
+
+async def _acambiar(ticket, condicion, cambios):
+    if await condicion.aupdate(**cambios):
+        _aplicar(ticket, cambios)
+        await sync_to_async(ticket_actualizado)(ticket)
+        return True, ticket.asignado_a
+    return False, await _quien_lo_tiene(ticket).afirst()
+
+
+def tomar_ticket(ticket, usuario, por_admin=False):
+    """
+    Asigna el ticket a `usuario` si sigue libre. Devuelve (ganado, asignado): si otro lo tomó
+    primero, ganado es False y asignado es quien lo tiene (None si ya no está disponible por
+    otra razón, p. ej. se canceló o se borró)
+    """
+    return _cambiar(ticket, *_toma(ticket, usuario, por_admin))
+
+
+async def atomar_ticket(ticket, usuario, por_admin=False):
+    """tomar_ticket para vistas async"""
+    return await _acambiar(ticket, *_toma(ticket, usuario, por_admin))
+
+
+def reasignar_ticket(ticket, usuario):
+    """
+    Pasa el ticket a `usuario` (None para desasignarlo) si nadie lo cambió desde que se leyó.
+    Devuelve (ganado, asignado) como tomar_ticket
+    """
+    return _cambiar(ticket, *_reasignacion(ticket, usuario))
+
+
+async def areasignar_ticket(ticket, usuario):
+    """reasignar_ticket para vistas async"""
+    return await _acambiar(ticket, *_reasignacion(ticket, usuario))
+
+
+def guardar_ticket(ticket, campos):
+    """
+    ticket.save(update_fields=campos) para cambios que no tocan la asignación. Relee con la
+    fila bloqueada el asignado (y el estatus si no está en campos): si alguien tomó el ticket
+    después de que se leyó, post_save invalida su pestaña y publica el evento con el asignado
+    real. El estatus se corrige como lo hará el trigger de 0022
+    """
+    with transaction.atomic():
+        fila = Ticket.objects.select_for_update().values('asignado_a_id', 'estatus').get(id=ticket.id)
+        ticket.asignado_a_id = fila['asignado_a_id']
+        if 'estatus' not in campos:
+            ticket.estatus = fila['estatus']
+        if ticket.asignado_a_id is not None and ticket.estatus == 'generado':
+            ticket.estatus = 'en_proceso'
+        elif ticket.asignado_a_id is None and ticket.estatus == 'en_proceso':
+            ticket.estatus = 'generado'
+        ticket.save(update_fields=campos)
+
+
+async def aguardar_ticket(ticket, campos):
+    """guardar_ticket para vistas async (transaction.atomic solo existe del lado síncrono)"""
+    await sync_to_async(guardar_ticket)(ticket, campos)
+
+
+def cola_siguiente(usuario):
+    """
+    Tickets que `usuario` puede tomar, el más urgente y más antiguo primero. Sistemas solo
+    los de su categoría; admin, todos. Usa el índice parcial ticket_siguiente_idx
+    """
+    queryset = Ticket.objects.filter(asignado_a__isnull=True, estatus='generado')
+    if usuario.rol == 'sistemas':
+        queryset = queryset.filter(categoria=usuario.categoria_sistemas)
+    return queryset.defer('busqueda').order_by('-nivel_urgencia', 'fecha_creacion', 'id')
+
+
+def tomar_siguiente(usuario):
+    """
+    Asigna a `usuario` el siguiente ticket de su cola y lo devuelve (None si no hay).
+
+    Con SKIP LOCKED (PostgreSQL) cada llamada bloquea la primera fila que nadie más tiene
+    bloqueada: varias personas a la vez reciben tickets distintos sin esperarse entre sí.
+    Sin SKIP LOCKED (SQLite, que de todos modos serializa las escrituras) se intenta tomar
+    cada candidato con el UPDATE condicional y se pasa al siguiente si alguien ganó antes.
+    """
+    cola = cola_siguiente(usuario)
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ticket = cola.select_for_update(skip_locked=True).first()
+            # Con la fila bloqueada nadie puede adelantarse: el UPDATE siempre gana
+            if ticket is not None and tomar_ticket(ticket, usuario)[0]:
+                return ticket
+            return None
+
+    while True:
+        candidatos = list(cola[:LOTE_SIGUIENTE])
+        if not candidatos:
+            return None
+        for ticket in candidatos:
+            if tomar_ticket(ticket, usuario)[0]:
+                return ticket
+
+
+class Candidato:
+    """
+    Lo que una estrategia puede leer de alguien del equipo (candidatos_categoria anota lo
+    mismo sobre Usuario; el simulador usa esta clase). carga: suma de nivel_urgencia de sus tickets
+    abiertos (una Crítica pesa como cuatro Bajas); ultimo_ticket: id del último que recibió
+    (0 si ninguno); finalizados: tickets que ya cerró en la categoría
+    """
+    __slots__ = ('id', 'carga', 'ultimo_ticket', 'finalizados')
+
+    def __init__(self, id, carga=0, ultimo_ticket=0, finalizados=0):
+        self.id = id
+        self.carga = carga
+        self.ultimo_ticket = ultimo_ticket
+        self.finalizados = finalizados
+
+    def __repr__(self):
+        return f'Candidato({self.id}, carga={self.carga})'
+
+
+def por_turnos(ticket, candidatos):
+    """Round-robin sin estado guardado: a quien hace más que no recibe un ticket"""
+    return min(candidatos, key=lambda c: (c.ultimo_ticket, c.id))
+
+
+def menor_carga(ticket, candidatos):
+    """A quien tiene menos carga ponderada por urgencia; en empate, por turnos"""
+    return min(candidatos, key=lambda c: (c.carga, c.ultimo_ticket, c.id))
+
+
+def por_experiencia(ticket, candidatos):
+    """
+    Menor carga relativa a la experiencia en la categoría: quien ha cerrado más tickets
+    aguanta más carga (peso 1 sin cerrados, 2 con 1, 3 con 3, 4 con 7...)
+    """
+    return min(candidatos, key=lambda c: (c.carga / (1 + math.log2(1 + c.finalizados)), c.ultimo_ticket, c.id))
+
+
+ESTRATEGIAS = {
+    'turnos': por_turnos,
+    'menor_carga': menor_carga,
+    'experiencia': por_experiencia,
+}
+
+
+def obtener_estrategia(nombre):
+    """Estrategia por nombre de ESTRATEGIAS o por ruta de una función propia ('paquete.modulo.funcion')"""
+    if nombre in ESTRATEGIAS:
+        return ESTRATEGIAS[nombre]
+    return import_string(nombre)
+
+
+def candidatos_categoria(categoria):
+    """
+    El equipo de sistemas admitido de la categoría, cada usuario con los atributos de
+    Candidato, en una sola consulta agregada (sin un COUNT por persona)
+    """
+    return list(
+        Usuario.objects.filter(rol='sistemas', categoria_sistemas=categoria, admitido=True)
+        .annotate(
+            carga=Coalesce(Sum('tickets_asignados__nivel_urgencia', filter=Q(tickets_asignados__estatus__in=['en_proceso', 'en_espera'])), 0),
+            ultimo_ticket=Coalesce(Max('tickets_asignados__id'), 0),
+            finalizados=Count('tickets_asignados', filter=Q(tickets_asignados__estatus='finalizado', tickets_asignados__categoria=categoria)),
+        )
+        .order_by('id')
+    )
+
+
+def autoasignar(ticket):
+    """
+    Asigna el ticket recién creado según settings.AUTOASIGNACION (None: no se autoasigna y
+    queda en disponibles). Devuelve el usuario asignado o None. Dos tickets creados al mismo
+    tiempo pueden ver la misma carga y caer en la misma persona: la carga es una guía, no
+    un candado
+    """
+    nombre = getattr(settings, 'AUTOASIGNACION', AUTOASIGNACION_DEFAULT)
+    if not nombre:
+        return None
+    candidatos = candidatos_categoria(ticket.categoria)
+    if not candidatos:
+        return None
+    elegido = obtener_estrategia(nombre)(ticket, candidatos)
+    # asignado_por_admin=True: aparece como "Asignado", no como aceptado por la persona
+    ganado, asignado = tomar_ticket(ticket, elegido, por_admin=True)
+    return asignado if ganado else None
@@ -0,0 +1,53 @@
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField, F, Q
+from django.db.models.functions import Cast
+
+# Configuración de texto de PostgreSQL (stemming en español); debe coincidir con el
+# trigger creado en la migración 0021_ticket_busqueda
+CONFIG_BUSQUEDA = 'spanish'
+
+
+def buscar_tickets(queryset, texto):
+    """
+    Filtra y ordena por relevancia los tickets que coinciden con `texto` en título,
+    descripción u observaciones. Agrega la anotación entera `rango_busqueda` y la pone
+    al frente del orden existente (así la paginación por cursor sigue funcionando).
+
+    En PostgreSQL usa el tsvector almacenado (índice GIN) más similitud por trigramas
+    en el título para tolerar errores de escritura. En otros motores (SQLite en pruebas)
+    cae a icontains sin tolerancia a errores.
+    """
+    texto = texto.strip()
+    if not texto:
+        return queryset
+
+    orden_actual = queryset.query.order_by
+
+    if connection.vendor == 'postgresql':
+        consulta = SearchQuery(texto, config=CONFIG_BUSQUEDA, search_type='websearch')
+        queryset = queryset.filter(
+            Q(busqueda=consulta) | TrigramSimilar(F('titulo'), texto)
+        ).annotate(
+            # Entero para que el cursor compare valores exactos y no flotantes
+            rango_busqueda=Cast(
+                (SearchRank(F('busqueda'), consulta) + TrigramSimilarity('titulo', texto)) * 1000,
+                IntegerField()
+            )
+        )
+    else:
+        queryset = queryset.filter(
+            Q(titulo__icontains=texto) |
+            Q(descripcion__icontains=texto) |
+            Q(observaciones__icontains=texto)
+        ).annotate(
+            rango_busqueda=Case(
+                When(titulo__icontains=texto, then=Value(3)),
+                When(descripcion__icontains=texto, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+
+    return queryset.order_by('-rango_busqueda', *orden_actual)
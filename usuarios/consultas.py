@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from .busqueda import buscar_tickets
+from .models import Ticket, ReporteFinalizacion
+
+# Relaciones que el dashboard recorre por cada fila (creador, asignado, reporte y motivo de espera).
+# Se traen con JOIN para que el número de consultas no dependa de cuántos tickets se muestran.
+RELACIONES_TICKET_DASHBOARD = ('usuario', 'asignado_a', 'reporte_finalizacion', 'motivo_espera')
+
+# Orden de las listas del dashboard; orden_estatus es una columna generada a partir del estatus
+# (generado, en espera, en proceso, finalizado, cancelado) y los índices de Ticket terminan en
+# este mismo orden. Termina en id para que la paginación por cursor sea estable
+ORDEN_DASHBOARD = ('orden_estatus', '-fecha_creacion', '-id')
+
+
+def aplicar_filtros(queryset, filtros, tab_context='general'):
+    """Aplica los filtros del dashboard (búsqueda, urgencia, estatus y fechas)"""
+    if not filtros:
+        return queryset
+
+    # Búsqueda de texto en título, descripción y observaciones, ordenada por relevancia
+    if filtros.get('search'):
+        queryset = buscar_tickets(queryset, filtros['search'])
+
+    # Filtro por urgencia
+    if filtros.get('urgency'):
+        queryset = queryset.filter(nivel_urgencia=int(filtros['urgency']))
+
+    # 🔧 Filtro por estatus - NO aplicar en tickets disponibles
+    if filtros.get('status') and tab_context != 'disponibles':
+        queryset = queryset.filter(estatus=filtros['status'])
+
+    # Filtro por rango de fechas
+    if filtros.get('date_from'):
+        fecha_desde = datetime.strptime(filtros['date_from'], '%Y-%m-%d').date()
+        queryset = queryset.filter(fecha_creacion__date__gte=fecha_desde)
+
+    if filtros.get('date_to'):
+        fecha_hasta = datetime.strptime(filtros['date_to'], '%Y-%m-%d').date()
+        queryset = queryset.filter(fecha_creacion__date__lte=fecha_hasta)
+
+    return queryset
+
+
+def tickets_creados(usuario, filtros=None):
+    """Tickets creados por el usuario que aún no están finalizados"""
+    queryset = Ticket.objects.filter(
+        usuario=usuario
+    ).select_related(*RELACIONES_TICKET_DASHBOARD).defer('busqueda').exclude(
+        estatus='finalizado'
+    ).order_by(*ORDEN_DASHBOARD)
+    return aplicar_filtros(queryset, filtros)
+
+
+def tickets_asignados(usuario, filtros=None):
+    """Tickets asignados al usuario (sistemas o admin)"""
+    queryset = Ticket.objects.filter(
+        asignado_a=usuario
+    ).select_related(*RELACIONES_TICKET_DASHBOARD).defer('busqueda').order_by(*ORDEN_DASHBOARD)
+    return aplicar_filtros(queryset, filtros)
+
+
+def tickets_disponibles(usuario, filtros=None):
+    """Tickets sin asignar; sistemas solo ve los de su categoría, admin ve todos"""
+    queryset = Ticket.objects.filter(asignado_a__isnull=True, estatus='generado')
+    if usuario.rol == 'sistemas':
+        queryset = queryset.filter(categoria=usuario.categoria_sistemas)
+    queryset = queryset.select_related(*RELACIONES_TICKET_DASHBOARD).defer('busqueda').order_by(*ORDEN_DASHBOARD)
+    # Sin filtro de estatus: todos los disponibles están en 'generado'
+    return aplicar_filtros(queryset, filtros, 'disponibles')
+
+
+def todos_los_tickets(filtros=None):
+    """Tickets abiertos en los que ya se está trabajando (solo admin)"""
+    # Por la regla de la migración 0022 (asignado nunca queda en 'generado'), "asignado o en
+    # proceso/espera, sin finalizar ni cancelar" es exactamente en_proceso + en_espera; así la
+    # consulta coincide con el índice parcial ticket_en_curso_idx
+    queryset = Ticket.objects.filter(
+        estatus__in=['en_proceso', 'en_espera']
+    ).select_related(*RELACIONES_TICKET_DASHBOARD).defer('busqueda').order_by(*ORDEN_DASHBOARD)
+    return aplicar_filtros(queryset, filtros)
+
+
+def reportes_del_usuario(usuario, visto):
+    """Reportes de finalización de los tickets del usuario, vistos o pendientes"""
+    return ReporteFinalizacion.objects.filter(
+        ticket__usuario=usuario,
+        ticket__estatus='finalizado',
+        visto_por_usuario=visto
+    ).select_related('ticket')
+
+
+def consultas_dashboard(usuario, filtros=None):
+    """Devuelve {nombre: queryset} con todas las listas que el dashboard muestra a este usuario"""
+    consultas = {
+        'mis_tickets_creados': tickets_creados(usuario, filtros),
+    }
+    if usuario.rol != 'sistemas':
+        consultas['reportes_pendientes'] = reportes_del_usuario(usuario, visto=False)
+        consultas['tickets_anteriores'] = reportes_del_usuario(usuario, visto=True)
+    if usuario.rol in ['sistemas', 'admin']:
+        consultas['tickets_asignados'] = tickets_asignados(usuario, filtros)
+        consultas['tickets_disponibles'] = tickets_disponibles(usuario, filtros)
+    if usuario.rol == 'admin':
+        consultas['todos_los_tickets'] = todos_los_tickets(filtros)
+    return consultas
@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Ticket, Usuario, ContadorUsuario, ContadorCategoria
+
+ESTATUS_ABIERTOS = ('generado', 'en_proceso', 'en_espera')
+
+
+def contadores_usuario(usuario):
+    """{'creador': {estatus: n}, 'asignado': {estatus: n}} leyendo solo las filas del usuario"""
+    resultado = {'creador': defaultdict(int), 'asignado': defaultdict(int)}
+    for rol, estatus, total in ContadorUsuario.objects.filter(usuario=usuario).values_list('rol', 'estatus', 'total'):
+        resultado[rol][estatus] = total
+    return resultado
+
+
+def contadores_categoria():
+    """{categoria: {estatus: n}}; son a lo más categorías × estatus filas"""
+    resultado = defaultdict(lambda: defaultdict(int))
+    for categoria, estatus, total in ContadorCategoria.objects.values_list('categoria', 'estatus', 'total'):
+        resultado[categoria][estatus] = total
+    return resultado
+
+
+def resumen_dashboard(usuario):
+    """
+    Totales de cada pestaña del dashboard (sin filtros) y badges, a partir de los contadores.
+    Se apoya en la regla de la migración 0022: 'generado' equivale a "sin asignar".
+    """
+    propios = contadores_usuario(usuario)
+    totales = {
+        # Igual que consultas.tickets_creados: todo menos finalizado
+        'creados': sum(n for estatus, n in propios['creador'].items() if estatus != 'finalizado'),
+        'mis_abiertos': {estatus: propios['asignado'][estatus] for estatus in ESTATUS_ABIERTOS},
+    }
+    if usuario.rol in ['sistemas', 'admin']:
+        por_categoria = contadores_categoria()
+        totales['asignados'] = sum(propios['asignado'].values())
+        if usuario.rol == 'sistemas':
+            totales['disponibles'] = por_categoria[usuario.categoria_sistemas]['generado'] if usuario.categoria_sistemas else 0
+        else:
+            totales['disponibles'] = sum(c['generado'] for c in por_categoria.values())
+        # Cola de cada categoría (tickets en 'generado')
+        totales['cola_categoria'] = {categoria: c['generado'] for categoria, c in por_categoria.items()}
+        if usuario.rol == 'admin':
+            # Igual que consultas.todos_los_tickets: en proceso o en espera
+            totales['todos'] = sum(c['en_proceso'] + c['en_espera'] for c in por_categoria.values())
+    return totales
+
+
+def calcular_contadores():
+    """Cuenta desde cero sobre Ticket: ({(usuario_id, rol, estatus): n}, {(categoria, estatus): n})"""
+    por_usuario = {}
+    for fila in Ticket.objects.values('usuario', 'estatus').annotate(total=Count('id')).order_by():
+        por_usuario[(fila['usuario'], 'creador', fila['estatus'])] = fila['total']
+    for fila in Ticket.objects.filter(asignado_a__isnull=False).values(
+            'asignado_a', 'estatus').annotate(total=Count('id')).order_by():
+        por_usuario[(fila['asignado_a'], 'asignado', fila['estatus'])] = fila['total']
+
+    por_categoria = {
+        (fila['categoria'], fila['estatus']): fila['total']
+        for fila in Ticket.objects.values('categoria', 'estatus').annotate(total=Count('id')).order_by()
+    }
+    return por_usuario, por_categoria
+
+
+def recalcular_contadores(dry_run=False):
+    """Reconstruye ambas tablas de contadores; devuelve cuántas filas no coincidían"""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql' and not dry_run:
+            # Bloquear escrituras de tickets mientras se cuenta para no perder cambios concurrentes
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {Ticket._meta.db_table} IN SHARE MODE')
+        por_usuario, por_categoria = calcular_contadores()
+
+        actuales_usuario = {
+            (c.usuario_id, c.rol, c.estatus): c.total for c in ContadorUsuario.objects.all()
+        }
+        actuales_categoria = {
+            (c.categoria, c.estatus): c.total for c in ContadorCategoria.objects.all()
+        }
+        diferencias = sum(
+            1 for clave in set(por_usuario) | set(actuales_usuario)
+            if por_usuario.get(clave, 0) != actuales_usuario.get(clave, 0)
+        ) + sum(
+            1 for clave in set(por_categoria) | set(actuales_categoria)
+            if por_categoria.get(clave, 0) != actuales_categoria.get(clave, 0)
+        )
+        # Filas de usuarios que ya no existen (eliminados sin pasar por la señal, p. ej. con SQL)
+        diferencias += ContadorUsuario.objects.exclude(usuario_id__in=Usuario.objects.values('id')).count()
+        if dry_run:
+            return diferencias
+
+        ContadorUsuario.objects.all().delete()
+        ContadorCategoria.objects.all().delete()
+        ContadorUsuario.objects.bulk_create([
+            ContadorUsuario(usuario_id=usuario_id, rol=rol, estatus=estatus, total=total)
+            for (usuario_id, rol, estatus), total in por_usuario.items()
+        ])
+        ContadorCategoria.objects.bulk_create([
+            ContadorCategoria(categoria=categoria, estatus=estatus, total=total)
+            for (categoria, estatus), total in por_categoria.items()
+        ])
+    return diferencias
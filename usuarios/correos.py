@@ -0,0 +1,124 @@
+import logging
+import smtplib
+from collections import Counter
+
+import pytz
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import CorreoSaliente
+from .trabajos import MAX_INTENTOS, espera_reintento
+
+logger = logging.getLogger(__name__)
+
+# Rechazos definitivos del servidor: reintentar no los arregla, van directo a 'fallido'
+ERRORES_DEFINITIVOS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+
+def encolar_correo(asunto, cuerpo, destinatarios, remitente=None):
+    """
+    Deja un correo en la bandeja de salida. Llamarlo dentro de la transacción del cambio que
+    lo origina; el worker (manage.py enviar_correos) lo manda después del COMMIT
+    """
+    return CorreoSaliente.objects.create(
+        asunto=asunto,
+        cuerpo=cuerpo,
+        remitente=remitente or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+    )
+
+
+def encolar_correo_ticket_completado(ticket):
+    """Aviso al creador del ticket de que su ticket fue completado"""
+    # Convertir fecha a zona horaria de México
+    zona_mexico = pytz.timezone('America/Mexico_City')
+    fecha_mexico = ticket.fecha_edicion.astimezone(zona_mexico)
+
+    asunto = f'Ticket Completado: {ticket.titulo}'
+    mensaje = f'''
+            Hola {ticket.usuario.nombre},
+
+            Tu ticket ha sido completado:
+
+            Título: {ticket.titulo}
+            Descripción: {ticket.descripcion}
+            Fecha de completado: {fecha_mexico.strftime('%d/%m/%Y %H:%M')}
+
+            Puedes revisar el reporte de completado ingresando al sistema.
+
+            Saludos,
+            Sistema de Tickets
+        '''
+    return encolar_correo(asunto, mensaje, [ticket.usuario.email])
+
+
+def _registrar_fallo(correo, error):
+    """Reprograma con backoff; los rechazos definitivos o sin intentos restantes quedan 'fallido'"""
+    correo.error = str(error)[:2000]
+    if isinstance(error, ERRORES_DEFINITIVOS) or correo.intentos >= MAX_INTENTOS:
+        correo.estatus = 'fallido'
+        logger.error('Correo %s descartado tras %s intentos: %s', correo.id, correo.intentos, error)
+    else:
+        correo.estatus = 'pendiente'
+        correo.disponible_en = timezone.now() + espera_reintento(correo.intentos)
+    correo.save(update_fields=['estatus', 'error', 'disponible_en', 'fecha_edicion'])
+    return correo.estatus
+
+
+def enviar_lote(ids):
+    """
+    Manda los correos ya tomados (estatus 'procesando') por una sola conexión al servidor.
+    Cada correo se registra por separado: uno rechazado no afecta a los demás del lote.
+    Devuelve un Counter con cuántos quedaron 'enviado', 'pendiente' (reintento) y 'fallido'.
+
+    Entrega al menos una vez: si el worker muere entre mandar un correo y registrarlo,
+    recuperar_huerfanos lo vuelve a encolar y se manda de nuevo.
+    """
+    resultado = Counter()
+    correos = list(CorreoSaliente.objects.filter(id__in=ids, estatus='procesando').order_by('id'))
+    if not correos:
+        return resultado
+
+    conexion = get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except Exception as error:
+        # Sin servidor no se puede mandar ninguno: todo el lote se reintenta más tarde
+        for correo in correos:
+            resultado[_registrar_fallo(correo, error)] += 1
+        return resultado
+
+    try:
+        for correo in correos:
+            mensaje = EmailMessage(
+                correo.asunto, correo.cuerpo, correo.remitente, correo.destinatarios, connection=conexion
+            )
+            try:
+                conexion.send_messages([mensaje])
+            except Exception as error:
+                resultado[_registrar_fallo(correo, error)] += 1
+                continue
+            CorreoSaliente.objects.filter(id=correo.id).update(
+                estatus='enviado', error='', fecha_envio=timezone.now()
+            )
+            resultado['enviado'] += 1
+    finally:
+        conexion.close()
+    return resultado
+
+
+def reintentar_fallidos():
+    """Vuelve a encolar los correos descartados (p. ej. tras corregir la configuración SMTP)"""
+    return CorreoSaliente.objects.filter(estatus='fallido').update(
+        estatus='pendiente', intentos=0, disponible_en=timezone.now()
+    )
+
+
+def resumen_bandeja():
+    """{estatus: total} de la bandeja de salida, para monitoreo"""
+    totales = dict.fromkeys((clave for clave, _ in CorreoSaliente.ESTATUS), 0)
+    for fila in CorreoSaliente.objects.order_by().values('estatus').annotate(total=Count('id')):
+        totales[fila['estatus']] = fila['total']
+    return totales
@@ -0,0 +1,234 @@
+"""
+Eventos de tickets en vivo para el dashboard (Server-Sent Events, solo bajo ASGI).
+
+Los cambios de un ticket se publican al COMMIT en un difusor del proceso, que los reparte a
+las conexiones SSE abiertas de los usuarios que pueden ver ese ticket. Cada conexión en espera
+es solo una corrutina y una cola: no toca la base de datos hasta que llega un evento.
+
+- DifusorLocal: reparte dentro del proceso. Sirve para pruebas y para un solo proceso ASGI.
+- DifusorPostgres: publica con pg_notify y cada proceso escucha con LISTEN en una conexión
+  propia, así el evento llega a las conexiones de todos los procesos y servidores.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+TIPOS = ('creado', 'asignado', 'estatus', 'urgencia')
+CANAL_POSTGRES = 'usuarios_tickets'
+# Eventos que una conexión puede tener sin leer; si se llena (cliente lento) se le pide recargar
+MAX_EVENTOS_EN_COLA = 100
+REINTENTO_LISTEN = 5
+# Segundos para abrir la conexión de LISTEN si OPTIONS no trae connect_timeout
+TIMEOUT_CONEXION_LISTEN = 10
+# Llaves de DATABASES['default']['OPTIONS'] que interpreta Django y no psycopg2
+OPCIONES_SOLO_DJANGO = ('isolation_level', 'assume_role', 'server_side_binding', 'pool')
+
+
+def evento_ticket(tipo, ticket, anterior_asignado_id=None):
+    """Datos del evento: lo justo para decidir quién lo ve y qué pestañas recargar"""
+    return {
+        'tipo': tipo,
+        'ticket_id': ticket.id,
+        'titulo': ticket.titulo,
+        'usuario_id': ticket.usuario_id,
+        'asignado_a_id': ticket.asignado_a_id,
+        'anterior_asignado_id': anterior_asignado_id,
+        'categoria': ticket.categoria,
+        'estatus': ticket.estatus,
+        'nivel_urgencia': ticket.nivel_urgencia,
+    }
+
+
+def evento_visible(evento, usuario):
+    """
+    Las mismas reglas que las pestañas del dashboard: el creador, el asignado (actual o
+    anterior), el equipo de sistemas de la categoría y los admin
+    """
+    if usuario['rol'] == 'admin':
+        return True
+    if usuario['id'] in (evento['usuario_id'], evento['asignado_a_id'], evento['anterior_asignado_id']):
+        return True
+    return usuario['rol'] == 'sistemas' and usuario['categoria_sistemas'] == evento['categoria']
+
+
+class Suscripcion:
+    """Una conexión SSE: su cola vive en el event loop que la creó"""
+
+    def __init__(self, usuario):
+        self.usuario = {
+            'id': usuario.id, 'rol': usuario.rol, 'categoria_sistemas': usuario.categoria_sistemas,
+        }
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=MAX_EVENTOS_EN_COLA)
+
+    def entregar(self, evento):
+        # Corre en el loop de la suscripción (call_soon_threadsafe)
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # El cliente no lee: se descartan sus eventos y se le pide recargar una vez
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait({'tipo': 'recargar'})
+
+
+class DifusorLocal:
+    """Reparte los eventos a las suscripciones de este proceso"""
+
+    def __init__(self):
+        self._suscripciones = set()
+        self._candado = threading.Lock()
+
+    def suscribir(self, usuario):
+        suscripcion = Suscripcion(usuario)
+        with self._candado:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._candado:
+            self._suscripciones.discard(suscripcion)
+
+    def conexiones(self):
+        return len(self._suscripciones)
+
+    def publicar(self, evento):
+        self.repartir(evento)
+
+    def repartir(self, evento):
+        # Se puede llamar desde cualquier hilo: cada cola se toca solo desde su loop
+        with self._candado:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            if evento_visible(evento, suscripcion.usuario):
+                try:
+                    suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+                except RuntimeError:
+                    # El loop ya se cerró: la conexión terminó sin cancelarse
+                    self.cancelar(suscripcion)
+
+
+class DifusorPostgres(DifusorLocal):
+    """
+    Publica con pg_notify (llega a todos los procesos que escuchan, también en otros
+    servidores) y reparte lo que recibe por LISTEN. La conexión de LISTEN es una por proceso,
+    aparte de las de Django, y se abre con la primera suscripción.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._escucha = None
+        # Tarea que abre (o reintenta abrir) la conexión de LISTEN; una sola a la vez
+        self._conexion_pendiente = None
+
+    def publicar(self, evento):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CANAL_POSTGRES, json.dumps(evento)])
+
+    def suscribir(self, usuario):
+        suscripcion = super().suscribir(usuario)
+        if self._escucha is None and self._conexion_pendiente is None:
+            self._conexion_pendiente = suscripcion.loop.create_task(self._escuchar(suscripcion.loop))
+        return suscripcion
+
+    @staticmethod
+    def _conectar():
+        """Conexión de LISTEN con los mismos datos y OPTIONS (sslmode, etc.) que la de Django"""
+        import psycopg2
+
+        datos = settings.DATABASES['default']
+        opciones = {
+            clave: valor for clave, valor in datos.get('OPTIONS', {}).items()
+            if clave not in OPCIONES_SOLO_DJANGO
+        }
+        opciones.setdefault('connect_timeout', TIMEOUT_CONEXION_LISTEN)
+        escucha = psycopg2.connect(
+            dbname=datos['NAME'], user=datos.get('USER'), password=datos.get('PASSWORD'),
+            host=datos.get('HOST') or None, port=datos.get('PORT') or None, **opciones,
+        )
+        try:
+            escucha.autocommit = True
+            with escucha.cursor() as cursor:
+                cursor.execute(f'LISTEN {CANAL_POSTGRES}')
+        except Exception:
+            escucha.close()
+            raise
+        return escucha
+
+    async def _escuchar(self, loop):
+        # connect() espera a la red (DNS, TCP, TLS, autenticación): en un hilo, no en el loop
+        while True:
+            try:
+                escucha = await loop.run_in_executor(None, self._conectar)
+                break
+            except Exception as error:
+                logger.warning('No se pudo escuchar %s: %s; reintento en %s s', CANAL_POSTGRES, error, REINTENTO_LISTEN)
+                await asyncio.sleep(REINTENTO_LISTEN)
+        self._escucha = escucha
+        self._conexion_pendiente = None
+        # Sin hilos ni sondeo: el loop avisa cuando el socket de la conexión tiene datos
+        loop.add_reader(escucha.fileno(), self._leer, loop)
+
+    def _leer(self, loop):
+        import psycopg2
+
+        try:
+            self._escucha.poll()
+        except psycopg2.Error as error:
+            logger.warning('Se perdió la conexión de LISTEN: %s', error)
+            loop.remove_reader(self._escucha.fileno())
+            self._escucha.close()
+            self._escucha = None
+            self._conexion_pendiente = loop.create_task(self._escuchar(loop))
+            return
+        while self._escucha.notifies:
+            aviso = self._escucha.notifies.pop(0)
+            self.repartir(json.loads(aviso.payload))
+
+
+_difusor = None
+_candado_difusor = threading.Lock()
+
+
+def difusor():
+    """
+    Difusor del proceso según EVENTOS_DIFUSOR ('local' o 'postgres'); por defecto 'postgres'
+    si la base de datos es PostgreSQL
+    """
+    global _difusor
+    with _candado_difusor:
+        if _difusor is None:
+            tipo = getattr(settings, 'EVENTOS_DIFUSOR', None) or (
+                'postgres' if connection.vendor == 'postgresql' else 'local'
+            )
+            _difusor = DifusorPostgres() if tipo == 'postgres' else DifusorLocal()
+        return _difusor
+
+
+def publicar_eventos(eventos):
+    """Publica al COMMIT: si la transacción se revierte no se anuncia nada"""
+    if eventos:
+        transaction.on_commit(lambda: [difusor().publicar(evento) for evento in eventos])
+
+
+def eventos_cambio(ticket, originales, creado):
+    """Eventos de un guardado de Ticket comparando con los valores con que se cargó"""
+    if creado:
+        return [evento_ticket('creado', ticket)]
+    anterior_asignado = originales.get('asignado_a_id')
+    eventos = []
+    for tipo, campo in (('asignado', 'asignado_a_id'), ('estatus', 'estatus'), ('urgencia', 'nivel_urgencia')):
+        # Un campo que no se cargó (only/defer) no cuenta como cambio
+        if campo in originales and originales[campo] != getattr(ticket, campo):
+            eventos.append(evento_ticket(tipo, ticket, anterior_asignado))
+    return eventos
+
+
+def formato_sse(evento):
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
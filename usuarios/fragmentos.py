@@ -0,0 +1,147 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .contadores import resumen_dashboard
+from .models import Ticket
+
+# Segundos que un fragmento vive en caché aunque su versión no cambie
+FRAGMENTOS_TIMEOUT_DEFAULT = 600
+
+PREFIJO = 'usuarios:fragmento'
+
+# Versiones (sellos) de cada ámbito; se cambian cuando un ticket del ámbito cambia
+AMBITO_GLOBAL = f'{PREFIJO}:v:global'      # invalida todo (p. ej. tras un update() masivo)
+AMBITO_TODOS = f'{PREFIJO}:v:todos'        # pestaña "Todos los tickets" (cualquier ticket)
+AMBITO_PERSONAL = f'{PREFIJO}:v:personal'  # usuarios de sistemas en los selects de asignación
+
+
+def ambito_creador(usuario_id):
+    return f'{PREFIJO}:v:creador:{usuario_id}'
+
+
+def ambito_asignado(usuario_id):
+    return f'{PREFIJO}:v:asignado:{usuario_id}'
+
+
+def ambito_categoria(categoria):
+    return f'{PREFIJO}:v:categoria:{categoria}'
+
+
+def ambitos_ticket(usuario_id, asignado_a_id, categoria):
+    """Ámbitos a los que pertenece un ticket con estos valores"""
+    ambitos = [ambito_creador(usuario_id), ambito_categoria(categoria), AMBITO_TODOS]
+    if asignado_a_id:
+        ambitos.append(ambito_asignado(asignado_a_id))
+    return ambitos
+
+
+def ambitos_pestana(usuario, pestana):
+    """Ámbitos de los que depende el HTML de una pestaña del usuario"""
+    if pestana == 'creados':
+        return [ambito_creador(usuario.id)]
+    if pestana == 'asignados':
+        return [ambito_asignado(usuario.id), AMBITO_PERSONAL]
+    if pestana == 'disponibles':
+        if usuario.rol == 'sistemas':
+            categorias = [usuario.categoria_sistemas]
+        else:
+            categorias = [clave for clave, _ in Ticket.CATEGORIAS]
+        return [ambito_categoria(c) for c in categorias] + [AMBITO_PERSONAL]
+    if pestana == 'todos':
+        return [AMBITO_TODOS, AMBITO_PERSONAL]
+    raise ValueError(f'Pestaña desconocida: {pestana}')
+
+
+def ambitos_contadores(usuario):
+    """Los badges dependen de los tickets propios, los asignados y la cola de todas las categorías"""
+    return [ambito_creador(usuario.id), ambito_asignado(usuario.id), AMBITO_TODOS] + [
+        ambito_categoria(clave) for clave, _ in Ticket.CATEGORIAS
+    ]
+
+
+def invalidar_ambitos(ambitos):
+    """Nuevo sello para cada ámbito: los fragmentos guardados con el anterior dejan de usarse"""
+    ahora = time.time_ns()
+    cache.set_many({ambito: ahora for ambito in set(ambitos)}, timeout=None)
+
+
+def invalidar_todo():
+    invalidar_ambitos([AMBITO_GLOBAL])
+
+
+def plantilla_pestana(usuario, pestana):
+    if pestana == 'creados' and usuario.rol == 'usuario':
+        return 'usuarios/pestanas/creados_usuario.html'
+    return f'usuarios/pestanas/{pestana}.html'
+
+
+class FragmentosDashboard:
+    """
+    HTML de las pestañas del dashboard en caché, por (usuario, pestaña, filtros y página).
+    La clave incluye los sellos de los ámbitos de la pestaña, así que un fragmento solo se
+    vuelve a generar cuando cambió un ticket de su ámbito. Con todo en caché, el dashboard
+    cuesta dos lecturas de caché: los sellos y los fragmentos (más los contadores).
+    """
+
+    def __init__(self, request, usuario, pestanas):
+        self.request = request
+        self.usuario = usuario
+        self.timeout = getattr(settings, 'FRAGMENTOS_DASHBOARD_TIMEOUT', FRAGMENTOS_TIMEOUT_DEFAULT)
+
+        dependencias = {pestana: ambitos_pestana(usuario, pestana) for pestana in pestanas}
+        dependencias['contadores'] = ambitos_contadores(usuario)
+
+        # Los sellos se leen antes de consultar la base de datos: si alguien invalida en medio,
+        # lo que se guarde queda con el sello viejo y no se vuelve a usar
+        sellos = self._sellos({a for ambitos in dependencias.values() for a in ambitos} | {AMBITO_GLOBAL})
+        consulta = '&'.join(sorted(request.GET.urlencode().split('&')))
+        self.claves = {
+            nombre: self._clave(nombre, consulta, [sellos[AMBITO_GLOBAL]] + [sellos[a] for a in ambitos])
+            for nombre, ambitos in dependencias.items()
+        }
+        guardados = cache.get_many(self.claves.values())
+        self.guardados = {
+            nombre: guardados[clave] for nombre, clave in self.claves.items() if clave in guardados
+        }
+
+    @staticmethod
+    def _sellos(ambitos):
+        sellos = cache.get_many(ambitos)
+        for ambito in ambitos:
+            if ambito not in sellos:
+                sellos[ambito] = time.time_ns()
+                cache.add(ambito, sellos[ambito], timeout=None)
+        return sellos
+
+    def _clave(self, nombre, consulta, sellos):
+        # Rol y categoría en la clave: si cambian, el mismo usuario ve otras pestañas
+        firma = '|'.join(map(str, [self.usuario.rol, self.usuario.categoria_sistemas, consulta, *sellos]))
+        if nombre == 'contadores':
+            firma = '|'.join(map(str, [self.usuario.rol, self.usuario.categoria_sistemas, *sellos]))
+        resumen = hashlib.md5(firma.encode()).hexdigest()
+        return f'{PREFIJO}:{self.usuario.id}:{nombre}:{resumen}'
+
+    def contadores(self):
+        """Resumen de contadores (badges y totales de paginación), de caché si está vigente"""
+        if 'contadores' not in self.guardados:
+            self.guardados['contadores'] = resumen_dashboard(self.usuario)
+            cache.set(self.claves['contadores'], self.guardados['contadores'], timeout=self.timeout)
+        return self.guardados['contadores']
+
+    def faltantes(self):
+        """Pestañas que hay que construir (no están en caché o su sello cambió)"""
+        return [nombre for nombre in self.claves if nombre != 'contadores' and nombre not in self.guardados]
+
+    def guardar(self, pestana, contexto):
+        html = render_to_string(plantilla_pestana(self.usuario, pestana), contexto, request=self.request)
+        cache.set(self.claves[pestana], html, timeout=self.timeout)
+        self.guardados[pestana] = html
+        return html
+
+    def html(self):
+        return {nombre: mark_safe(html) for nombre, html in self.guardados.items() if nombre != 'contadores'}
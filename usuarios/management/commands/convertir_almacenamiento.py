@@ -0,0 +1,72 @@
+from django.apps import apps
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from usuarios.almacenamiento import CAMPOS_ADJUNTOS, almacenamiento, calcular_sha256, es_blob, recontar_referencias
+from usuarios.fragmentos import invalidar_todo
+from usuarios.middleware import invalidar_usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Convierte los archivos de MEDIA_ROOT subidos antes del almacenamiento por contenido "
+        "(tickets/, reportes/, fotos_perfil/, versiones/) a blobs/ deduplicados por SHA-256, "
+        "actualiza las filas que los usan y borra los archivos viejos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo reportar cuántos archivos y bytes se ahorrarían.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        convertidos = faltantes = 0
+        bytes_antes = 0
+        hashes = {}
+        viejos = set()
+
+        for etiqueta, campos in CAMPOS_ADJUNTOS:
+            modelo = apps.get_model(etiqueta)
+            for fila in modelo.objects.values('id', *campos).iterator(chunk_size=500):
+                cambios = {}
+                for campo in campos:
+                    nombre = fila[campo]
+                    if not nombre or es_blob(nombre):
+                        continue
+                    if not almacenamiento.exists(nombre):
+                        faltantes += 1
+                        self.stdout.write(self.style.WARNING(f"⚠️  {etiqueta} {fila['id']}: no existe {nombre}"))
+                        continue
+
+                    with almacenamiento.open(nombre, 'rb') as original:
+                        archivo = File(original, name=nombre)
+                        if nombre not in viejos:
+                            bytes_antes += archivo.size
+                        hashes.setdefault(calcular_sha256(archivo), archivo.size)
+                        if not dry_run:
+                            # save() suma la referencia y reutiliza el blob si el contenido ya existe
+                            cambios[campo] = almacenamiento.save(nombre, archivo)
+                    viejos.add(nombre)
+                    convertidos += 1
+
+                if cambios:
+                    modelo.objects.filter(id=fila['id']).update(**cambios)
+                    if etiqueta == 'usuarios.Usuario':
+                        # update() no pasa por señales: el usuario en caché tiene la ruta vieja
+                        invalidar_usuario(fila['id'])
+
+        bytes_despues = sum(hashes.values())
+        resumen = (
+            f"{convertidos} referencias en {len(viejos)} archivos -> {len(hashes)} blobs; "
+            f"{bytes_antes - bytes_despues} bytes ahorrados ({faltantes} archivos faltantes)"
+        )
+        if dry_run:
+            self.stdout.write(f"Se convertirían {resumen}")
+            return
+
+        # Los originales ya no los usa ninguna fila (todas apuntan a blobs/)
+        for nombre in viejos:
+            almacenamiento.delete(nombre)
+        recontar_referencias()
+        invalidar_todo()
+        self.stdout.write(self.style.SUCCESS(f"✅ Convertidas {resumen}"))
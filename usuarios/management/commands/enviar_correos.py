@@ -0,0 +1,70 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from usuarios.correos import enviar_lote, reintentar_fallidos, resumen_bandeja
+from usuarios.models import CorreoSaliente
+from usuarios.trabajos import nombre_worker, recuperar_huerfanos, tomar_trabajos
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la bandeja de salida de correos (CorreoSaliente). Manda los pendientes en "
+        "lotes por una sola conexión al servidor de correo, con reintentos y backoff; los que "
+        "agotan sus intentos quedan como 'fallido'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50,
+                            help='Correos por conexión al servidor.')
+        parser.add_argument('--espera', type=float, default=5.0,
+                            help='Segundos entre consultas a la bandeja cuando está vacía.')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Mandar lo que haya en la bandeja y terminar.')
+        parser.add_argument('--reintentar-fallidos', action='store_true',
+                            help='Volver a encolar los correos fallidos antes de empezar.')
+        parser.add_argument('--estado', action='store_true',
+                            help='Solo mostrar cuántos correos hay por estatus.')
+
+    def handle(self, *args, **options):
+        if options['estado']:
+            for estatus, total in resumen_bandeja().items():
+                self.stdout.write(f"{estatus}: {total}")
+            return
+        if options['reintentar_fallidos']:
+            self.stdout.write(f"🔁 {reintentar_fallidos()} correos fallidos reencolados")
+
+        worker = nombre_worker()
+        totales = Counter()
+        inicio = time.monotonic()
+        self.stdout.write(f"📨 Worker de correos {worker}")
+        try:
+            while True:
+                recuperados = recuperar_huerfanos(CorreoSaliente)
+                if recuperados:
+                    self.stdout.write(self.style.WARNING(f"⚠️  {recuperados} correos huérfanos reencolados"))
+
+                ids = tomar_trabajos(max(options['lote'], 1), worker, modelo=CorreoSaliente)
+                if not ids:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['espera'])
+                    continue
+
+                inicio_lote = time.monotonic()
+                resultado = enviar_lote(ids)
+                totales.update(resultado)
+                self.stdout.write(
+                    f"✉️  Lote de {len(ids)} en {time.monotonic() - inicio_lote:.2f} s: "
+                    f"{resultado['enviado']} enviados, {resultado['pendiente']} por reintentar, "
+                    f"{resultado['fallido']} fallidos"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write("Deteniendo worker...")
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {totales['enviado']} enviados ({totales['enviado'] / max(duracion, 0.001):.1f}/s), "
+            f"{totales['pendiente']} reintentos programados, {totales['fallido']} fallidos"
+        ))
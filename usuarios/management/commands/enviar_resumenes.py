@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.notificaciones import enviar_resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        "Junta las notificaciones pendientes de los usuarios con preferencia 'resumen' en un "
+        "correo por usuario y las deja en la bandeja de salida (las manda enviar_correos). "
+        "Programarlo con cron, p. ej. cada hora."
+    )
+
+    def handle(self, *args, **options):
+        total_correos = total_eventos = 0
+        while True:
+            correos, eventos = enviar_resumenes()
+            if not eventos:
+                break
+            total_correos += correos
+            total_eventos += eventos
+        self.stdout.write(self.style.SUCCESS(f"✅ {total_correos} resúmenes encolados con {total_eventos} avisos"))
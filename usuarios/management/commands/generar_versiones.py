@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.imagenes import generar_avatares, generar_versiones
+from usuarios.middleware import invalidar_usuario
+from usuarios.models import ImagenTicket, ImagenReporte, Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las versiones WebP (miniatura y pantalla) de las imágenes de tickets y reportes "
+        "que aún no las tienen, en este mismo proceso, y los avatares de las fotos de perfil. "
+        "Normalmente las genera el worker (manage.py procesar_trabajos); esto sirve para reparar "
+        "o regenerar en bloque."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true',
+                            help='Regenerar también las imágenes y fotos que ya tienen versiones.')
+
+    def handle(self, *args, **options):
+        generadas = fallidas = 0
+        for modelo in (ImagenTicket, ImagenReporte):
+            imagenes = modelo.objects.order_by('id')
+            if not options['todas']:
+                imagenes = imagenes.filter(pantalla__isnull=True)
+            for imagen in imagenes.iterator(chunk_size=100):
+                if generar_versiones(imagen):
+                    generadas += 1
+                else:
+                    fallidas += 1
+                    self.stdout.write(self.style.WARNING(f"⚠️  {modelo.__name__} {imagen.id}: {imagen.imagen.name} no es una imagen legible"))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Versiones generadas para {generadas} imágenes ({fallidas} con error)"))
+
+        avatares = 0
+        usuarios = Usuario.objects.exclude(foto_perfil='').exclude(foto_perfil__isnull=True).order_by('id')
+        if not options['todas']:
+            usuarios = usuarios.filter(avatar__isnull=True)
+        for usuario in usuarios.iterator(chunk_size=100):
+            anteriores = [usuario.avatar.name, usuario.avatar_chico.name] if usuario.avatar else []
+            try:
+                with usuario.foto_perfil.open('rb') as foto:
+                    generado = generar_avatares(usuario, foto)
+            except FileNotFoundError:
+                generado = False
+            if not generado:
+                self.stdout.write(self.style.WARNING(f"⚠️  Usuario {usuario.id}: {usuario.foto_perfil.name} no es una imagen legible"))
+                continue
+            Usuario.objects.filter(id=usuario.id).update(avatar=usuario.avatar.name, avatar_chico=usuario.avatar_chico.name)
+            # update() no pasa por señales: el usuario en caché no tiene los avatares
+            invalidar_usuario(usuario.id)
+            for nombre in anteriores:
+                usuario.avatar.storage.delete(nombre)
+            avatares += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Avatares generados para {avatares} fotos de perfil"))
@@ -0,0 +1,119 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from usuarios.almacenamiento import eliminar_huerfano, nombres_referenciados
+
+GRACIA_HORAS_DEFAULT = 24
+# Nombres que se comprueban contra la base de datos por consulta
+LOTE_NOMBRES = 500
+
+
+def escanear_carpeta(ruta, prefijo):
+    """
+    Lista una carpeta sin bajar a sus subcarpetas. Devuelve (subcarpetas, archivos) con los
+    archivos como DirEntry y su nombre relativo a MEDIA_ROOT. Solo lee el disco: corre en los
+    hilos del pool y no toca la base de datos.
+    """
+    subcarpetas, archivos = [], []
+    with os.scandir(ruta) as entradas:
+        for entrada in entradas:
+            # Los enlaces simbólicos no se siguen ni se borran
+            if entrada.is_dir(follow_symlinks=False):
+                subcarpetas.append((entrada.path, f'{prefijo}{entrada.name}/'))
+            elif entrada.is_file(follow_symlinks=False):
+                archivos.append((prefijo + entrada.name, entrada))
+    return subcarpetas, archivos
+
+
+def huerfanos_en_lote(archivos, limite):
+    """
+    De un lote de archivos de una carpeta, los que ninguna fila usa: (recientes, huérfanos) con
+    los huérfanos como [(nombre, tamaño)]. Se consulta solo por los nombres del lote
+    """
+    en_uso = nombres_referenciados(nombre for nombre, _ in archivos)
+    recientes, huerfanos = 0, []
+    for nombre, entrada in archivos:
+        if nombre in en_uso:
+            continue
+        # scandir ya trae el tipo; el stat solo se pide para los candidatos
+        try:
+            estado = entrada.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+        if estado.st_mtime > limite:
+            recientes += 1
+            continue
+        huerfanos.append((nombre, estado.st_size))
+    return recientes, huerfanos
+
+
+class Command(BaseCommand):
+    help = (
+        "Busca en MEDIA_ROOT los archivos que ninguna fila usa (imágenes de tickets y reportes, "
+        "versiones, fotos de perfil) y borra los que tienen más del periodo de gracia. Recorre "
+        "las carpetas en paralelo con os.scandir y consulta la base de datos por lotes de nombres, "
+        "sin cargar en memoria todos los archivos en uso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo reportar los archivos huérfanos, sin borrarlos.')
+        parser.add_argument('--gracia-horas', type=float, default=GRACIA_HORAS_DEFAULT,
+                            help='No tocar archivos modificados en las últimas N horas (subidas en curso).')
+        parser.add_argument('--hilos', type=int, default=min(32, (os.cpu_count() or 1) * 4),
+                            help='Hilos que recorren carpetas a la vez.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        raiz = str(settings.MEDIA_ROOT)
+        inicio = time.monotonic()
+        # La fecha límite se fija antes de leer la base de datos: lo que se suba después es reciente
+        limite = time.time() - options['gracia_horas'] * 3600
+
+        if not os.path.isdir(raiz):
+            self.stdout.write(self.style.WARNING(f"⚠️  No existe MEDIA_ROOT ({raiz})"))
+            return
+
+        carpetas = revisados = recientes = huerfanos = borrados = 0
+        bytes_huerfanos = bytes_borrados = 0
+        with ThreadPoolExecutor(max_workers=max(options['hilos'], 1)) as pool:
+            pendientes = {pool.submit(escanear_carpeta, raiz, '')}
+            while pendientes:
+                listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    subcarpetas, archivos = futuro.result()
+                    carpetas += 1
+                    revisados += len(archivos)
+                    for ruta, prefijo in subcarpetas:
+                        pendientes.add(pool.submit(escanear_carpeta, ruta, prefijo))
+
+                    # Las consultas y los borrados van en este hilo, por lotes de la carpeta
+                    for inicio_lote in range(0, len(archivos), LOTE_NOMBRES):
+                        recientes_lote, candidatos = huerfanos_en_lote(archivos[inicio_lote:inicio_lote + LOTE_NOMBRES], limite)
+                        recientes += recientes_lote
+                        for nombre, tamano in candidatos:
+                            huerfanos += 1
+                            bytes_huerfanos += tamano
+                            if dry_run:
+                                if options['verbosity'] > 1:
+                                    self.stdout.write(f"   {nombre} ({filesizeformat(tamano)})")
+                            elif eliminar_huerfano(nombre, limite):
+                                borrados += 1
+                                bytes_borrados += tamano
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(
+            f"📊 {revisados} archivos en {carpetas} carpetas en {duracion:.1f} s "
+            f"({revisados / max(duracion, 0.001):.0f} archivos/s); {recientes} huérfanos recientes omitidos"
+        )
+        if dry_run:
+            self.stdout.write(f"Se borrarían {huerfanos} archivos huérfanos ({filesizeformat(bytes_huerfanos)})")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Borrados {borrados} archivos huérfanos ({filesizeformat(bytes_borrados)})"
+        ))
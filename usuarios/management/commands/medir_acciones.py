@@ -0,0 +1,123 @@
+import http.client
+import itertools
+import json
+import math
+import string
+import threading
+import time
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from usuarios.models import Ticket, Usuario
+
+
+def percentil(valores_ordenados, p):
+    return valores_ordenados[max(math.ceil(p / 100 * len(valores_ordenados)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de las acciones JSON del dashboard contra un servidor ya levantado: "
+        "varios clientes cambian la urgencia de sus tickets a la vez y se reportan peticiones "
+        "por segundo y latencias (p50/p99). Correrlo una vez contra el despliegue WSGI y otra "
+        "contra el ASGI, con la misma base de datos y el mismo número de procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='URL base del servidor a medir.')
+        parser.add_argument('--clientes', type=int, default=32,
+                            help='Clientes concurrentes (cada uno con su conexión y su ticket).')
+        parser.add_argument('--peticiones', type=int, default=2000,
+                            help='Total de peticiones entre todos los clientes.')
+        parser.add_argument('--admin', type=int,
+                            help='ID del admin con cuya sesión se hacen las peticiones. Por defecto el primero.')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise CommandError(f"URL inválida: {options['url']}")
+
+        admins = Usuario.objects.filter(rol='admin', admitido=True).order_by('id')
+        if options['admin']:
+            admins = admins.filter(id=options['admin'])
+        admin = admins.first()
+        if admin is None:
+            raise CommandError('No hay un admin admitido con el cual iniciar sesión')
+
+        clientes = max(options['clientes'], 1)
+        # Un ticket por cliente: se mide el servidor, no la espera por el bloqueo de una fila
+        tickets = Ticket.objects.bulk_create([
+            Ticket(titulo=f'Prueba de carga {numero}', descripcion='Creado por medir_acciones',
+                   categoria=Ticket.CATEGORIAS[0][0], usuario=admin)
+            for numero in range(clientes)
+        ])
+        sesion = import_module(settings.SESSION_ENGINE).SessionStore()
+        sesion['usuario_id'] = admin.id
+        sesion.create()
+        token = get_random_string(32, string.ascii_letters + string.digits)
+        cabeceras = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={sesion.session_key}; {settings.CSRF_COOKIE_NAME}={token}',
+            'X-CSRFToken': token,
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+
+        turnos = itertools.count()
+        latencias = []
+        errores = []
+        candado = threading.Lock()
+
+        def cliente(ticket):
+            Conexion = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+            conexion = Conexion(url.hostname, url.port, timeout=30)
+            ruta = url.path.rstrip('/') + reverse('cambiar_urgencia', args=[ticket.id])
+            propias = []
+            while next(turnos) < options['peticiones']:
+                cuerpo = urlencode({'urgencia': len(propias) % 4 + 1})
+                inicio = time.perf_counter()
+                try:
+                    conexion.request('POST', ruta, body=cuerpo, headers=cabeceras)
+                    respuesta = conexion.getresponse()
+                    datos = respuesta.read()
+                    if respuesta.status != 200 or not json.loads(datos).get('success'):
+                        raise ValueError(f'HTTP {respuesta.status}: {datos[:200]!r}')
+                except Exception as error:
+                    conexion.close()
+                    with candado:
+                        errores.append(str(error))
+                    continue
+                propias.append(time.perf_counter() - inicio)
+            conexion.close()
+            with candado:
+                latencias.extend(propias)
+
+        self.stdout.write(f"🏁 {options['peticiones']} peticiones con {clientes} clientes contra {options['url']}")
+        hilos = [threading.Thread(target=cliente, args=(ticket,)) for ticket in tickets]
+        inicio = time.perf_counter()
+        try:
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        finally:
+            duracion = time.perf_counter() - inicio
+            Ticket.objects.filter(id__in=[ticket.id for ticket in tickets]).delete()
+            sesion.delete()
+
+        if errores:
+            self.stdout.write(self.style.WARNING(f"⚠️  {len(errores)} peticiones fallidas; la primera: {errores[0]}"))
+        if not latencias:
+            raise CommandError('Ninguna petición tuvo éxito')
+
+        latencias.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(latencias) / duracion:.1f} peticiones/s en {duracion:.2f} s | "
+            f"p50 {percentil(latencias, 50) * 1000:.1f} ms, p99 {percentil(latencias, 99) * 1000:.1f} ms, "
+            f"máx {latencias[-1] * 1000:.1f} ms"
+        ))
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+
+
+def nucleos_disponibles():
+    """Núcleos que este proceso puede usar (respeta taskset/cgroups cuando el SO lo expone)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Los procesos del pool se crean con 'spawn' (no heredan la conexión a la base de datos del
+# padre) y arrancan sin Django configurado: este módulo no importa modelos al cargarse,
+# solo dentro de las funciones, después de django.setup()
+
+def _inicializar_proceso():
+    django.setup()
+
+
+def _procesar(trabajo_id):
+    from usuarios.trabajos import procesar_trabajo
+    return procesar_trabajo(trabajo_id)
+
+
+def _nuevo_pool(procesos):
+    return ProcessPoolExecutor(
+        max_workers=procesos,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_inicializar_proceso,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de trabajos en segundo plano (versiones de imágenes). Toma trabajos "
+        "de la tabla TrabajoImagen y los reparte en un pool de procesos, uno por núcleo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=nucleos_disponibles(),
+                            help='Procesos del pool (por defecto, los núcleos disponibles).')
+        parser.add_argument('--espera', type=float, default=2.0,
+                            help='Segundos entre consultas a la cola cuando está vacía.')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesar lo que haya en la cola y terminar.')
+
+    def handle(self, *args, **options):
+        from usuarios.trabajos import nombre_worker, recuperar_huerfanos, tomar_trabajos
+
+        procesos = max(options['procesos'], 1)
+        worker = nombre_worker()
+        self.stdout.write(f"👷 Worker {worker} con {procesos} procesos")
+
+        pool = _nuevo_pool(procesos)
+        try:
+            while True:
+                recuperados = recuperar_huerfanos()
+                if recuperados:
+                    self.stdout.write(self.style.WARNING(f"⚠️  {recuperados} trabajos huérfanos reencolados"))
+
+                # Dos trabajos por proceso: mientras uno termina, el siguiente ya está en cola
+                ids = tomar_trabajos(procesos * 2, worker)
+                if not ids:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['espera'])
+                    continue
+
+                try:
+                    self._ejecutar(pool, ids)
+                except BrokenProcessPool:
+                    # Un proceso murió (p. ej. por memoria); los trabajos en curso se reintentan
+                    self.stdout.write(self.style.ERROR("❌ El pool de procesos se cayó; se reinicia"))
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = _nuevo_pool(procesos)
+        except KeyboardInterrupt:
+            self.stdout.write("Deteniendo worker...")
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def _ejecutar(self, pool, ids):
+        from usuarios.trabajos import registrar_fallo
+
+        futuros = {pool.submit(_procesar, trabajo_id): trabajo_id for trabajo_id in ids}
+        roto = False
+        for futuro in as_completed(futuros):
+            trabajo_id = futuros[futuro]
+            try:
+                estatus = futuro.result()
+            except BrokenProcessPool as error:
+                registrar_fallo(trabajo_id, error)
+                roto = True
+                continue
+            except Exception as error:
+                registrar_fallo(trabajo_id, error)
+                estatus = 'error'
+            simbolo = '✅' if estatus == 'completado' else '⚠️ '
+            self.stdout.write(f"{simbolo} Trabajo {trabajo_id}: {estatus}")
+        if roto:
+            raise BrokenProcessPool()
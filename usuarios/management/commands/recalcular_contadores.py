@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.contadores import recalcular_contadores
+from usuarios.fragmentos import invalidar_todo
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye los contadores de tickets por usuario y por categoría a partir de la tabla "
+        "de tickets. Los triggers de la migración 0023 los mantienen al día; esto repara datos "
+        "cargados con los triggers desactivados (p. ej. restauraciones parciales)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo reportar cuántos contadores no coinciden, sin modificarlos.')
+
+    def handle(self, *args, **options):
+        diferencias = recalcular_contadores(dry_run=options['dry_run'])
+
+        if options['dry_run']:
+            self.stdout.write(f"Contadores que no coinciden: {diferencias}")
+            return
+
+        # Los badges del dashboard en caché se calcularon con los contadores anteriores
+        invalidar_todo()
+        self.stdout.write(self.style.SUCCESS(f"✅ Contadores reconstruidos ({diferencias} estaban desfasados)"))
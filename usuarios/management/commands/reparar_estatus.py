@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from usuarios.fragmentos import invalidar_todo
+from usuarios.models import Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        "Corrige tickets con estatus inconsistente con su asignación "
+        "(asignado en 'generado' o sin asignar en 'en_proceso'). "
+        "Desde la migración 0022 un trigger lo evita; esto repara datos importados o previos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo reportar los tickets inconsistentes, sin modificarlos.')
+
+    def handle(self, *args, **options):
+        asignados_generados = Ticket.objects.filter(asignado_a__isnull=False, estatus='generado')
+        libres_en_proceso = Ticket.objects.filter(asignado_a__isnull=True, estatus='en_proceso')
+
+        if options['dry_run']:
+            self.stdout.write(f"Asignados en 'generado': {asignados_generados.count()}")
+            self.stdout.write(f"Sin asignar en 'en_proceso': {libres_en_proceso.count()}")
+            return
+
+        with transaction.atomic():
+            corregidos_a_proceso = asignados_generados.update(estatus='en_proceso')
+            corregidos_a_generado = libres_en_proceso.update(estatus='generado')
+        # update() no dispara señales: descartar el HTML del dashboard en caché
+        invalidar_todo()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {corregidos_a_proceso} tickets pasaron a 'en_proceso' y "
+            f"{corregidos_a_generado} regresaron a 'generado'"
+        ))
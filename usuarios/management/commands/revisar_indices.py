@@ -0,0 +1,82 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from usuarios.consultas import consultas_dashboard
+from usuarios.models import Usuario
+
+# Patrones de "recorrido secuencial" en la salida de EXPLAIN de cada motor
+PATRONES_SEQ_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX)'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta EXPLAIN sobre cada consulta del dashboard y reporta las que no usan índice. '
+        'Los planes dependen del tamaño de las tablas: ejecútalo contra datos reales.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, action='append', dest='usuarios',
+                            help='ID de usuario a revisar (se puede repetir). Por defecto uno de cada rol.')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Usar EXPLAIN ANALYZE (solo PostgreSQL; ejecuta las consultas).')
+        parser.add_argument('--verbose-plan', action='store_true',
+                            help='Mostrar el plan completo de cada consulta.')
+        parser.add_argument('--fallar', action='store_true',
+                            help='Terminar con error si alguna consulta hace un recorrido secuencial.')
+
+    def handle(self, *args, **options):
+        patron = PATRONES_SEQ_SCAN.get(connection.vendor)
+        if patron is None:
+            raise CommandError(f'Motor de base de datos no soportado: {connection.vendor}')
+
+        if options['analyze'] and connection.vendor != 'postgresql':
+            raise CommandError('--analyze solo está disponible en PostgreSQL')
+
+        usuarios = self.obtener_usuarios(options['usuarios'])
+        if not usuarios:
+            raise CommandError('No hay usuarios admitidos para construir las consultas del dashboard')
+
+        explain_kwargs = {'analyze': True} if options['analyze'] else {}
+        sin_indice = []
+        revisadas = 0
+
+        for usuario in usuarios:
+            self.stdout.write(f'\n👤 {usuario} ({usuario.rol})')
+            for nombre, queryset in consultas_dashboard(usuario).items():
+                plan = queryset.explain(**explain_kwargs)
+                revisadas += 1
+                tablas = sorted(set(patron.findall(plan)))
+
+                if tablas:
+                    sin_indice.append((usuario.rol, nombre, tablas))
+                    self.stdout.write(self.style.WARNING(
+                        f'  ⚠️  {nombre}: recorrido secuencial en {", ".join(tablas)}'
+                    ))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'  ✅ {nombre}: usa índices'))
+
+                if options['verbose_plan']:
+                    for linea in plan.splitlines():
+                        self.stdout.write(f'      {linea}')
+
+        self.stdout.write(f'\n{revisadas - len(sin_indice)}/{revisadas} consultas usan índices')
+
+        if sin_indice and options['fallar']:
+            raise CommandError(f'{len(sin_indice)} consultas del dashboard no usan índices')
+
+    def obtener_usuarios(self, ids):
+        """Usuarios indicados por ID o, por defecto, el primero admitido de cada rol"""
+        if ids:
+            return list(Usuario.objects.filter(id__in=ids))
+
+        usuarios = []
+        for rol, _ in Usuario.ROLES:
+            usuario = Usuario.objects.filter(rol=rol, admitido=True).order_by('id').first()
+            if usuario:
+                usuarios.append(usuario)
+        return usuarios
@@ -0,0 +1,159 @@
+import heapq
+import math
+import random
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios.asignacion import ESTRATEGIAS, Candidato, obtener_estrategia
+from usuarios.models import Ticket, Usuario
+
+# Proporción de urgencias (Baja, Media, Alta, Crítica) en el flujo sintético
+PESOS_URGENCIA = (3, 4, 2, 1)
+
+
+class Persona:
+    """Alguien del equipo en la simulación: atiende un ticket a la vez, el más urgente primero"""
+
+    def __init__(self, id, velocidad):
+        self.id = id
+        self.velocidad = velocidad
+        self.cola = []
+        self.en_curso = None
+        self.libre_en = 0.0
+        self.carga = 0
+        self.ultimo_ticket = 0
+        self.finalizados = 0
+
+    def candidato(self):
+        return Candidato(self.id, self.carga, self.ultimo_ticket, self.finalizados)
+
+    def avanzar(self, hasta, esperas):
+        """Trabaja hasta el instante `hasta`: cierra lo terminado y empieza lo siguiente"""
+        while True:
+            if self.en_curso and self.en_curso[0] <= hasta:
+                fin, urgencia = self.en_curso
+                self.en_curso = None
+                self.libre_en = fin
+                self.carga -= urgencia
+                self.finalizados += 1
+            if self.en_curso is None and self.cola:
+                _, llegada, _, urgencia, horas = heapq.heappop(self.cola)
+                inicio = max(self.libre_en, llegada)
+                esperas.append((urgencia, inicio - llegada))
+                self.en_curso = (inicio + horas / self.velocidad, urgencia)
+                continue
+            return
+
+
+def percentil(valores_ordenados, p):
+    return valores_ordenados[max(math.ceil(p / 100 * len(valores_ordenados)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula la autoasignación de tickets con cada estrategia sobre el mismo flujo de tickets "
+        "y reporta el tiempo en cola (de la creación a que alguien empieza a atenderlo). El flujo "
+        "es sintético o, con --desde-bd, el historial de tickets y el equipo de sistemas reales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estrategia', action='append', dest='estrategias',
+                            help=f"Estrategia a simular (se puede repetir). Por defecto: {', '.join(ESTRATEGIAS)}.")
+        parser.add_argument('--desde-bd', action='store_true',
+                            help='Reproducir los tickets guardados (por categoría) con el equipo actual.')
+        parser.add_argument('--tickets', type=int, default=2000,
+                            help='Tickets del flujo sintético.')
+        parser.add_argument('--personas', type=int, default=4,
+                            help='Personas del equipo en el flujo sintético.')
+        parser.add_argument('--llegadas-por-hora', type=float, default=3.0,
+                            help='Tickets nuevos por hora en el flujo sintético.')
+        parser.add_argument('--horas-atencion', type=float, default=1.0,
+                            help='Horas promedio para atender un ticket (sintético, o sin historial).')
+        parser.add_argument('--semilla', type=int, default=1,
+                            help='Semilla del flujo y de las velocidades del equipo.')
+
+    def handle(self, *args, **options):
+        nombres = options['estrategias'] or list(ESTRATEGIAS)
+        try:
+            estrategias = {nombre: obtener_estrategia(nombre) for nombre in nombres}
+        except ImportError as error:
+            raise CommandError(f'Estrategia desconocida: {error}')
+
+        if options['desde_bd']:
+            flujo, equipos = self.flujo_bd(options)
+        else:
+            flujo, equipos = self.flujo_sintetico(options)
+        if not flujo:
+            raise CommandError('No hay tickets que simular (o ninguna categoría tiene equipo de sistemas)')
+
+        self.stdout.write(
+            f"🎲 {len(flujo)} tickets, {sum(len(e) for e in equipos.values())} personas en "
+            f"{len(equipos)} categoría(s). Espera en cola, en horas:"
+        )
+        for nombre, estrategia in estrategias.items():
+            self.reportar(nombre, self.simular(flujo, equipos, estrategia))
+
+    def flujo_sintetico(self, options):
+        """Llegadas de Poisson, urgencias según PESOS_URGENCIA y atención exponencial"""
+        azar = random.Random(options['semilla'])
+        # Velocidades distintas: la experiencia acumulada (finalizados) refleja quién es más rápido
+        equipo = [(numero + 1, azar.uniform(0.5, 1.5)) for numero in range(max(options['personas'], 1))]
+        flujo = []
+        reloj = 0.0
+        for _ in range(options['tickets']):
+            reloj += azar.expovariate(options['llegadas_por_hora'])
+            urgencia = azar.choices((1, 2, 3, 4), weights=PESOS_URGENCIA)[0]
+            flujo.append((reloj, 'simulada', urgencia, azar.expovariate(1 / options['horas_atencion'])))
+        return flujo, {'simulada': equipo}
+
+    def flujo_bd(self, options):
+        """Tickets en orden de creación; la atención de los finalizados es su tiempo real"""
+        equipos = defaultdict(list)
+        for usuario_id, categoria in Usuario.objects.filter(rol='sistemas', admitido=True).order_by('id').values_list('id', 'categoria_sistemas'):
+            equipos[categoria].append((usuario_id, 1.0))
+
+        flujo = []
+        inicio = None
+        filas = Ticket.objects.filter(categoria__in=list(equipos)).order_by('fecha_creacion', 'id').values_list(
+            'categoria', 'nivel_urgencia', 'estatus', 'fecha_creacion', 'fecha_edicion')
+        for categoria, urgencia, estatus, creado, editado in filas.iterator(chunk_size=2000):
+            inicio = inicio or creado
+            horas = (editado - creado).total_seconds() / 3600 if estatus == 'finalizado' else options['horas_atencion']
+            flujo.append(((creado - inicio).total_seconds() / 3600, categoria, urgencia, max(horas, 0.0)))
+        return flujo, dict(equipos)
+
+    def simular(self, flujo, equipos, estrategia):
+        equipo = {categoria: [Persona(id, velocidad) for id, velocidad in miembros] for categoria, miembros in equipos.items()}
+        esperas = []
+        for numero, (llegada, categoria, urgencia, horas) in enumerate(flujo, start=1):
+            personas = equipo[categoria]
+            for persona in personas:
+                persona.avanzar(llegada, esperas)
+            ticket = Ticket(id=numero, categoria=categoria, nivel_urgencia=urgencia)
+            elegido = estrategia(ticket, [persona.candidato() for persona in personas])
+            persona = next(p for p in personas if p.id == elegido.id)
+            persona.carga += urgencia
+            persona.ultimo_ticket = numero
+            heapq.heappush(persona.cola, (-urgencia, llegada, numero, urgencia, horas))
+
+        for personas in equipo.values():
+            for persona in personas:
+                persona.avanzar(math.inf, esperas)
+        return esperas
+
+    def reportar(self, nombre, esperas):
+        tiempos = sorted(espera for _, espera in esperas)
+        por_urgencia = defaultdict(list)
+        for urgencia, espera in esperas:
+            por_urgencia[urgencia].append(espera)
+        etiquetas = dict(Ticket.NIVELES_URGENCIA)
+        detalle = ', '.join(
+            f"{etiquetas[urgencia]} {sum(valores) / len(valores):.2f}"
+            for urgencia, valores in sorted(por_urgencia.items(), reverse=True)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"📊 {nombre}: media {sum(tiempos) / len(tiempos):.2f}, p50 {percentil(tiempos, 50):.2f}, "
+            f"p90 {percentil(tiempos, 90):.2f}, p99 {percentil(tiempos, 99):.2f}, máx {tiempos[-1]:.2f}"
+        ))
+        self.stdout.write(f"    media por urgencia: {detalle}")
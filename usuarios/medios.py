@@ -0,0 +1,257 @@
+import logging
+import mimetypes
+import os
+import re
+import time
+import zipfile
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .almacenamiento import TAMANO_BLOQUE, almacenamiento, es_blob
+from .models import ImagenReporte, ImagenTicket, Ticket, Usuario
+
+# Los blobs cambian de nombre si cambia su contenido: el navegador puede guardarlos para siempre.
+# El resto (archivos de antes de la conversión) se revalida con ETag en cada uso
+CACHE_BLOBS = 'private, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'private, no-cache'
+
+# Envío del archivo: None (lo manda Django), 'x-accel-redirect' (nginx) o 'x-sendfile' (Apache)
+MEDIA_ENVIO_DEFAULT = None
+# Location interna de nginx que apunta a MEDIA_ROOT (con `internal;`)
+MEDIA_PREFIJO_INTERNO_DEFAULT = '/media-interno/'
+
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Formatos que ya vienen comprimidos: en el ZIP se guardan tal cual (deflate no los achica y
+# gasta CPU). BMP sí se comprime
+SIN_COMPRIMIR = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+logger = logging.getLogger(__name__)
+
+
+def puede_ver_archivo(usuario, nombre):
+    """
+    Un archivo de media solo se sirve si algún registro lo usa y el usuario puede verlo:
+    las fotos de perfil cualquier usuario con sesión; las imágenes de tickets y reportes,
+    quien puede ver el ticket (Ticket.puede_verlo). Un blob puede estar en varios tickets.
+    """
+    if Usuario.objects.filter(Q(foto_perfil=nombre) | Q(avatar=nombre) | Q(avatar_chico=nombre)).exists():
+        return True
+    campos = Q(imagen=nombre) | Q(miniatura=nombre) | Q(pantalla=nombre)
+    imagenes_ticket = ImagenTicket.objects.filter(campos)
+    imagenes_reporte = ImagenReporte.objects.filter(campos)
+    if usuario.rol not in Ticket.ROLES_VEN_TODOS:
+        imagenes_ticket = imagenes_ticket.filter(Q(ticket__usuario=usuario) | Q(ticket__asignado_a=usuario))
+        imagenes_reporte = imagenes_reporte.filter(
+            Q(reporte__ticket__usuario=usuario) | Q(reporte__ticket__asignado_a=usuario)
+        )
+    return imagenes_ticket.exists() or imagenes_reporte.exists()
+
+
+def rango_solicitado(cabecera, tamano):
+    """
+    Interpreta un Range de un solo intervalo. Devuelve (inicio, fin) con ambos extremos
+    incluidos, None si hay que mandar el archivo completo (sin Range, varios intervalos o
+    sintaxis desconocida) o False si el intervalo queda fuera del archivo.
+    """
+    coincidencia = RANGO.match(cabecera.strip()) if cabecera else None
+    if coincidencia is None:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        # bytes=-N: los últimos N bytes
+        largo = int(fin)
+        if largo == 0 or tamano == 0:
+            return False
+        return max(tamano - largo, 0), tamano - 1
+    inicio = int(inicio)
+    fin = int(fin) if fin else None
+    if fin is not None and fin < inicio:
+        return None
+    if inicio >= tamano:
+        return False
+    return inicio, tamano - 1 if fin is None else min(fin, tamano - 1)
+
+
+def _etag(nombre, estado):
+    if es_blob(nombre):
+        # blobs/ab/cd/<sha256>.ext: el hash del contenido ya es un validador fuerte
+        return '"%s"' % os.path.splitext(os.path.basename(nombre))[0]
+    return '"%x-%x"' % (estado.st_mtime_ns, estado.st_size)
+
+
+def _leer_rango(ruta, inicio, largo):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        while largo > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, largo))
+            if not bloque:
+                break
+            largo -= len(bloque)
+            yield bloque
+
+
+def _enviar_por_proxy(envio, nombre, ruta):
+    """El servidor web manda los bytes (y atiende Range); Django solo autoriza"""
+    respuesta = HttpResponse()
+    if envio == 'x-accel-redirect':
+        prefijo = getattr(settings, 'MEDIA_PREFIJO_INTERNO', MEDIA_PREFIJO_INTERNO_DEFAULT)
+        respuesta['X-Accel-Redirect'] = prefijo + quote(nombre)
+    else:
+        respuesta['X-Sendfile'] = ruta
+    return respuesta
+
+
+def respuesta_archivo(request, nombre):
+    """
+    Respuesta para un archivo de media ya autorizado: ETag fuerte, Last-Modified, 304 con
+    If-None-Match/If-Modified-Since, 206 con Range de un intervalo (respetando If-Range) y,
+    si MEDIA_ENVIO lo indica, entrega por X-Accel-Redirect/X-Sendfile.
+    """
+    ruta = almacenamiento.path(nombre)
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        raise Http404('Archivo no encontrado')
+
+    etag = _etag(nombre, estado)
+    ultima_modificacion = int(estado.st_mtime)
+    cabeceras = {
+        'ETag': etag,
+        'Last-Modified': http_date(ultima_modificacion),
+        'Cache-Control': CACHE_BLOBS if es_blob(nombre) else CACHE_REVALIDAR,
+        'X-Content-Type-Options': 'nosniff',
+    }
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if respuesta is None:
+        respuesta = _respuesta_contenido(request, nombre, ruta, estado.st_size, cabeceras)
+    for cabecera, valor in cabeceras.items():
+        respuesta[cabecera] = valor
+    return respuesta
+
+
+def _respuesta_contenido(request, nombre, ruta, tamano, cabeceras):
+    tipo = mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+
+    envio = getattr(settings, 'MEDIA_ENVIO', MEDIA_ENVIO_DEFAULT)
+    if envio:
+        respuesta = _enviar_por_proxy(envio, nombre, ruta)
+        respuesta['Content-Type'] = tipo
+        return respuesta
+
+    cabeceras['Accept-Ranges'] = 'bytes'
+    rango = rango_solicitado(request.headers.get('Range'), tamano)
+    si_rango = request.headers.get('If-Range')
+    if rango is not None and si_rango and si_rango not in (cabeceras['ETag'], cabeceras['Last-Modified']):
+        # El archivo cambió desde la descarga parcial: se manda completo
+        rango = None
+
+    if rango is False:
+        respuesta = HttpResponse(status=416)
+        respuesta['Content-Range'] = f'bytes */{tamano}'
+        return respuesta
+    if rango is None:
+        return FileResponse(open(ruta, 'rb'), content_type=tipo)
+
+    inicio, fin = rango
+    respuesta = StreamingHttpResponse(_leer_rango(ruta, inicio, fin - inicio + 1), status=206, content_type=tipo)
+    respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    respuesta['Content-Length'] = str(fin - inicio + 1)
+    return respuesta
+
+
+class _SalidaZip:
+    """
+    Destino de solo escritura para zipfile. No tiene seek(), así que zipfile escribe los
+    tamaños en descriptores de datos después de cada archivo y nunca vuelve atrás: lo escrito
+    se puede mandar al cliente en cuanto llega.
+    """
+
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+def _nombre_en_zip(carpeta, nombre_archivo, usados):
+    """carpeta/nombre sin rutas del cliente y sin repetir: foto.jpg, foto (2).jpg…"""
+    base, extension = os.path.splitext(os.path.basename(nombre_archivo.replace('\\', '/')) or 'imagen')
+    nombre = f'{carpeta}/{base}{extension}'
+    copia = 1
+    while nombre in usados:
+        copia += 1
+        nombre = f'{carpeta}/{base} ({copia}){extension}'
+    usados.add(nombre)
+    return nombre
+
+
+def adjuntos_ticket(ticket):
+    """(carpeta en el ZIP, adjunto) de las imágenes del ticket y de su reporte de finalización"""
+    for imagen in ImagenTicket.objects.filter(ticket=ticket).order_by('id').iterator(chunk_size=100):
+        yield 'ticket', imagen
+    for imagen in ImagenReporte.objects.filter(reporte__ticket=ticket).order_by('id').iterator(chunk_size=100):
+        yield 'reporte', imagen
+
+
+def zip_adjuntos(adjuntos):
+    """
+    Genera los bytes de un ZIP con los originales de `adjuntos` ((carpeta, adjunto)) conforme
+    se leen del disco. La memoria no depende del tamaño del ticket: solo se retiene un bloque
+    de TAMANO_BLOQUE a la vez.
+    """
+    # Sin partes vacías: en transferencia chunked un bloque vacío marca el fin de la respuesta
+    return (parte for parte in _generar_zip(adjuntos) if parte)
+
+
+def _generar_zip(adjuntos):
+    salida = _SalidaZip()
+    usados = set()
+    with zipfile.ZipFile(salida, 'w') as archivo_zip:
+        for carpeta, adjunto in adjuntos:
+            ruta = almacenamiento.path(adjunto.imagen.name)
+            try:
+                estado = os.stat(ruta)
+                origen = open(ruta, 'rb')
+            except FileNotFoundError:
+                logger.warning('Adjunto sin archivo al armar el ZIP: %s', adjunto.imagen.name)
+                continue
+            with origen:
+                info = zipfile.ZipInfo(
+                    _nombre_en_zip(carpeta, adjunto.nombre_archivo or adjunto.imagen.name, usados),
+                    # ZIP no admite fechas anteriores a 1980
+                    date_time=time.localtime(max(estado.st_mtime, 315532800))[:6],
+                )
+                extension = os.path.splitext(adjunto.imagen.name)[1].lower()
+                info.compress_type = zipfile.ZIP_STORED if extension in SIN_COMPRIMIR else zipfile.ZIP_DEFLATED
+                # Con el tamaño conocido zipfile decide si necesita ZIP64 antes de escribir
+                info.file_size = estado.st_size
+                with archivo_zip.open(info, 'w') as destino:
+                    while bloque := origen.read(TAMANO_BLOQUE):
+                        destino.write(bloque)
+                        yield salida.vaciar()
+            yield salida.vaciar()
+    # Al cerrar el ZipFile se escribe el directorio central
+    yield salida.vaciar()
@@ -0,0 +1,105 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Usuario
+
+# Tiempo máximo que un usuario vive en caché aunque nadie lo invalide
+USUARIO_ACTUAL_TIMEOUT_DEFAULT = 300
+
+
+def _claves(usuario_id):
+    return f'usuarios:usuario:{usuario_id}:version', f'usuarios:usuario:{usuario_id}'
+
+
+def invalidar_usuario(usuario_id):
+    """Nueva versión del usuario: las entradas guardadas con la versión anterior dejan de valer"""
+    clave_version, _ = _claves(usuario_id)
+    cache.set(clave_version, time.time_ns(), timeout=None)
+
+
+def obtener_usuario(usuario_id):
+    """
+    Usuario por id desde la caché compartida; si no está o su versión cambió, lo lee de la
+    base de datos. Devuelve None si el usuario ya no existe.
+    """
+    clave_version, clave_usuario = _claves(usuario_id)
+    guardado = cache.get_many([clave_version, clave_usuario])
+    version = guardado.get(clave_version)
+    entrada = guardado.get(clave_usuario)
+    if version is not None and entrada is not None and entrada[0] == version:
+        return entrada[1]
+
+    # La versión se toma antes de leer la base de datos: si alguien invalida mientras tanto,
+    # la entrada se guarda con una versión vieja y la siguiente petición la ignora
+    if version is None:
+        version = time.time_ns()
+        cache.add(clave_version, version, timeout=None)
+
+    usuario = Usuario.objects.filter(id=usuario_id).first()
+    if usuario is not None:
+        timeout = getattr(settings, 'USUARIO_ACTUAL_TIMEOUT', USUARIO_ACTUAL_TIMEOUT_DEFAULT)
+        cache.set(clave_usuario, (version, usuario), timeout=timeout)
+    return usuario
+
+
+async def aobtener_usuario(usuario_id):
+    """obtener_usuario para vistas async: misma caché y mismas versiones, sin ocupar un hilo"""
+    clave_version, clave_usuario = _claves(usuario_id)
+    guardado = await cache.aget_many([clave_version, clave_usuario])
+    version = guardado.get(clave_version)
+    entrada = guardado.get(clave_usuario)
+    if version is not None and entrada is not None and entrada[0] == version:
+        return entrada[1]
+
+    if version is None:
+        version = time.time_ns()
+        await cache.aadd(clave_version, version, timeout=None)
+
+    usuario = await Usuario.objects.filter(id=usuario_id).afirst()
+    if usuario is not None:
+        timeout = getattr(settings, 'USUARIO_ACTUAL_TIMEOUT', USUARIO_ACTUAL_TIMEOUT_DEFAULT)
+        await cache.aset(clave_usuario, (version, usuario), timeout=timeout)
+    return usuario
+
+
+class UsuarioActualMiddleware:
+    """
+    Resuelve una sola vez por petición el usuario de la sesión en `request.usuario_actual`
+    (None si no hay sesión). Si el usuario fue eliminado, limpia la sesión para que las
+    vistas lo manden de nuevo al login.
+
+    Funciona síncrono (WSGI) y async (ASGI): bajo ASGI no obliga a pasar cada petición por
+    un hilo antes de llegar a las vistas async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.usuario_actual = None
+        usuario_id = request.session.get('usuario_id')
+        if usuario_id is not None:
+            request.usuario_actual = obtener_usuario(usuario_id)
+            if request.usuario_actual is None:
+                for clave in ('usuario_id', 'usuario_nombre', 'usuario_email'):
+                    request.session.pop(clave, None)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.usuario_actual = None
+        usuario_id = await request.session.aget('usuario_id')
+        if usuario_id is not None:
+            request.usuario_actual = await aobtener_usuario(usuario_id)
+            if request.usuario_actual is None:
+                for clave in ('usuario_id', 'usuario_nombre', 'usuario_email'):
+                    await request.session.apop(clave, None)
+        return await self.get_response(request)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0019_alter_ticket_nivel_urgencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['usuario', 'estatus', '-fecha_creacion'], name='ticket_usuario_estatus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['asignado_a', 'estatus', '-fecha_creacion'], name='ticket_asignado_estatus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('asignado_a__isnull', True), ('estatus', 'generado')), fields=['categoria', '-fecha_creacion'], name='ticket_cola_disponible_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('asignado_a__isnull', False), ('estatus__in', ['generado', 'en_proceso', 'en_espera'])), fields=['estatus', '-fecha_creacion'], name='ticket_abierto_asignado_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.2 on 2026-10-18 11:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Vector con pesos: título (A) > descripción (B) > observaciones (C), stemming en español
+VECTOR_TICKET = """
+    setweight(to_tsvector('spanish', coalesce({fila}.titulo, '')), 'A') ||
+    setweight(to_tsvector('spanish', coalesce({fila}.descripcion, '')), 'B') ||
+    setweight(to_tsvector('spanish', coalesce({fila}.observaciones, '')), 'C')
+"""
+
+SQL_CREAR = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    CREATE OR REPLACE FUNCTION usuarios_ticket_busqueda_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.busqueda := {VECTOR_TICKET.format(fila='NEW')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER usuarios_ticket_busqueda_actualizar
+    BEFORE INSERT OR UPDATE OF titulo, descripcion, observaciones, busqueda ON usuarios_ticket
+    FOR EACH ROW EXECUTE FUNCTION usuarios_ticket_busqueda_trigger()
+    """,
+    # Llenar el vector de los tickets existentes
+    f"UPDATE usuarios_ticket SET busqueda = {VECTOR_TICKET.format(fila='usuarios_ticket')}",
+    "CREATE INDEX ticket_busqueda_gin ON usuarios_ticket USING gin (busqueda)",
+    # Índice de trigramas para la búsqueda tolerante a errores en el título
+    "CREATE INDEX ticket_titulo_trgm ON usuarios_ticket USING gin (titulo gin_trgm_ops)",
+]
+
+SQL_ELIMINAR = [
+    "DROP INDEX IF EXISTS ticket_titulo_trgm",
+    "DROP INDEX IF EXISTS ticket_busqueda_gin",
+    "DROP TRIGGER IF EXISTS usuarios_ticket_busqueda_actualizar ON usuarios_ticket",
+    "DROP FUNCTION IF EXISTS usuarios_ticket_busqueda_trigger()",
+]
+
+
+def crear_busqueda_postgres(apps, schema_editor):
+    """Trigger, índices GIN y pg_trgm; en SQLite no hace nada (la búsqueda usa icontains)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_CREAR:
+        schema_editor.execute(sql)
+
+
+def eliminar_busqueda_postgres(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_ELIMINAR:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0020_ticket_indices_cola'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_busqueda_postgres, reverse_code=eliminar_busqueda_postgres),
+    ]
@@ -0,0 +1,87 @@
+# Mantiene en la base de datos la regla de Ticket.save():
+#   asignado_a con estatus 'generado'  -> 'en_proceso'
+#   sin asignado_a con 'en_proceso'    -> 'generado'
+# así también se cumple en queryset.update() y en el SET_NULL al eliminar usuarios,
+# y el dashboard ya no tiene que "sincronizar" estatus en cada GET.
+
+from django.db import migrations
+
+SQL_POSTGRES = [
+    """
+    CREATE OR REPLACE FUNCTION usuarios_ticket_estatus_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.asignado_a_id IS NOT NULL AND NEW.estatus = 'generado' THEN
+            NEW.estatus := 'en_proceso';
+        ELSIF NEW.asignado_a_id IS NULL AND NEW.estatus = 'en_proceso' THEN
+            NEW.estatus := 'generado';
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER usuarios_ticket_estatus_consistente
+    BEFORE INSERT OR UPDATE OF asignado_a_id, estatus ON usuarios_ticket
+    FOR EACH ROW EXECUTE FUNCTION usuarios_ticket_estatus_trigger()
+    """,
+]
+
+SQL_POSTGRES_REVERSA = [
+    "DROP TRIGGER IF EXISTS usuarios_ticket_estatus_consistente ON usuarios_ticket",
+    "DROP FUNCTION IF EXISTS usuarios_ticket_estatus_trigger()",
+]
+
+# SQLite no permite modificar NEW en un trigger BEFORE: se corrige la fila con un UPDATE posterior
+CORRECCION_SQLITE = """
+    WHEN (NEW.asignado_a_id IS NOT NULL AND NEW.estatus = 'generado')
+      OR (NEW.asignado_a_id IS NULL AND NEW.estatus = 'en_proceso')
+    BEGIN
+        UPDATE usuarios_ticket
+        SET estatus = CASE WHEN NEW.asignado_a_id IS NULL THEN 'generado' ELSE 'en_proceso' END
+        WHERE id = NEW.id;
+    END
+"""
+
+SQL_SQLITE = [
+    "CREATE TRIGGER usuarios_ticket_estatus_insert AFTER INSERT ON usuarios_ticket" + CORRECCION_SQLITE,
+    "CREATE TRIGGER usuarios_ticket_estatus_update AFTER UPDATE OF asignado_a_id, estatus ON usuarios_ticket"
+    + CORRECCION_SQLITE,
+]
+
+SQL_SQLITE_REVERSA = [
+    "DROP TRIGGER IF EXISTS usuarios_ticket_estatus_insert",
+    "DROP TRIGGER IF EXISTS usuarios_ticket_estatus_update",
+]
+
+
+def reparar_estatus(apps, schema_editor):
+    """Corrige los tickets que ya estén desincronizados antes de crear el trigger"""
+    Ticket = apps.get_model('usuarios', 'Ticket')
+    Ticket.objects.filter(asignado_a__isnull=False, estatus='generado').update(estatus='en_proceso')
+    Ticket.objects.filter(asignado_a__isnull=True, estatus='en_proceso').update(estatus='generado')
+
+
+def crear_trigger(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'postgresql': SQL_POSTGRES, 'sqlite': SQL_SQLITE}.get(vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+def eliminar_trigger(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'postgresql': SQL_POSTGRES_REVERSA, 'sqlite': SQL_SQLITE_REVERSA}.get(vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0021_ticket_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(reparar_estatus, reverse_code=migrations.RunPython.noop),
+        migrations.RunPython(crear_trigger, reverse_code=eliminar_trigger),
+    ]
@@ -0,0 +1,165 @@
+# Generated by Django 5.2.2 on 2026-10-18 11:51
+
+# Contadores de tickets por (usuario, rol, estatus) y (categoria, estatus).
+# Los mantienen triggers en usuarios_ticket (alta, baja y cambios de usuario, asignado_a,
+# categoria o estatus), así que quedan en la misma transacción que el cambio del ticket
+# y también cubren queryset.update(), el SET_NULL de asignado_a y el CASCADE al borrar usuarios.
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+# Suma `delta` a los tres contadores de una fila del ticket; {fila} es NEW u OLD
+UPSERT_CONTADORES = """
+    INSERT INTO usuarios_contadorusuario (usuario_id, rol, estatus, total)
+    VALUES ({usuario}, 'creador', {estatus}, {delta})
+    ON CONFLICT (usuario_id, rol, estatus)
+    DO UPDATE SET total = usuarios_contadorusuario.total + excluded.total;
+
+    INSERT INTO usuarios_contadorusuario (usuario_id, rol, estatus, total)
+    SELECT {asignado}, 'asignado', {estatus}, {delta} WHERE {asignado} IS NOT NULL
+    ON CONFLICT (usuario_id, rol, estatus)
+    DO UPDATE SET total = usuarios_contadorusuario.total + excluded.total;
+
+    INSERT INTO usuarios_contadorcategoria (categoria, estatus, total)
+    VALUES ({categoria}, {estatus}, {delta})
+    ON CONFLICT (categoria, estatus)
+    DO UPDATE SET total = usuarios_contadorcategoria.total + excluded.total;
+"""
+
+
+def upsert(fila, delta):
+    return UPSERT_CONTADORES.format(
+        usuario=f'{fila}.usuario_id', asignado=f'{fila}.asignado_a_id',
+        categoria=f'{fila}.categoria', estatus=f'{fila}.estatus', delta=delta,
+    )
+
+
+# Solo cuenta como cambio si se movió alguna columna que afecta a los contadores
+CAMBIO_POSTGRES = (
+    "(OLD.usuario_id, OLD.asignado_a_id, OLD.categoria, OLD.estatus) IS NOT DISTINCT FROM "
+    "(NEW.usuario_id, NEW.asignado_a_id, NEW.categoria, NEW.estatus)"
+)
+
+SQL_POSTGRES = [
+    f"""
+    CREATE OR REPLACE FUNCTION usuarios_ticket_contadores_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND {CAMBIO_POSTGRES} THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {upsert('OLD', -1)}
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {upsert('NEW', 1)}
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # AFTER: ve el estatus ya corregido por usuarios_ticket_estatus_consistente (BEFORE)
+    """
+    CREATE TRIGGER usuarios_ticket_contadores
+    AFTER INSERT OR DELETE OR UPDATE OF usuario_id, asignado_a_id, categoria, estatus ON usuarios_ticket
+    FOR EACH ROW EXECUTE FUNCTION usuarios_ticket_contadores_trigger()
+    """,
+]
+
+SQL_POSTGRES_REVERSA = [
+    "DROP TRIGGER IF EXISTS usuarios_ticket_contadores ON usuarios_ticket",
+    "DROP FUNCTION IF EXISTS usuarios_ticket_contadores_trigger()",
+]
+
+# En SQLite la corrección de estatus es un UPDATE posterior (0022) que vuelve a pasar
+# por el trigger de UPDATE, así que el resultado neto también queda bien
+SQL_SQLITE = [
+    f"CREATE TRIGGER usuarios_ticket_contadores_insert AFTER INSERT ON usuarios_ticket BEGIN {upsert('NEW', 1)} END",
+    f"CREATE TRIGGER usuarios_ticket_contadores_delete AFTER DELETE ON usuarios_ticket BEGIN {upsert('OLD', -1)} END",
+    f"""
+    CREATE TRIGGER usuarios_ticket_contadores_update
+    AFTER UPDATE OF usuario_id, asignado_a_id, categoria, estatus ON usuarios_ticket
+    WHEN OLD.usuario_id IS NOT NEW.usuario_id OR OLD.asignado_a_id IS NOT NEW.asignado_a_id
+      OR OLD.categoria IS NOT NEW.categoria OR OLD.estatus IS NOT NEW.estatus
+    BEGIN {upsert('OLD', -1)} {upsert('NEW', 1)} END
+    """,
+]
+
+SQL_SQLITE_REVERSA = [
+    "DROP TRIGGER IF EXISTS usuarios_ticket_contadores_insert",
+    "DROP TRIGGER IF EXISTS usuarios_ticket_contadores_delete",
+    "DROP TRIGGER IF EXISTS usuarios_ticket_contadores_update",
+]
+
+
+def llenar_contadores(apps, schema_editor):
+    """Calcula los contadores de los tickets existentes antes de crear los triggers"""
+    Ticket = apps.get_model('usuarios', 'Ticket')
+    ContadorUsuario = apps.get_model('usuarios', 'ContadorUsuario')
+    ContadorCategoria = apps.get_model('usuarios', 'ContadorCategoria')
+
+    contadores = [
+        ContadorUsuario(usuario_id=fila['usuario'], rol='creador', estatus=fila['estatus'], total=fila['total'])
+        for fila in Ticket.objects.values('usuario', 'estatus').annotate(total=Count('id')).order_by()
+    ]
+    contadores += [
+        ContadorUsuario(usuario_id=fila['asignado_a'], rol='asignado', estatus=fila['estatus'], total=fila['total'])
+        for fila in Ticket.objects.filter(asignado_a__isnull=False)
+        .values('asignado_a', 'estatus').annotate(total=Count('id')).order_by()
+    ]
+    ContadorUsuario.objects.bulk_create(contadores)
+    ContadorCategoria.objects.bulk_create([
+        ContadorCategoria(**fila)
+        for fila in Ticket.objects.values('categoria', 'estatus').annotate(total=Count('id')).order_by()
+    ])
+
+
+def crear_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'postgresql': SQL_POSTGRES, 'sqlite': SQL_SQLITE}.get(vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+def eliminar_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'postgresql': SQL_POSTGRES_REVERSA, 'sqlite': SQL_SQLITE_REVERSA}.get(vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0022_ticket_estatus_consistente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(choices=[('soporte_tecnico', 'Soporte Técnico'), ('infraestructura', 'Infraestructura'), ('desarrollo', 'Desarrollo')], max_length=20)),
+                ('estatus', models.CharField(choices=[('generado', 'Generado'), ('en_proceso', 'En Proceso'), ('cancelado', 'Cancelado'), ('en_espera', 'En espera'), ('finalizado', 'Finalizado')], max_length=20)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('categoria', 'estatus'), name='contador_categoria_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ContadorUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rol', models.CharField(choices=[('creador', 'Creador'), ('asignado', 'Asignado')], max_length=10)),
+                ('estatus', models.CharField(choices=[('generado', 'Generado'), ('en_proceso', 'En Proceso'), ('cancelado', 'Cancelado'), ('en_espera', 'En espera'), ('finalizado', 'Finalizado')], max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('usuario', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='contadores', to='usuarios.usuario')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'rol', 'estatus'), name='contador_usuario_unico')],
+            },
+        ),
+        migrations.RunPython(llenar_contadores, reverse_code=migrations.RunPython.noop),
+        migrations.RunPython(crear_triggers, reverse_code=eliminar_triggers),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.2 on 2026-10-18 11:58
+
+# orden_estatus pasa de ser un Case() evaluado en cada consulta a una columna generada
+# (STORED) que la base de datos recalcula en cada escritura, incluido queryset.update().
+# Los índices del dashboard se rehacen para terminar en el orden de las listas.
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+def recrear_triggers_sqlite(apps, schema_editor):
+    """
+    En SQLite agregar una columna generada reconstruye la tabla y se pierden sus triggers
+    (0022 y 0023); en PostgreSQL es un ALTER TABLE y los triggers siguen ahí.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for nombre in ('0022_ticket_estatus_consistente', '0023_contadores_tickets'):
+        migracion = import_module(f'usuarios.migrations.{nombre}')
+        for sql in migracion.SQL_SQLITE_REVERSA + migracion.SQL_SQLITE:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0023_contadores_tickets'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_usuario_estatus_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_asignado_estatus_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_cola_disponible_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_abierto_asignado_idx',
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='orden_estatus',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(estatus='generado', then=models.Value(1)), models.When(estatus='en_espera', then=models.Value(2)), models.When(estatus='en_proceso', then=models.Value(3)), models.When(estatus='finalizado', then=models.Value(4)), models.When(estatus='cancelado', then=models.Value(5)), default=models.Value(6)), output_field=models.SmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['usuario', 'orden_estatus', '-fecha_creacion', '-id'], name='ticket_usuario_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['asignado_a', 'orden_estatus', '-fecha_creacion', '-id'], name='ticket_asignado_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('asignado_a__isnull', True), ('estatus', 'generado')), fields=['categoria', 'orden_estatus', '-fecha_creacion', '-id'], name='ticket_cola_disponible_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('estatus__in', ['en_proceso', 'en_espera'])), fields=['orden_estatus', '-fecha_creacion', '-id'], name='ticket_en_curso_idx'),
+        ),
+        migrations.RunPython(recrear_triggers_sqlite, reverse_code=recrear_triggers_sqlite),
+    ]
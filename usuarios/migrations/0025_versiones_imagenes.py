@@ -0,0 +1,93 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0024_ticket_orden_estatus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='miniatura',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='miniatura_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='miniatura_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='pantalla',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='pantalla_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='pantalla_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='miniatura',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='miniatura_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='miniatura_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='pantalla',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='pantalla_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='pantalla_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def encolar_existentes(apps, schema_editor):
+    """Las imágenes que ya tienen versiones quedan listas; las demás se encolan para el worker"""
+    TrabajoImagen = apps.get_model('usuarios', 'TrabajoImagen')
+    for modelo, nombre in (('ticket', 'ImagenTicket'), ('reporte', 'ImagenReporte')):
+        Imagen = apps.get_model('usuarios', nombre)
+        Imagen.objects.filter(pantalla__isnull=False).update(estado_versiones='lista')
+        pendientes = Imagen.objects.filter(pantalla__isnull=True).values_list('id', flat=True)
+        TrabajoImagen.objects.bulk_create(
+            [TrabajoImagen(modelo=modelo, imagen_id=imagen_id) for imagen_id in pendientes.iterator()],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0025_versiones_imagenes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenreporte',
+            name='estado_versiones',
+            field=models.CharField(choices=[('pendiente', 'Procesando'), ('lista', 'Lista'), ('fallida', 'Fallida')], default='pendiente', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='imagenticket',
+            name='estado_versiones',
+            field=models.CharField(choices=[('pendiente', 'Procesando'), ('lista', 'Lista'), ('fallida', 'Fallida')], default='pendiente', editable=False, max_length=10),
+        ),
+        migrations.CreateModel(
+            name='TrabajoImagen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('ticket', 'Imagen de ticket'), ('reporte', 'Imagen de reporte')], max_length=10)),
+                ('imagen_id', models.PositiveIntegerField()),
+                ('estatus', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=12)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tomado_por', models.CharField(blank=True, max_length=100)),
+                ('tomado_en', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_edicion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('estatus', 'pendiente')), fields=['disponible_en', 'id'], name='trabajo_pendiente_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estatus__in', ['pendiente', 'procesando'])), fields=('modelo', 'imagen_id'), name='trabajo_imagen_activo_unico')],
+            },
+        ),
+        migrations.RunPython(encolar_existentes, migrations.RunPython.noop),
+    ]
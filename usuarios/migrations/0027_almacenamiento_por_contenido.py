@@ -0,0 +1,60 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:06
+
+import usuarios.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0026_cola_trabajos_imagen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoContenido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='imagenreporte',
+            name='imagen',
+            field=models.ImageField(storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to='reportes/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='imagenreporte',
+            name='miniatura',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='imagenreporte',
+            name='pantalla',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='imagenticket',
+            name='imagen',
+            field=models.ImageField(storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to='tickets/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='imagenticket',
+            name='miniatura',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='imagenticket',
+            name='pantalla',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='usuario',
+            name='foto_perfil',
+            field=models.ImageField(blank=True, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to='fotos_perfil/'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:12
+
+import usuarios.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0027_almacenamiento_por_contenido'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagenreporte',
+            name='imagen',
+            field=models.ImageField(db_index=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to='reportes/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='imagenreporte',
+            name='miniatura',
+            field=models.ImageField(blank=True, db_index=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='imagenreporte',
+            name='pantalla',
+            field=models.ImageField(blank=True, db_index=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='imagenticket',
+            name='imagen',
+            field=models.ImageField(db_index=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to='tickets/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='imagenticket',
+            name='miniatura',
+            field=models.ImageField(blank=True, db_index=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='imagenticket',
+            name='pantalla',
+            field=models.ImageField(blank=True, db_index=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='usuario',
+            name='foto_perfil',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to='fotos_perfil/'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:15
+
+import usuarios.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0028_indices_archivos_medios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='avatar',
+            field=models.ImageField(blank=True, db_index=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='avatar_chico',
+            field=models.ImageField(blank=True, db_index=True, editable=False, max_length=255, null=True, storage=usuarios.almacenamiento.almacenamiento_adjuntos, upload_to=''),
+        ),
+    ]
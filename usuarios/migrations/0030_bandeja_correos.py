@@ -0,0 +1,36 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0029_avatares_usuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo', models.TextField()),
+                ('remitente', models.CharField(max_length=255)),
+                ('destinatarios', models.JSONField()),
+                ('estatus', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Enviando'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=12)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tomado_por', models.CharField(blank=True, max_length=100)),
+                ('tomado_en', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_edicion', models.DateTimeField(auto_now=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('estatus', 'pendiente')), fields=['disponible_en', 'id'], name='correo_pendiente_idx')],
+            },
+        ),
+    ]
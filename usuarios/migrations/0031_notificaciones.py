@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0030_bandeja_correos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='notificaciones',
+            field=models.CharField(choices=[('inmediata', 'Un correo por ticket'), ('resumen', 'Resumen periódico'), ('ninguna', 'No recibir')], default='inmediata', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='NotificacionPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evento', models.CharField(choices=[('ticket_nuevo', 'Ticket nuevo')], max_length=20)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='usuarios.ticket')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_pendientes', to='usuarios.usuario')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0031_notificaciones'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('asignado_a__isnull', True), ('estatus', 'generado')), fields=['categoria', '-nivel_urgencia', 'fecha_creacion', 'id'], name='ticket_siguiente_idx'),
+        ),
+    ]
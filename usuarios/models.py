@@ -1,5 +1,9 @@
 from django.db import models
+from django.utils import timezone
+
+from .almacenamiento import almacenamiento_adjuntos
 from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.postgres.search import SearchVectorField
 # Create your models here.
 
 
@@ -15,6 +19,12 @@ class Usuario(models.Model):
         ('infraestructura', 'Infraestructura'),
         ('desarrollo', 'Desarrollo'),
     )
+
+    NOTIFICACIONES = (
+        ('inmediata', 'Un correo por ticket'),
+        ('resumen', 'Resumen periódico'),
+        ('ninguna', 'No recibir'),
+    )
     
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100)
@@ -23,7 +33,27 @@ class Usuario(models.Model):
     rol = models.CharField(max_length=20, choices=ROLES, default='usuario')
     categoria_sistemas = models.CharField(max_length=20, choices=CATEGORIAS_SISTEMAS, blank=True, null=True)
     admitido = models.BooleanField(default=False) 
-    foto_perfil = models.ImageField(upload_to='fotos_perfil/', blank=True, null=True)
+    # Avisos de tickets nuevos de su categoría (sistemas) o de todas (admin)
+    notificaciones = models.CharField(max_length=10, choices=NOTIFICACIONES, default='inmediata')
+    foto_perfil = models.ImageField(upload_to='fotos_perfil/', storage=almacenamiento_adjuntos, blank=True, null=True, db_index=True)
+    # Recortes cuadrados WebP de la foto a tamaño fijo (usuarios.imagenes.AVATARES): barra
+    # lateral y listas. Sin ellos las plantillas usan la foto original
+    avatar = models.ImageField(max_length=255, storage=almacenamiento_adjuntos, blank=True, null=True, editable=False, db_index=True)
+    avatar_chico = models.ImageField(max_length=255, storage=almacenamiento_adjuntos, blank=True, null=True, editable=False, db_index=True)
+
+    CAMPOS_FOTO = ('foto_perfil', 'avatar', 'avatar_chico')
+
+    @property
+    def url_avatar(self):
+        return self.avatar.url if self.avatar else self.foto_perfil.url
+
+    @property
+    def url_avatar_chico(self):
+        return self.avatar_chico.url if self.avatar_chico else self.url_avatar
+
+    def archivos_foto(self):
+        """Nombres de la foto y sus avatares, para liberarlos al cambiarla o eliminar al usuario"""
+        return [getattr(self, campo).name for campo in self.CAMPOS_FOTO if getattr(self, campo)]
     
     def set_password(self, raw_password):
         self.password = make_password(raw_password)
@@ -71,15 +101,63 @@ class Ticket(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='tickets_creados')
     asignado_a = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='tickets_asignados')
     asignado_por_admin = models.BooleanField(default=False)
-    
+    # Vector de búsqueda (título, descripción y observaciones). En PostgreSQL lo mantiene
+    # un trigger en cada escritura; en SQLite queda vacío y la búsqueda usa icontains
+    busqueda = SearchVectorField(null=True, editable=False)
+    # Orden de estatus de las listas del dashboard. Columna generada por la base de datos,
+    # así que sigue al estatus también en queryset.update() y en los triggers
+    orden_estatus = models.GeneratedField(
+        expression=models.Case(
+            models.When(estatus='generado', then=models.Value(1)),
+            models.When(estatus='en_espera', then=models.Value(2)),
+            models.When(estatus='en_proceso', then=models.Value(3)),
+            models.When(estatus='finalizado', then=models.Value(4)),
+            models.When(estatus='cancelado', then=models.Value(5)),
+            default=models.Value(6),
+        ),
+        output_field=models.SmallIntegerField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        # Índices para los filtros del dashboard, aceptar_ticket y asignar_ticket. Terminan en
+        # el orden de las listas (orden_estatus, -fecha_creacion, -id), así cada página es un
+        # recorrido de rango del índice sin ordenar en memoria
+        indexes = [
+            # Mis tickets creados
+            models.Index(fields=['usuario', 'orden_estatus', '-fecha_creacion', '-id'], name='ticket_usuario_orden_idx'),
+            # Tickets asignados
+            models.Index(fields=['asignado_a', 'orden_estatus', '-fecha_creacion', '-id'], name='ticket_asignado_orden_idx'),
+            # Cola de disponibles (parcial): solo tickets sin asignar en 'generado'
+            models.Index(
+                fields=['categoria', 'orden_estatus', '-fecha_creacion', '-id'],
+                name='ticket_cola_disponible_idx',
+                condition=models.Q(asignado_a__isnull=True, estatus='generado'),
+            ),
+            # Siguiente ticket de la cola (parcial): más urgente y más antiguo primero
+            models.Index(
+                fields=['categoria', '-nivel_urgencia', 'fecha_creacion', 'id'],
+                name='ticket_siguiente_idx',
+                condition=models.Q(asignado_a__isnull=True, estatus='generado'),
+            ),
+            # Tickets en curso (parcial): pestaña "Todos los tickets"
+            models.Index(
+                fields=['orden_estatus', '-fecha_creacion', '-id'],
+                name='ticket_en_curso_idx',
+                condition=models.Q(estatus__in=['en_proceso', 'en_espera']),
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         """Mantener consistencia automática de estatus"""
+        # La misma regla la aplica un trigger en la base de datos (migración 0022)
+        # para que también se cumpla en queryset.update() y en el SET_NULL de asignado_a
         # Si tiene asignado_a pero está en 'generado', cambiarlo a 'en_proceso'
-        if self.asignado_a and self.estatus == 'generado':
+        if self.asignado_a_id and self.estatus == 'generado':
             self.estatus = 'en_proceso'
         
         # Si no tiene asignado_a y está 'en_proceso', regresarlo a 'generado'
-        elif not self.asignado_a and self.estatus == 'en_proceso':
+        elif not self.asignado_a_id and self.estatus == 'en_proceso':
             self.estatus = 'generado'
         
         super().save(*args, **kwargs)
@@ -89,6 +167,17 @@ class Ticket(models.Model):
     
     def esta_finalizado(self):
         return self.estatus in ['cancelado', 'finalizado']
+
+    # Roles que pueden ver cualquier ticket; el resto solo los que creó o tiene asignados
+    ROLES_VEN_TODOS = ('admin', 'sistemas')
+
+    def puede_verlo(self, usuario):
+        """El creador, el asignado y los admin/sistemas pueden ver el ticket"""
+        return (
+            self.usuario_id == usuario.id or
+            self.asignado_a_id == usuario.id or
+            usuario.rol in self.ROLES_VEN_TODOS
+        )
     
     # 🆕 NUEVOS MÉTODOS ÚTILES
     def get_urgencia_display_with_number(self):
@@ -98,9 +187,62 @@ class Ticket(models.Model):
     def get_urgencia_color_class(self):
         """Devuelve la clase CSS para el color"""
         return f"urgency-{self.nivel_urgencia}"
-class ImagenTicket(models.Model):
+
+class ImagenConVersiones(models.Model):
+    """
+    Adjunto de imagen con versiones WebP reducidas (miniatura y pantalla) que genera
+    usuarios.imagenes. Mientras no existan, las plantillas usan el original.
+    """
+    ESTADOS_VERSIONES = (
+        ('pendiente', 'Procesando'),
+        ('lista', 'Lista'),
+        ('fallida', 'Fallida'),
+    )
+
+    # Las versiones las genera el worker (manage.py procesar_trabajos) fuera de la petición
+    estado_versiones = models.CharField(max_length=10, choices=ESTADOS_VERSIONES, default='pendiente', editable=False)
+    ancho = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    alto = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    miniatura = models.ImageField(max_length=255, storage=almacenamiento_adjuntos, blank=True, null=True, editable=False, db_index=True)
+    miniatura_ancho = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    miniatura_alto = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    pantalla = models.ImageField(max_length=255, storage=almacenamiento_adjuntos, blank=True, null=True, editable=False, db_index=True)
+    pantalla_ancho = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    pantalla_alto = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def url_miniatura(self):
+        return self.miniatura.url if self.miniatura else self.imagen.url
+
+    @property
+    def url_pantalla(self):
+        return self.pantalla.url if self.pantalla else self.imagen.url
+
+    @property
+    def srcset(self):
+        """Candidatos para <img srcset>; vacío si aún no hay versiones"""
+        if not (self.miniatura and self.pantalla):
+            return ''
+        return f'{self.miniatura.url} {self.miniatura_ancho}w, {self.pantalla.url} {self.pantalla_ancho}w'
+
+    def eliminar_versiones(self):
+        for campo in (self.miniatura, self.pantalla):
+            if campo:
+                campo.storage.delete(campo.name)
+
+    def eliminar_archivos(self):
+        """Libera el original y sus versiones; la señal post_delete lo llama al eliminar el registro"""
+        self.eliminar_versiones()
+        if self.imagen:
+            self.imagen.storage.delete(self.imagen.name)
+
+
+class ImagenTicket(ImagenConVersiones):
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='imagenes')
-    imagen = models.ImageField(upload_to='tickets/%Y/%m/')  # Organiza por año/mes
+    imagen = models.ImageField(upload_to='tickets/%Y/%m/', storage=almacenamiento_adjuntos, db_index=True)  # Se guarda por contenido (blobs/)
     nombre_archivo = models.CharField(max_length=255)
     
     def __str__(self):
@@ -119,9 +261,9 @@ class ReporteFinalizacion(models.Model):
     def __str__(self):
         return f"Reporte de {self.ticket.titulo}"
 
-class ImagenReporte(models.Model):
+class ImagenReporte(ImagenConVersiones):
     reporte = models.ForeignKey(ReporteFinalizacion, on_delete=models.CASCADE, related_name='imagenes')
-    imagen = models.ImageField(upload_to='reportes/%Y/%m/')  # Organiza por año/mes
+    imagen = models.ImageField(upload_to='reportes/%Y/%m/', storage=almacenamiento_adjuntos, db_index=True)  # Se guarda por contenido (blobs/)
     nombre_archivo = models.CharField(max_length=255)
     
     def __str__(self):
@@ -144,4 +286,161 @@ class CancelacionTicket(models.Model):
     cancelado_por = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     
     def __str__(self):
-        return f"Cancelación de {self.ticket.titulo}"
\ No newline at end of file
+        return f"Cancelación de {self.ticket.titulo}"
+
+# CONTADORES DE TICKETS (los mantienen triggers de la base de datos, migración 0023)
+class ContadorUsuario(models.Model):
+    """Cuántos tickets tiene un usuario por rol (creador o asignado) y estatus"""
+    ROLES = (
+        ('creador', 'Creador'),
+        ('asignado', 'Asignado'),
+    )
+
+    # Sin FK real: los triggers pueden descontar tickets mientras se elimina el usuario. Sus
+    # filas las borra la señal post_delete de Usuario y recalcular_contadores las huérfanas
+    usuario = models.ForeignKey(Usuario, on_delete=models.DO_NOTHING, db_constraint=False, related_name='contadores')
+    rol = models.CharField(max_length=10, choices=ROLES)
+    estatus = models.CharField(max_length=20, choices=Ticket.ESTATUS)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'rol', 'estatus'], name='contador_usuario_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.rol} {self.estatus}: {self.total}"
+
+
+class ContadorCategoria(models.Model):
+    """Cuántos tickets hay por categoría y estatus ('generado' es la cola sin asignar)"""
+    categoria = models.CharField(max_length=20, choices=Ticket.CATEGORIAS)
+    estatus = models.CharField(max_length=20, choices=Ticket.ESTATUS)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['categoria', 'estatus'], name='contador_categoria_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.categoria} {self.estatus}: {self.total}"
+
+
+# COLA DE TRABAJOS EN SEGUNDO PLANO (la procesa manage.py procesar_trabajos)
+class TrabajoImagen(models.Model):
+    """Generar las versiones de una imagen adjunta fuera del hilo de la petición"""
+    MODELOS = (
+        ('ticket', 'Imagen de ticket'),
+        ('reporte', 'Imagen de reporte'),
+    )
+
+    ESTATUS = (
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    )
+
+    modelo = models.CharField(max_length=10, choices=MODELOS)
+    imagen_id = models.PositiveIntegerField()
+    estatus = models.CharField(max_length=12, choices=ESTATUS, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    # No se toma antes de esta fecha (espera entre reintentos)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    tomado_por = models.CharField(max_length=100, blank=True)
+    tomado_en = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_edicion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Lo que el worker busca en cada vuelta: pendientes ya disponibles, los más viejos primero
+            models.Index(
+                fields=['disponible_en', 'id'],
+                name='trabajo_pendiente_idx',
+                condition=models.Q(estatus='pendiente'),
+            ),
+        ]
+        constraints = [
+            # A lo más un trabajo activo por imagen: volver a encolar no duplica el trabajo
+            models.UniqueConstraint(
+                fields=['modelo', 'imagen_id'],
+                name='trabajo_imagen_activo_unico',
+                condition=models.Q(estatus__in=['pendiente', 'procesando']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} {self.imagen_id}: {self.estatus}"
+
+
+# ALMACENAMIENTO POR CONTENIDO (usuarios.almacenamiento)
+class ArchivoContenido(models.Model):
+    """Un archivo guardado una sola vez por su SHA-256 y cuántos campos lo usan"""
+    nombre = models.CharField(max_length=255, unique=True)  # blobs/ab/cd/<sha256>.<ext>
+    sha256 = models.CharField(max_length=64, db_index=True)
+    tamano = models.PositiveBigIntegerField()
+    referencias = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.referencias} referencias)"
+
+
+# BANDEJA DE SALIDA DE CORREOS (la vacía manage.py enviar_correos)
+class CorreoSaliente(models.Model):
+    """
+    Correo por enviar. Se escribe en la misma transacción que el cambio que lo origina: si la
+    transacción se revierte no se manda nada, y si se confirma el correo no se pierde aunque
+    el servidor de correo esté caído.
+    """
+    ESTATUS = (
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    )
+
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+    remitente = models.CharField(max_length=255)
+    destinatarios = models.JSONField()
+    estatus = models.CharField(max_length=12, choices=ESTATUS, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    tomado_por = models.CharField(max_length=100, blank=True)
+    tomado_en = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_edicion = models.DateTimeField(auto_now=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['disponible_en', 'id'],
+                name='correo_pendiente_idx',
+                condition=models.Q(estatus='pendiente'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} -> {', '.join(self.destinatarios)}: {self.estatus}"
+
+
+# NOTIFICACIONES (usuarios.notificaciones)
+class NotificacionPendiente(models.Model):
+    """Evento que espera el próximo resumen de un usuario con notificaciones='resumen'"""
+    EVENTOS = (
+        ('ticket_nuevo', 'Ticket nuevo'),
+    )
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='notificaciones_pendientes')
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE)
+    evento = models.CharField(max_length=20, choices=EVENTOS)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.evento} {self.ticket_id}"
@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+
+from .models import CorreoSaliente, NotificacionPendiente, Usuario
+
+# Eventos que se toman por resumen; el resto queda para la siguiente vuelta
+MAX_EVENTOS_RESUMEN = 5000
+
+
+def destinatarios_ticket_nuevo(ticket):
+    """
+    (id, email, preferencia) de quienes se enteran de un ticket nuevo: el equipo de sistemas
+    de su categoría y los admin, salvo el creador y quienes no quieren avisos. Una consulta
+    """
+    return list(
+        Usuario.objects.filter(admitido=True)
+        .filter(Q(rol='sistemas', categoria_sistemas=ticket.categoria) | Q(rol='admin'))
+        .exclude(id=ticket.usuario_id)
+        .exclude(notificaciones='ninguna')
+        .values_list('id', 'email', 'notificaciones')
+    )
+
+
+def notificar_ticket_nuevo(ticket):
+    """
+    Reparte el aviso de un ticket nuevo. Llamarlo dentro de la transacción que lo crea: los
+    correos inmediatos van a la bandeja de salida y los de quienes prefieren resumen quedan
+    como NotificacionPendiente. El texto se arma una sola vez para todos los destinatarios
+    """
+    destinatarios = destinatarios_ticket_nuevo(ticket)
+    inmediatos = [email for _, email, preferencia in destinatarios if preferencia == 'inmediata']
+    if inmediatos:
+        asunto = f'Ticket nuevo en {ticket.get_categoria_display()}: {ticket.titulo}'
+        cuerpo = render_to_string('usuarios/correos/ticket_nuevo.txt', {'ticket': ticket})
+        # Un correo por destinatario para no mostrar las direcciones de los demás
+        CorreoSaliente.objects.bulk_create([
+            CorreoSaliente(asunto=asunto, cuerpo=cuerpo, remitente=settings.DEFAULT_FROM_EMAIL, destinatarios=[email])
+            for email in inmediatos
+        ])
+    NotificacionPendiente.objects.bulk_create([
+        NotificacionPendiente(usuario_id=usuario_id, ticket=ticket, evento='ticket_nuevo')
+        for usuario_id, _, preferencia in destinatarios if preferencia == 'resumen'
+    ])
+    return len(destinatarios)
+
+
+def enviar_resumenes():
+    """
+    Junta las notificaciones pendientes en un correo por usuario y las borra, todo en una
+    transacción. Los datos de cada ticket se arman una vez aunque estén en varios resúmenes.
+    Devuelve (correos encolados, eventos incluidos)
+    """
+    with transaction.atomic():
+        pendientes = list(
+            NotificacionPendiente.objects.select_for_update(of=('self',))
+            .select_related('usuario', 'ticket__usuario')
+            .order_by('usuario_id', 'id')[:MAX_EVENTOS_RESUMEN]
+        )
+        if not pendientes:
+            return 0, 0
+
+        por_usuario = defaultdict(list)
+        for pendiente in pendientes:
+            por_usuario[pendiente.usuario].append(pendiente.ticket)
+
+        bloques = {}
+        correos = []
+        for usuario, tickets in por_usuario.items():
+            # Quien cambió a 'inmediata' o 'ninguna' después del evento ya no recibe el resumen
+            if usuario.notificaciones != 'resumen':
+                continue
+            for ticket in tickets:
+                if ticket.id not in bloques:
+                    bloques[ticket.id] = render_to_string('usuarios/correos/datos_ticket.txt', {'ticket': ticket})
+            cuerpo = render_to_string('usuarios/correos/resumen.txt', {
+                'total': len(tickets),
+                'detalle': '\n'.join(bloques[ticket.id] for ticket in tickets),
+            })
+            correos.append(CorreoSaliente(
+                asunto=f'Resumen: {len(tickets)} ticket(s) nuevo(s)',
+                cuerpo=cuerpo,
+                remitente=settings.DEFAULT_FROM_EMAIL,
+                destinatarios=[usuario.email],
+            ))
+
+        CorreoSaliente.objects.bulk_create(correos)
+        NotificacionPendiente.objects.filter(id__in=[pendiente.id for pendiente in pendientes]).delete()
+    return len(correos), len(pendientes)
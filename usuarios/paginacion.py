@@ -0,0 +1,234 @@
+import json
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+SALT_CURSOR = 'usuarios.paginacion.cursor'
+
+# Modo de paginación por pestaña del dashboard: 'numeros' (Paginator con COUNT + OFFSET)
+# o 'cursor' (keyset sobre el orden de la consulta, sin COUNT ni OFFSET)
+PAGINACION_DASHBOARD_DEFAULT = {
+    'creados': 'numeros',
+    'asignados': 'numeros',
+    'disponibles': 'cursor',
+    'todos': 'cursor',
+}
+
+
+class PaginadorConTotal(Paginator):
+    """Paginator que usa un total ya conocido (tablas de contadores) en lugar de COUNT(*)"""
+
+    def __init__(self, object_list, per_page, total, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.total = total
+
+    @cached_property
+    def count(self):
+        return self.total
+
+
+class PaginaCursor:
+    """Página de resultados con tokens opacos para ir a la página siguiente o anterior"""
+
+    es_cursor = True
+
+    def __init__(self, objetos, parametro, query_params, token_siguiente=None, token_anterior=None,
+                 es_primera=False, total=None, total_aproximado=False):
+        self.object_list = objetos
+        self.parametro = parametro
+        self.query_params = query_params
+        self.token_siguiente = token_siguiente
+        self.token_anterior = token_anterior
+        self.es_primera = es_primera
+        self.total = total
+        self.total_aproximado = total_aproximado
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.token_siguiente is not None
+
+    def has_previous(self):
+        return not self.es_primera
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _url_con_token(self, token):
+        parametros = self.query_params.copy()
+        if token is None:
+            parametros.pop(self.parametro, None)
+        else:
+            parametros[self.parametro] = token
+        return '?' + parametros.urlencode()
+
+    def url_siguiente(self):
+        return self._url_con_token(self.token_siguiente)
+
+    def url_anterior(self):
+        # Si la página anterior es la primera, basta con quitar el cursor
+        return self._url_con_token(self.token_anterior)
+
+
+class PaginadorCursor:
+    """
+    Paginación keyset: en lugar de OFFSET filtra por los valores del orden de la consulta
+    (p. ej. orden de estatus, fecha_creacion, id) a partir de la última fila vista.
+    El orden del queryset debe terminar en un campo único (id) para ser estable.
+    """
+
+    def __init__(self, queryset, por_pagina):
+        self.queryset = queryset
+        self.por_pagina = por_pagina
+        self.campos = [
+            (campo.lstrip('-'), campo.startswith('-'))
+            for campo in queryset.query.order_by
+        ]
+        if not self.campos or any(not isinstance(c, str) for c in queryset.query.order_by):
+            raise ValueError('PaginadorCursor requiere un queryset ordenado por nombres de campo')
+
+    def _valores(self, objeto):
+        return [getattr(objeto, campo) for campo, _ in self.campos]
+
+    def codificar(self, objeto, direccion):
+        # isoformat() conserva los microsegundos (DjangoJSONEncoder los recorta a milisegundos)
+        valores = [v.isoformat() if hasattr(v, 'isoformat') else v for v in self._valores(objeto)]
+        return signing.dumps({'v': valores, 'd': direccion}, salt=SALT_CURSOR, compress=True)
+
+    def decodificar(self, token):
+        """Devuelve (valores, dirección) o None si el token no es válido"""
+        try:
+            datos = signing.loads(token, salt=SALT_CURSOR)
+            valores, direccion = datos['v'], datos['d']
+        except (signing.BadSignature, KeyError, TypeError):
+            return None
+        if direccion not in ('sig', 'ant') or len(valores) != len(self.campos):
+            return None
+
+        modelo = self.queryset.model
+        convertidos = []
+        for (campo, _), valor in zip(self.campos, valores):
+            try:
+                convertidos.append(modelo._meta.get_field(campo).to_python(valor))
+            except FieldDoesNotExist:
+                # Anotaciones (p. ej. rango_busqueda) ya vienen como número
+                convertidos.append(valor)
+        return convertidos, direccion
+
+    def _filtro(self, valores, hacia_adelante):
+        """(a, b, c) > (va, vb, vc) respetando la dirección de cada campo del orden"""
+        condicion = Q()
+        iguales = {}
+        for (campo, descendente), valor in zip(self.campos, valores):
+            operador = 'lt' if descendente == hacia_adelante else 'gt'
+            condicion |= Q(**iguales, **{f'{campo}__{operador}': valor})
+            iguales[campo] = valor
+        return condicion
+
+    def pagina(self, token, parametro, query_params, total=None, total_aproximado=False):
+        decodificado = self.decodificar(token) if token else None
+        extra = {'total': total, 'total_aproximado': total_aproximado}
+
+        if decodificado is None:
+            filas = list(self.queryset[:self.por_pagina + 1])
+            objetos = filas[:self.por_pagina]
+            return PaginaCursor(
+                objetos, parametro, query_params,
+                token_siguiente=self.codificar(objetos[-1], 'sig') if len(filas) > self.por_pagina else None,
+                es_primera=True, **extra
+            )
+
+        valores, direccion = decodificado
+        if direccion == 'sig':
+            filas = list(self.queryset.filter(self._filtro(valores, True))[:self.por_pagina + 1])
+            objetos = filas[:self.por_pagina]
+            hay_siguiente = len(filas) > self.por_pagina
+            hay_anterior = True
+        else:
+            invertido = self.queryset.filter(self._filtro(valores, False)).reverse()
+            filas = list(invertido[:self.por_pagina + 1])
+            objetos = filas[:self.por_pagina][::-1]
+            hay_siguiente = True
+            hay_anterior = len(filas) > self.por_pagina
+
+        if not objetos:
+            # Cursor más allá del final (p. ej. se borraron tickets): volver al inicio
+            return self.pagina(None, parametro, query_params, **extra)
+
+        return PaginaCursor(
+            objetos, parametro, query_params,
+            token_siguiente=self.codificar(objetos[-1], 'sig') if hay_siguiente else None,
+            token_anterior=self.codificar(objetos[0], 'ant') if hay_anterior else None,
+            es_primera=not hay_anterior, **extra
+        )
+
+
+def estimar_total(queryset):
+    """
+    Conteo aproximado sin recorrer la tabla (solo PostgreSQL). Sin WHERE usa reltuples de
+    pg_class; con WHERE usa la estimación de filas del planificador. Devuelve None si no aplica.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            fila = cursor.fetchone()
+        # reltuples vale -1 si la tabla nunca se ha analizado
+        return max(fila[0], 0) if fila else None
+
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    # Según el driver, el plan llega como lista de un elemento o como el objeto mismo
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan['Plan']['Plan Rows'])
+
+
+def paginar_pestana(request, queryset, pestana, hay_filtros, por_pagina=10, total_conocido=None):
+    """
+    Pagina una pestaña del dashboard según settings.PAGINACION_DASHBOARD.
+    Sin filtros, `total_conocido` (de las tablas de contadores) sustituye al COUNT.
+    En modo cursor el total depende de settings.PAGINACION_CONTEO:
+    'exacto' (COUNT), 'aproximado' (estimación de PostgreSQL si no hay filtros) o 'ninguno'.
+    """
+    if hay_filtros:
+        total_conocido = None
+
+    modos = getattr(settings, 'PAGINACION_DASHBOARD', PAGINACION_DASHBOARD_DEFAULT)
+    if modos.get(pestana, 'numeros') != 'cursor':
+        if total_conocido is not None:
+            paginator = PaginadorConTotal(queryset, por_pagina, total_conocido)
+        else:
+            paginator = Paginator(queryset, por_pagina)
+        return paginator.get_page(request.GET.get(f'page_{pestana}', 1))
+
+    total, total_aproximado = None, False
+    conteo = getattr(settings, 'PAGINACION_CONTEO', 'aproximado')
+    if conteo == 'ninguno':
+        pass
+    elif total_conocido is not None:
+        total = total_conocido
+    elif conteo == 'exacto':
+        total = queryset.count()
+    elif conteo == 'aproximado' and not hay_filtros:
+        total = estimar_total(queryset)
+        total_aproximado = total is not None
+
+    parametro = f'cursor_{pestana}'
+    return PaginadorCursor(queryset, por_pagina).pagina(
+        request.GET.get(parametro), parametro, request.GET,
+        total=total, total_aproximado=total_aproximado
+    )
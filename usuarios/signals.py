@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .almacenamiento import liberar
+from .eventos import eventos_cambio, publicar_eventos
+from .fragmentos import AMBITO_PERSONAL, ambitos_ticket, invalidar_ambitos, invalidar_todo
+from .middleware import invalidar_usuario
+from .models import Usuario, Ticket, ImagenTicket, ReporteFinalizacion, ImagenReporte, MotivoEspera, ContadorUsuario
+
+
+def _al_confirmar(funcion, *args):
+    """Ejecuta ya y otra vez al COMMIT: otra petición pudo cachear datos viejos en medio"""
+    funcion(*args)
+    transaction.on_commit(lambda: funcion(*args))
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_usuario_en_cache(sender, instance, update_fields=None, **kwargs):
+    """Cualquier alta, edición, admisión o baja de un usuario invalida su entrada en caché"""
+    _al_confirmar(invalidar_usuario, instance.id)
+    if update_fields and set(update_fields) <= set(Usuario.CAMPOS_FOTO):
+        # La foto solo se muestra desde el usuario en caché; los fragmentos no cambian
+        return
+    # La lista de usuarios de sistemas aparece en los selects de asignación del dashboard
+    _al_confirmar(invalidar_ambitos, [AMBITO_PERSONAL])
+
+
+@receiver(post_delete, sender=Usuario)
+def invalidar_fragmentos_usuario_eliminado(sender, instance, **kwargs):
+    # El SET_NULL de sus tickets asignados no pasa por señales; es raro, se invalida todo
+    _al_confirmar(invalidar_todo)
+
+
+@receiver(post_delete, sender=Usuario)
+def borrar_contadores_usuario(sender, instance, **kwargs):
+    # Sin FK real (ver ContadorUsuario): las filas se borran aquí, después de que los triggers
+    # descontaron los tickets que se fueron en cascada con el usuario
+    ContadorUsuario.objects.filter(usuario_id=instance.id).delete()
+
+
+@receiver(post_init, sender=Ticket)
+def recordar_ambitos_ticket(sender, instance, **kwargs):
+    # Valores con los que se cargó el ticket, para invalidar también el ámbito anterior al
+    # reasignarlo. Se lee __dict__ para no disparar consultas en campos diferidos
+    datos = instance.__dict__
+    instance._ambitos_originales = ambitos_ticket(
+        datos.get('usuario_id'), datos.get('asignado_a_id'), datos.get('categoria')
+    )
+    instance._valores_originales = {
+        campo: datos[campo] for campo in ('asignado_a_id', 'estatus', 'nivel_urgencia') if campo in datos
+    }
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidar_fragmentos_ticket(sender, instance, **kwargs):
+    """Cambia el sello de las pestañas donde el ticket estaba y donde está ahora"""
+    ambitos = ambitos_ticket(instance.usuario_id, instance.asignado_a_id, instance.categoria)
+    ambitos += getattr(instance, '_ambitos_originales', [])
+    _al_confirmar(invalidar_ambitos, ambitos)
+    instance._ambitos_originales = ambitos_ticket(instance.usuario_id, instance.asignado_a_id, instance.categoria)
+
+
+@receiver(post_save, sender=Ticket)
+def publicar_eventos_ticket(sender, instance, created, **kwargs):
+    """Avisa a las conexiones SSE abiertas (eventos_tickets) de altas y cambios del ticket"""
+    publicar_eventos(eventos_cambio(instance, getattr(instance, '_valores_originales', {}), created))
+    instance._valores_originales = {
+        'asignado_a_id': instance.asignado_a_id, 'estatus': instance.estatus, 'nivel_urgencia': instance.nivel_urgencia,
+    }
+
+
+def ticket_actualizado(ticket):
+    """post_save de un ticket cambiado con queryset.update(), que no manda señales (asignacion.py)"""
+    invalidar_fragmentos_ticket(Ticket, ticket)
+    publicar_eventos_ticket(Ticket, ticket, created=False)
+
+
+@receiver(post_save, sender=ReporteFinalizacion)
+@receiver(post_delete, sender=ReporteFinalizacion)
+@receiver(post_save, sender=MotivoEspera)
+@receiver(post_delete, sender=MotivoEspera)
+def invalidar_fragmentos_relacionados(sender, instance, **kwargs):
+    """Reportes y motivos de espera se muestran en las filas de su ticket"""
+    ticket = Ticket.objects.filter(id=instance.ticket_id).values('usuario_id', 'asignado_a_id', 'categoria').first()
+    if ticket:
+        _al_confirmar(invalidar_ambitos, ambitos_ticket(ticket['usuario_id'], ticket['asignado_a_id'], ticket['categoria']))
+
+
+@receiver(post_delete, sender=ImagenTicket)
+@receiver(post_delete, sender=ImagenReporte)
+def liberar_archivos_imagen(sender, instance, **kwargs):
+    """
+    Quita la referencia del original y sus versiones, también cuando la imagen se borra en
+    cascada con su ticket o reporte. Tras el COMMIT: si la transacción se revierte, los
+    archivos siguen en uso
+    """
+    transaction.on_commit(instance.eliminar_archivos)
+
+
+@receiver(post_delete, sender=Usuario)
+def liberar_foto_perfil(sender, instance, **kwargs):
+    nombres = instance.archivos_foto()
+    if nombres:
+        transaction.on_commit(lambda: liberar(nombres))
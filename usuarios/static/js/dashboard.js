@@ -6,6 +6,7 @@ class DashboardManager {
         this.ticketAEliminar = null;
         this.filterTimeout = null;
         this.currentTab = 'mis-tickets';
+        this.eventosTimeout = null;
         this.init();
     }
 
@@ -14,6 +15,8 @@ class DashboardManager {
         this.initTabs();
         this.initFilters();
         this.detectActiveTab();
+        this.initLazyTabs();
+        this.initEventos();
         console.log('✅ Dashboard Manager inicializado');
     }
 
@@ -160,6 +163,37 @@ class DashboardManager {
         }
     }
 
+    async tomarSiguiente(boton) {
+        this.showLoading(true);
+        
+        try {
+            const response = await fetch(boton.dataset.url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'X-CSRFToken': this.getCSRFToken()
+                }
+            });
+
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const data = await response.json();
+            
+            if (data.success) {
+                window.location.href = data.url;
+            } else {
+                alert(data.error);
+            }
+        } catch (error) {
+            console.error('Error:', error);
+            alert('Error al pedir el siguiente ticket');
+        } finally {
+            this.showLoading(false);
+        }
+    }
+
     async asignarTicket(ticketId, usuarioSistemasId, categoria) {
         if (!usuarioSistemasId) return;
         
@@ -352,8 +386,14 @@ class DashboardManager {
         this.currentTab = targetTab;
         this.handleStatusFilterVisibility();
         
-        // Guardar en localStorage
+        // Guardar en localStorage y en cookie (el servidor construye primero esa pestaña)
         localStorage.setItem('activeTab', targetTab);
+        document.cookie = `dashboard_pestana=${targetTab}; path=/; SameSite=Lax`;
+        
+        // Pestaña diferida: pedir su HTML al abrirla
+        if (activeContent && activeContent.dataset.pendiente) {
+            this.loadTab(targetTab);
+        }
     }
 
     restoreActiveTab() {
@@ -383,10 +423,10 @@ class DashboardManager {
     detectTabFromUrl() {
         const urlParams = new URLSearchParams(window.location.search);
         
-        if (urlParams.has('page_creados')) return 'mis-tickets';
-        if (urlParams.has('page_disponibles')) return 'disponibles';
-        if (urlParams.has('page_asignados')) return 'asignados';
-        if (urlParams.has('page_todos')) return 'todos';
+        if (urlParams.has('page_creados') || urlParams.has('cursor_creados')) return 'mis-tickets';
+        if (urlParams.has('page_disponibles') || urlParams.has('cursor_disponibles')) return 'disponibles';
+        if (urlParams.has('page_asignados') || urlParams.has('cursor_asignados')) return 'asignados';
+        if (urlParams.has('page_todos') || urlParams.has('cursor_todos')) return 'todos';
         
         return 'mis-tickets'; // default
     }
@@ -394,13 +434,13 @@ class DashboardManager {
     detectActiveTab() {
         const urlParams = new URLSearchParams(window.location.search);
         
-        if (urlParams.has('page_creados')) {
+        if (urlParams.has('page_creados') || urlParams.has('cursor_creados')) {
             this.currentTab = 'mis-tickets';
-        } else if (urlParams.has('page_disponibles')) {
+        } else if (urlParams.has('page_disponibles') || urlParams.has('cursor_disponibles')) {
             this.currentTab = 'disponibles';
-        } else if (urlParams.has('page_asignados')) {
+        } else if (urlParams.has('page_asignados') || urlParams.has('cursor_asignados')) {
             this.currentTab = 'asignados';
-        } else if (urlParams.has('page_todos')) {
+        } else if (urlParams.has('page_todos') || urlParams.has('cursor_todos')) {
             this.currentTab = 'todos';
         } else {
             const activeTab = document.querySelector('.custom-tab.active');
@@ -412,6 +452,91 @@ class DashboardManager {
         this.handleStatusFilterVisibility();
     }
 
+    // =================== PESTAÑAS DIFERIDAS ===================
+    initLazyTabs() {
+        // Paginación dentro de una pestaña: reemplazar solo esa pestaña
+        document.addEventListener('click', (e) => {
+            const link = e.target.closest('.tab-content[data-url] a.page-link');
+            if (!link) return;
+            
+            e.preventDefault();
+            const url = new URL(link.href, window.location.href);
+            history.pushState(null, '', url.pathname + url.search);
+            this.loadTab(link.closest('.tab-content').id, url.search);
+        });
+        
+        // Atrás/adelante del navegador: volver a cargar la página completa
+        window.addEventListener('popstate', () => location.reload());
+    }
+
+    hasLazyTabs() {
+        return document.querySelector('.tab-content[data-url]') !== null;
+    }
+
+    async loadTab(tabId, search = window.location.search) {
+        const content = document.getElementById(tabId);
+        if (!content || !content.dataset.url) return;
+        
+        content.dataset.pendiente = '1';
+        try {
+            const response = await fetch(content.dataset.url + search, {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' }
+            });
+            
+            if (response.status === 401) {
+                location.reload();
+                return;
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            
+            content.innerHTML = await response.text();
+            delete content.dataset.pendiente;
+        } catch (error) {
+            console.error('Error al cargar pestaña:', error);
+            content.innerHTML = '<div class="alert alert-danger m-3">Error al cargar los tickets. Recarga la página.</div>';
+        }
+    }
+
+    reloadTabs(search) {
+        // Las demás pestañas quedan pendientes y se piden con los filtros nuevos al abrirlas
+        document.querySelectorAll('.tab-content[data-url]').forEach(content => {
+            content.dataset.pendiente = '1';
+        });
+        return this.loadTab(this.currentTab, search);
+    }
+
+    // =================== EVENTOS EN VIVO ===================
+    initEventos() {
+        const aviso = document.getElementById('eventos-tickets');
+        if (!aviso || !window.EventSource) return;
+        
+        // Con WSGI el servidor responde 204 y EventSource deja de reconectar solo
+        const fuente = new EventSource(aviso.dataset.url);
+        const alRecibir = (e) => this.onEventoTicket(e.type, e.data ? JSON.parse(e.data) : {});
+        ['creado', 'asignado', 'estatus', 'urgencia', 'recargar'].forEach(tipo => {
+            fuente.addEventListener(tipo, alRecibir);
+        });
+    }
+
+    onEventoTicket(tipo, evento) {
+        if (!this.hasLazyTabs()) {
+            // Usuarios normales: la lista no se carga por fragmentos, se ofrece recargar la página
+            const aviso = document.getElementById('eventos-tickets');
+            if (tipo !== 'recargar' && evento.titulo) {
+                aviso.querySelector('.eventos-texto').textContent = `Hay cambios en tus tickets: «${evento.titulo}».`;
+            }
+            aviso.classList.remove('d-none');
+            aviso.classList.add('d-flex');
+            return;
+        }
+        
+        // Varios eventos seguidos (p. ej. asignar y cambiar estatus) recargan una sola vez
+        clearTimeout(this.eventosTimeout);
+        this.eventosTimeout = setTimeout(() => this.reloadTabs(window.location.search), 1000);
+    }
+
     // =================== SISTEMA DE FILTROS ===================
     initFilters() {
         this.setupFilterEventListeners();
@@ -520,7 +645,16 @@ class DashboardManager {
         
         // Navegar a nueva URL
         const newUrl = url.pathname + (params.toString() ? '?' + params.toString() : '');
-        window.location.href = newUrl;
+        if (!this.hasLazyTabs()) {
+            window.location.href = newUrl;
+            return;
+        }
+        
+        // Con pestañas diferidas solo se reemplaza la pestaña visible
+        history.pushState(null, '', newUrl);
+        this.updateFilterTags();
+        this.reloadTabs(params.toString() ? '?' + params.toString() : '')
+            .finally(() => this.showFilterLoading(false));
     }
 
     clearFilters() {
@@ -534,7 +668,14 @@ class DashboardManager {
         });
         
         // Navegar a URL limpia
-        window.location.href = window.location.pathname;
+        if (!this.hasLazyTabs()) {
+            window.location.href = window.location.pathname;
+            return;
+        }
+        
+        history.pushState(null, '', window.location.pathname);
+        this.updateFilterTags();
+        this.reloadTabs('').finally(() => this.showFilterLoading(false));
     }
 
     removeFilter(filterKey) {
@@ -660,6 +801,10 @@ function aceptarTicket(ticketId, titulo) {
     dashboard.aceptarTicket(ticketId, titulo);
 }
 
+function tomarSiguiente(boton) {
+    dashboard.tomarSiguiente(boton);
+}
+
 function asignarTicket(ticketId, usuarioSistemasId, categoria) {
     dashboard.asignarTicket(ticketId, usuarioSistemasId, categoria);
 }
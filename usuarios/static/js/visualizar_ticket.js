@@ -28,7 +28,7 @@ class VisualizarTicketManager {
             card.addEventListener('click', () => {
                 const img = card.querySelector('img');
                 const nombre = card.querySelector('.image-card-body small').textContent;
-                this.verImagenCompleta(img.src, nombre, index);
+                this.verImagenCompleta(img.dataset.pantalla || img.src, nombre, index);
             });
             
             // Mejorar accesibilidad
@@ -109,8 +109,10 @@ class VisualizarTicketManager {
         this.images = Array.from(imageCards).map(card => {
             const img = card.querySelector('img');
             const nombre = card.querySelector('.image-card-body small').textContent;
+            // En el modal se muestra la versión de pantalla; descargar usa el original
             return {
-                src: img.src,
+                src: img.dataset.pantalla || img.src,
+                original: img.dataset.original || img.src,
                 nombre: nombre,
                 alt: img.alt || nombre
             };
@@ -184,7 +186,7 @@ class VisualizarTicketManager {
 
         const currentImage = this.images[this.currentImageIndex];
         const link = document.createElement('a');
-        link.href = currentImage.src;
+        link.href = currentImage.original;
         link.download = currentImage.nombre || 'imagen.jpg';
         document.body.appendChild(link);
         link.click();
@@ -485,7 +487,7 @@ class VisualizarTicketManager {
             ...summary,
             imagenes: this.images.map(img => ({
                 nombre: img.nombre,
-                url: img.src
+                url: img.original
             })),
             exportDate: new Date().toISOString(),
             url: window.location.href
@@ -0,0 +1,185 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+# Límites por defecto; se pueden cambiar en settings
+MAX_BYTES_ARCHIVO_DEFAULT = 10 * 1024 * 1024
+MAX_BYTES_PETICION_DEFAULT = 40 * 1024 * 1024
+
+EXTENSIONES_VALIDAS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+# Firma (magic bytes) de cada formato aceptado y el nombre que le da Pillow
+FIRMAS = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+)
+
+# Bytes que se retienen antes de decidir: alcanzan para la cabecera de cualquier formato
+# aceptado aunque la foto traiga EXIF y perfil de color. Nada se escribe hasta que la
+# cabecera se validó
+BYTES_CABECERA = 256 * 1024
+
+
+def limites_subida():
+    return (
+        getattr(settings, 'SUBIDAS_MAX_BYTES_ARCHIVO', MAX_BYTES_ARCHIVO_DEFAULT),
+        getattr(settings, 'SUBIDAS_MAX_BYTES_PETICION', MAX_BYTES_PETICION_DEFAULT),
+    )
+
+
+def formato_por_firma(cabecera):
+    for firma, formato in FIRMAS:
+        if cabecera.startswith(firma):
+            return formato
+    if cabecera[:4] == b'RIFF' and cabecera[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def validar_cabecera(cabecera, completa):
+    """
+    Devuelve None si los bytes son el inicio de una imagen aceptada, o el motivo del rechazo.
+    Pillow solo lee la cabecera; verify() recorre la imagen entera, así que únicamente se
+    llama cuando el archivo completo cabe en `cabecera`.
+    """
+    formato = formato_por_firma(cabecera)
+    if formato is None:
+        return 'no es una imagen válida. Solo se permiten: JPG, JPEG, PNG, GIF, BMP, WEBP.'
+    try:
+        with Image.open(BytesIO(cabecera)) as imagen:
+            if imagen.format != formato:
+                return 'no es una imagen válida (el contenido no coincide con su formato).'
+            ancho, alto = imagen.size
+            if Image.MAX_IMAGE_PIXELS and ancho * alto > Image.MAX_IMAGE_PIXELS:
+                return f'es demasiado grande ({ancho}×{alto} píxeles).'
+            if completa:
+                imagen.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return 'no es una imagen válida o está dañada.'
+    return None
+
+
+def errores_subida(request):
+    """Mensajes de los archivos rechazados al recibir la petición (lee request.FILES)"""
+    request.FILES
+    return getattr(request, 'errores_subida', [])
+
+
+class ImagenesSegurasUploadHandler(FileUploadHandler):
+    """
+    Manejador de subidas de la aplicación (FILE_UPLOAD_HANDLERS): valida cada archivo
+    mientras llega y solo guarda los que son imágenes aceptadas.
+
+    - Rechaza por extensión al empezar el archivo, sin leer su contenido.
+    - Retiene los primeros BYTES_CABECERA y revisa los magic bytes y la cabecera con Pillow;
+      hasta entonces nada se escribe, así que un archivo que no es imagen se descarta sin
+      ocupar memoria ni disco.
+    - Descarta el archivo al pasar SUBIDAS_MAX_BYTES_ARCHIVO, y este y los que siguen al pasar
+      SUBIDAS_MAX_BYTES_PETICION (o desde el inicio si el Content-Length ya lo excede). Los
+      demás campos se conservan: el token CSRF y el formulario llegan a la vista, que muestra
+      el error en lugar de un 403.
+    - Los archivos aceptados quedan en memoria o en un temporal según
+      FILE_UPLOAD_MAX_MEMORY_SIZE, igual que con los manejadores de Django.
+
+    Los motivos de rechazo quedan en request.errores_subida para que la vista los muestre.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request.errores_subida = []
+        self.max_archivo, self.max_peticion = limites_subida()
+        self.en_memoria = content_length <= settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        self.recibidos_peticion = 0
+        # Pasado el límite por envío ya no se guarda ningún archivo; el resto del cuerpo se
+        # sigue leyendo por los campos que no son archivos
+        self.sin_archivos = content_length > self.max_peticion
+        if self.sin_archivos:
+            self._rechazar(
+                f'Los archivos pesan {filesizeformat(content_length)}; el máximo por envío es '
+                f'{filesizeformat(self.max_peticion)}.'
+            )
+        return None
+
+    def _rechazar(self, mensaje):
+        self.request.errores_subida.append(mensaje)
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        # self.file solo existe cuando ya hay dónde escribir (MultiPartParser lo cierra si se
+        # descarta el archivo; un TemporaryUploadedFile se borra al cerrarse)
+        self.__dict__.pop('file', None)
+        self.cabecera = bytearray()
+        self.recibidos = 0
+        if self.sin_archivos:
+            raise SkipFile()
+        if not file_name.lower().endswith(EXTENSIONES_VALIDAS):
+            self._rechazar(f'El archivo "{file_name}" no tiene una extensión válida. Solo se permiten: JPG, JPEG, PNG, GIF, BMP, WEBP.')
+            raise SkipFile()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.recibidos += len(raw_data)
+        self.recibidos_peticion += len(raw_data)
+        if self.recibidos > self.max_archivo:
+            self._rechazar(f'El archivo "{self.file_name}" pesa más de {filesizeformat(self.max_archivo)}.')
+            raise SkipFile()
+        if self.recibidos_peticion > self.max_peticion:
+            self._rechazar(f'Los archivos suman más de {filesizeformat(self.max_peticion)} por envío.')
+            self.sin_archivos = True
+            raise SkipFile()
+
+        if hasattr(self, 'file'):
+            self.file.write(raw_data)
+            return None
+
+        # Todavía validando: se retiene hasta tener la cabecera (o hasta que el archivo termine)
+        self.cabecera += raw_data
+        if len(self.cabecera) < BYTES_CABECERA:
+            return None
+        error = validar_cabecera(bytes(self.cabecera), completa=False)
+        if error:
+            self._rechazar(f'El archivo "{self.file_name}" {error}')
+            raise SkipFile()
+        if self.en_memoria:
+            self.file = BytesIO()
+        else:
+            self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.file.write(self.cabecera)
+        self.cabecera = bytearray()
+        return None
+
+    def file_complete(self, file_size):
+        if not hasattr(self, 'file'):
+            # El archivo completo cupo en la cabecera: se valida entero
+            contenido = bytes(self.cabecera)
+            error = validar_cabecera(contenido, completa=True) if contenido else 'está vacío.'
+            if error:
+                self._rechazar(f'El archivo "{self.file_name}" {error}')
+                return None
+            self.file = BytesIO(contenido)
+
+        self.file.seek(0)
+        if not isinstance(self.file, BytesIO):
+            # TemporaryUploadedFile: ya es el archivo subido
+            self.file.size = file_size
+            return self.file
+        return InMemoryUploadedFile(
+            file=self.file,
+            field_name=self.field_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+
+    def upload_interrupted(self):
+        # Conexión cortada a medias: borrar el temporal
+        archivo = self.__dict__.pop('file', None)
+        if archivo is not None:
+            archivo.close()
@@ -1,3 +1,1421 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import os
+import shutil
+import smtplib
+import socket
+import tempfile
+import threading
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import QueryDict
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from .almacenamiento import TAMANO_BLOQUE, almacenamiento
+from . import views, views_async
+from .asignacion import Candidato, atomar_ticket, candidatos_categoria, por_experiencia, por_turnos, reasignar_ticket, tomar_siguiente, tomar_ticket
+from .busqueda import buscar_tickets
+from .correos import encolar_correo, enviar_lote
+from .eventos import DifusorLocal, DifusorPostgres, difusor, evento_ticket
+from .consultas import tickets_creados
+from .contadores import calcular_contadores, recalcular_contadores, resumen_dashboard
+from .fragmentos import AMBITO_GLOBAL, AMBITO_PERSONAL, ambito_asignado
+from .imagenes import AVATARES, generar_versiones
+from .middleware import obtener_usuario
+from .notificaciones import destinatarios_ticket_nuevo
+from .models import Usuario, Ticket, ImagenTicket, ImagenReporte, ReporteFinalizacion, MotivoEspera, ContadorUsuario, ContadorCategoria, TrabajoImagen, ArchivoContenido, CorreoSaliente, NotificacionPendiente
+from .paginacion import PaginadorCursor
+from .subidas import BYTES_CABECERA
+from .trabajos import MAX_INTENTOS, encolar_versiones, procesar_trabajo, tomar_trabajos
+
+
+# Las pruebas no usan la caché en archivos de settings (compartida con el servidor de desarrollo)
+CACHE_PRUEBAS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas'}}
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class CacheAisladaTestCase(TestCase):
+    """Caché en memoria y vacía en cada prueba: los ids se repiten entre pruebas y un usuario
+    o fragmento guardado por otra prueba se tomaría como vigente"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class DashboardConsultasTests(CacheAisladaTestCase):
+    """El dashboard debe costar un número fijo de consultas sin importar cuántos tickets muestre."""
+
+    # Presupuesto máximo de consultas por rol (incluye la sesión; el usuario actual viene de caché
+    # y solo se construye la pestaña inicial)
+    PRESUPUESTO_CONSULTAS = {
+        'usuario': 4,
+        'sistemas': 4,
+        'admin': 5,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com',
+            rol='usuario', admitido=True
+        )
+        self.tecnico = Usuario.objects.create(
+            nombre='Luis', apellido='Pérez', email='luis@example.com',
+            rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True
+        )
+        self.admin = Usuario.objects.create(
+            nombre='Marta', apellido='Ruiz', email='marta@example.com',
+            rol='admin', admitido=True
+        )
+
+    def crear_tickets(self, cantidad):
+        """Crea tickets en todos los estatus que recorre el dashboard"""
+        for i in range(cantidad):
+            Ticket.objects.create(
+                titulo=f'Disponible {i}', descripcion='d', categoria='soporte_tecnico',
+                usuario=self.creador
+            )
+            en_espera = Ticket.objects.create(
+                titulo=f'En espera {i}', descripcion='d', categoria='soporte_tecnico',
+                usuario=self.admin, asignado_a=self.tecnico, estatus='en_espera'
+            )
+            MotivoEspera.objects.create(ticket=en_espera, motivo='Refacción', creado_por=self.admin)
+            Ticket.objects.create(
+                titulo=f'Asignado {i}', descripcion='d', categoria='soporte_tecnico',
+                usuario=self.tecnico, asignado_a=self.admin
+            )
+            finalizado = Ticket.objects.create(
+                titulo=f'Finalizado {i}', descripcion='d', categoria='soporte_tecnico',
+                usuario=self.creador, asignado_a=self.tecnico, estatus='finalizado'
+            )
+            ReporteFinalizacion.objects.create(
+                ticket=finalizado, titulo=finalizado.titulo, reporte='r', descripcion='d',
+                creado_por=self.tecnico, visto_por_usuario=True
+            )
+
+    def iniciar_sesion(self, usuario):
+        session = self.client.session
+        session['usuario_id'] = usuario.id
+        session['usuario_nombre'] = f'{usuario.nombre} {usuario.apellido}'
+        session['usuario_email'] = usuario.email
+        session.save()
+        # El middleware ya tiene al usuario en caché, como en cualquier petición después del login
+        obtener_usuario(usuario.id)
+
+    def contar_consultas(self, usuario):
+        self.iniciar_sesion(usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(consultas)
+
+    def test_consultas_constantes_por_rol(self):
+        for usuario in (self.creador, self.tecnico, self.admin):
+            with self.subTest(rol=usuario.rol):
+                self.crear_tickets(1)
+                con_pocos = self.contar_consultas(usuario)
+                self.crear_tickets(8)
+                con_muchos = self.contar_consultas(usuario)
+
+                self.assertEqual(con_pocos, con_muchos)
+                self.assertLessEqual(con_muchos, self.PRESUPUESTO_CONSULTAS[usuario.rol])
+
+    def test_dashboard_admin_no_escribe(self):
+        self.crear_tickets(2)
+        self.iniciar_sesion(self.admin)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('dashboard'))
+        escrituras = [q['sql'] for q in consultas if q['sql'].lstrip().upper().startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        self.assertEqual(escrituras, [])
+
+
+class EstatusConsistenteTests(CacheAisladaTestCase):
+    """El trigger de la migración 0022 mantiene la regla de Ticket.save() también en update()"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        self.tecnico = Usuario.objects.create(
+            nombre='Luis', apellido='Pérez', email='luis@example.com',
+            rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True
+        )
+        self.ticket = Ticket.objects.create(
+            titulo='Monitor', descripcion='d', categoria='soporte_tecnico', usuario=self.creador
+        )
+
+    def test_update_masivo_respeta_la_regla(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(asignado_a=self.tecnico)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.estatus, 'en_proceso')
+
+        Ticket.objects.filter(pk=self.ticket.pk).update(asignado_a=None)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.estatus, 'generado')
+
+    def test_eliminar_tecnico_libera_sus_tickets(self):
+        self.ticket.asignado_a = self.tecnico
+        self.ticket.save()
+        self.tecnico.delete()
+        self.ticket.refresh_from_db()
+        self.assertIsNone(self.ticket.asignado_a)
+        self.assertEqual(self.ticket.estatus, 'generado')
+
+
+class PaginacionCursorTests(CacheAisladaTestCase):
+    """La paginación por cursor recorre todas las filas sin repetir ni saltar ninguna"""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        estatus = ['generado', 'en_espera', 'en_proceso', 'cancelado']
+        for i in range(23):
+            Ticket.objects.create(
+                titulo=f'Ticket {i}', descripcion='d', categoria='desarrollo',
+                usuario=self.usuario, estatus=estatus[i % len(estatus)]
+            )
+
+    def test_recorrido_hacia_adelante_y_atras(self):
+        queryset = tickets_creados(self.usuario)
+        esperado = list(queryset.values_list('id', flat=True))
+        params = QueryDict(mutable=True)
+
+        paginas = []
+        pagina = PaginadorCursor(queryset, 5).pagina(None, 'cursor_creados', params)
+        paginas.append([t.id for t in pagina])
+        while pagina.has_next():
+            pagina = PaginadorCursor(queryset, 5).pagina(pagina.token_siguiente, 'cursor_creados', params)
+            paginas.append([t.id for t in pagina])
+
+        self.assertEqual([i for p in paginas for i in p], esperado)
+        self.assertEqual(len(paginas), 5)
+
+        # Regresar desde la última página reproduce las mismas páginas en orden inverso
+        for anterior in reversed(paginas[:-1]):
+            pagina = PaginadorCursor(queryset, 5).pagina(pagina.token_anterior, 'cursor_creados', params)
+            self.assertEqual([t.id for t in pagina], anterior)
+        self.assertFalse(pagina.has_previous())
+
+    def test_token_alterado_regresa_a_la_primera_pagina(self):
+        queryset = tickets_creados(self.usuario)
+        pagina = PaginadorCursor(queryset, 5).pagina('token-falso', 'cursor_creados', QueryDict())
+        self.assertFalse(pagina.has_previous())
+        self.assertEqual([t.id for t in pagina], list(queryset.values_list('id', flat=True)[:5]))
+
+
+class BusquedaTicketsTests(CacheAisladaTestCase):
+    """Búsqueda en título, descripción y observaciones (ruta degradada en SQLite)"""
+
+    def setUp(self):
+        super().setUp()
+        usuario = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        self.en_descripcion = Ticket.objects.create(
+            titulo='No enciende', descripcion='La impresora de caja no responde',
+            categoria='soporte_tecnico', usuario=usuario
+        )
+        self.en_titulo = Ticket.objects.create(
+            titulo='Impresora atascada', descripcion='Se atora el papel',
+            categoria='soporte_tecnico', usuario=usuario
+        )
+        self.en_observaciones = Ticket.objects.create(
+            titulo='Red lenta', descripcion='Internet intermitente', observaciones='Cerca de la impresora',
+            categoria='infraestructura', usuario=usuario
+        )
+        Ticket.objects.create(
+            titulo='Correo', descripcion='No llegan correos', categoria='desarrollo', usuario=usuario
+        )
+
+    def test_busca_en_todos_los_campos_y_ordena_por_relevancia(self):
+        resultados = list(buscar_tickets(Ticket.objects.order_by('-id'), 'impresora'))
+        self.assertEqual(resultados, [self.en_titulo, self.en_descripcion, self.en_observaciones])
+
+    def test_texto_vacio_no_filtra(self):
+        self.assertEqual(buscar_tickets(Ticket.objects.all(), '  ').count(), 4)
+
+
+class ContadoresTicketsTests(CacheAisladaTestCase):
+    """Los triggers de la migración 0023 mantienen los contadores igual que un COUNT desde cero"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        self.tecnico = Usuario.objects.create(
+            nombre='Luis', apellido='Pérez', email='luis@example.com',
+            rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True
+        )
+        self.otro_tecnico = Usuario.objects.create(
+            nombre='Eva', apellido='Ruiz', email='eva@example.com',
+            rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True
+        )
+
+    def assertContadoresCoinciden(self):
+        por_usuario, por_categoria = calcular_contadores()
+        actuales_usuario = {
+            (c.usuario_id, c.rol, c.estatus): c.total for c in ContadorUsuario.objects.exclude(total=0)
+        }
+        actuales_categoria = {
+            (c.categoria, c.estatus): c.total for c in ContadorCategoria.objects.exclude(total=0)
+        }
+        self.assertEqual(actuales_usuario, por_usuario)
+        self.assertEqual(actuales_categoria, por_categoria)
+
+    def test_ciclo_de_vida_del_ticket(self):
+        ticket = Ticket.objects.create(
+            titulo='Impresora', descripcion='No imprime', categoria='soporte_tecnico', usuario=self.creador
+        )
+        self.assertEqual(resumen_dashboard(self.tecnico)['disponibles'], 1)
+
+        # Aceptar, reasignar, poner en espera, finalizar y cancelar otro
+        ticket.asignado_a = self.tecnico
+        ticket.save()
+        self.assertContadoresCoinciden()
+        ticket.asignado_a = self.otro_tecnico
+        ticket.save()
+        ticket.estatus = 'en_espera'
+        ticket.save()
+        self.assertEqual(resumen_dashboard(self.otro_tecnico)['mis_abiertos']['en_espera'], 1)
+        ticket.estatus = 'finalizado'
+        ticket.save()
+        Ticket.objects.create(
+            titulo='Red', descripcion='Sin red', categoria='infraestructura', usuario=self.creador,
+            estatus='cancelado'
+        )
+        self.assertContadoresCoinciden()
+
+        resumen = resumen_dashboard(self.tecnico)
+        self.assertEqual((resumen['asignados'], resumen['disponibles']), (0, 0))
+        self.assertEqual(resumen_dashboard(self.creador)['creados'], 1)
+
+    def test_update_masivo_y_eliminar_usuario(self):
+        for i in range(3):
+            Ticket.objects.create(
+                titulo=f'Ticket {i}', descripcion='x', categoria='soporte_tecnico', usuario=self.creador
+            )
+        Ticket.objects.filter(titulo='Ticket 0').update(asignado_a=self.tecnico)
+        eliminados = [self.tecnico.id, self.creador.id]
+        self.tecnico.delete()
+        self.assertContadoresCoinciden()
+        self.creador.delete()
+        self.assertContadoresCoinciden()
+        # Sin filas huérfanas de los usuarios eliminados, ni siquiera en cero
+        self.assertFalse(ContadorUsuario.objects.filter(usuario_id__in=eliminados).exists())
+
+    def test_recalcular_repara_contadores(self):
+        Ticket.objects.create(titulo='A', descripcion='x', categoria='desarrollo', usuario=self.creador)
+        ContadorCategoria.objects.update(total=99)
+        ContadorUsuario.objects.create(usuario_id=9999, rol='creador', estatus='generado', total=0)
+        self.assertEqual(recalcular_contadores(dry_run=True), 2)
+        self.assertEqual(recalcular_contadores(), 2)
+        self.assertContadoresCoinciden()
+        self.assertFalse(ContadorUsuario.objects.filter(usuario_id=9999).exists())
+
+
+class UsuarioActualTests(CacheAisladaTestCase):
+    """El usuario de la sesión se lee de la caché y se invalida al guardarlo o eliminarlo"""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+
+    def test_segunda_lectura_sin_consultas(self):
+        obtener_usuario(self.usuario.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(obtener_usuario(self.usuario.id).nombre, 'Ana')
+
+    def test_guardar_invalida(self):
+        obtener_usuario(self.usuario.id)
+        self.usuario.rol = 'sistemas'
+        self.usuario.save()
+        self.assertEqual(obtener_usuario(self.usuario.id).rol, 'sistemas')
+
+    def test_usuario_eliminado_cierra_sesion(self):
+        sesion = self.client.session
+        sesion['usuario_id'] = self.usuario.id
+        sesion.save()
+        self.usuario.delete()
+        respuesta = self.client.get(reverse('dashboard'))
+        self.assertRedirects(respuesta, reverse('list_usuarios'), fetch_redirect_response=False)
+        self.assertNotIn('usuario_id', self.client.session)
+
+
+class FragmentosDashboardTests(CacheAisladaTestCase):
+    """El HTML de cada pestaña se reutiliza hasta que cambia un ticket de su ámbito"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        self.tecnico = Usuario.objects.create(
+            nombre='Luis', apellido='Pérez', email='luis@example.com',
+            rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True
+        )
+        self.ticket = Ticket.objects.create(
+            titulo='Impresora', descripcion='No imprime', categoria='soporte_tecnico', usuario=self.creador
+        )
+        sesion = self.client.session
+        sesion['usuario_id'] = self.tecnico.id
+        sesion.save()
+        # Pestaña inicial: disponibles (ahí aparece el ticket)
+        self.client.cookies['dashboard_pestana'] = 'disponibles'
+
+    def consultas_de_tickets(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('dashboard'))
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, [q['sql'] for q in consultas if 'usuarios_ticket' in q['sql']]
+
+    def test_recarga_sin_cambios_no_consulta_tickets(self):
+        self.consultas_de_tickets()
+        respuesta, consultas = self.consultas_de_tickets()
+        self.assertEqual(consultas, [])
+        self.assertContains(respuesta, 'Impresora')
+
+    def test_cambio_en_el_ambito_regenera_la_pestana(self):
+        self.consultas_de_tickets()
+        self.ticket.titulo = 'Impresora de caja'
+        self.ticket.save()
+        respuesta, consultas = self.consultas_de_tickets()
+        self.assertNotEqual(consultas, [])
+        self.assertContains(respuesta, 'Impresora de caja')
+
+    def test_cambio_fuera_del_ambito_no_invalida(self):
+        self.consultas_de_tickets()
+        Ticket.objects.create(titulo='Red', descripcion='x', categoria='infraestructura', usuario=self.creador)
+        _, consultas = self.consultas_de_tickets()
+        # Solo se recalculan los badges (contadores), no las pestañas del técnico
+        self.assertFalse(any('FROM "usuarios_ticket"' in sql for sql in consultas))
+
+
+class PestanasDiferidasTests(CacheAisladaTestCase):
+    """El dashboard construye solo la pestaña inicial; las demás se piden a dashboard_pestana"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        self.admin = Usuario.objects.create(
+            nombre='Eva', apellido='Ruiz', email='eva@example.com', rol='admin', admitido=True
+        )
+        Ticket.objects.create(
+            titulo='Impresora', descripcion='No imprime', categoria='soporte_tecnico', usuario=self.creador
+        )
+
+    def iniciar_sesion(self, usuario):
+        sesion = self.client.session
+        sesion['usuario_id'] = usuario.id
+        sesion.save()
+
+    def test_dashboard_solo_construye_la_pestana_inicial(self):
+        self.iniciar_sesion(self.admin)
+        respuesta = self.client.get(reverse('dashboard'))
+        self.assertEqual(respuesta.content.decode().count('data-pendiente="1"'), 3)
+        self.assertNotContains(respuesta, 'Impresora')
+
+        # La cookie de dashboard.js decide la pestaña inicial
+        self.client.cookies['dashboard_pestana'] = 'disponibles'
+        self.assertContains(self.client.get(reverse('dashboard')), 'Impresora')
+
+    def test_endpoint_de_pestana(self):
+        self.iniciar_sesion(self.admin)
+        respuesta = self.client.get(reverse('dashboard_pestana', args=['disponibles']), {'search': 'impresora'})
+        self.assertContains(respuesta, 'Impresora')
+        self.assertNotContains(respuesta, '<html')
+
+    def test_pestana_no_visible_para_el_rol(self):
+        self.iniciar_sesion(self.creador)
+        self.assertEqual(self.client.get(reverse('dashboard_pestana', args=['todos'])).status_code, 404)
+        self.client.session.flush()
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(reverse('dashboard_pestana', args=['creados'])).status_code, 401)
+
+
+class OrdenEstatusTests(CacheAisladaTestCase):
+    """Las listas se ordenan por la columna generada orden_estatus, que sigue al estatus en update()"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        self.tecnico = Usuario.objects.create(
+            nombre='Luis', apellido='Pérez', email='luis@example.com',
+            rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True
+        )
+        # Creados del estatus que va al final al que va primero: el orden no sale de la fecha
+        self.en_proceso = Ticket.objects.create(
+            titulo='Proceso', descripcion='d', categoria='soporte_tecnico', usuario=self.creador, asignado_a=self.tecnico
+        )
+        self.en_espera = Ticket.objects.create(
+            titulo='Espera', descripcion='d', categoria='soporte_tecnico', usuario=self.creador,
+            asignado_a=self.tecnico, estatus='en_espera'
+        )
+        self.generado = Ticket.objects.create(
+            titulo='Generado', descripcion='d', categoria='soporte_tecnico', usuario=self.creador
+        )
+
+    def test_orden_de_la_pestana(self):
+        self.assertEqual(
+            [t.titulo for t in tickets_creados(self.creador)], ['Generado', 'Espera', 'Proceso']
+        )
+
+    def test_update_masivo_recalcula_el_orden(self):
+        Ticket.objects.filter(pk=self.en_proceso.pk).update(estatus='en_espera')
+        Ticket.objects.filter(pk=self.generado.pk).update(estatus='cancelado')
+        self.en_proceso.refresh_from_db()
+        self.assertEqual(self.en_proceso.orden_estatus, 2)
+        # Los dos en espera, el más reciente primero; el cancelado al final
+        self.assertEqual(
+            [t.titulo for t in tickets_creados(self.creador)], ['Espera', 'Proceso', 'Generado']
+        )
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class MigracionOrdenEstatusTests(TransactionTestCase):
+    """En SQLite la 0024 reconstruye la tabla de tickets: los triggers de 0022 y 0023 deben seguir ahí"""
+
+    migracion = [('usuarios', '0024_ticket_orden_estatus')]
+
+    def setUp(self):
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(self.migracion)
+        self.apps = ejecutor.loader.project_state(self.migracion).apps
+
+    def tearDown(self):
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(ejecutor.loader.graph.leaf_nodes())
+
+    def test_triggers_siguen_disparando(self):
+        Usuario_ = self.apps.get_model('usuarios', 'Usuario')
+        Ticket_ = self.apps.get_model('usuarios', 'Ticket')
+        ContadorUsuario_ = self.apps.get_model('usuarios', 'ContadorUsuario')
+        # El flush de otras TransactionTestCase borra tickets con los triggers activos
+        ContadorUsuario_.objects.all().delete()
+        creador = Usuario_.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        tecnico = Usuario_.objects.create(
+            nombre='Luis', apellido='Pérez', email='luis@example.com',
+            rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True
+        )
+        ticket = Ticket_.objects.create(
+            titulo='Monitor', descripcion='d', categoria='soporte_tecnico', usuario=creador
+        )
+
+        # 0022: asignar con update() pasa el estatus a en_proceso
+        Ticket_.objects.filter(pk=ticket.pk).update(asignado_a=tecnico)
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.estatus, ticket.orden_estatus), ('en_proceso', 3))
+
+        # 0023: los contadores siguen al ticket
+        contadores = {
+            (c.usuario_id, c.rol, c.estatus): c.total for c in ContadorUsuario_.objects.exclude(total=0)
+        }
+        self.assertEqual(contadores, {
+            (creador.id, 'creador', 'en_proceso'): 1, (tecnico.id, 'asignado', 'en_proceso'): 1,
+        })
+
+
+class ImagenesTemporalesMixin:
+    """MEDIA_ROOT temporal y un ticket al que adjuntar imágenes generadas en memoria"""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.creador = Usuario.objects.create(
+            nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True
+        )
+        self.ticket = Ticket.objects.create(
+            titulo='Impresora', descripcion='No imprime', categoria='soporte_tecnico', usuario=self.creador
+        )
+
+    def adjuntar(self, ancho, alto, formato='JPEG'):
+        contenido = BytesIO()
+        Image.new('RGB', (ancho, alto), 'navy').save(contenido, formato)
+        archivo = SimpleUploadedFile(f'foto.{formato.lower()}', contenido.getvalue())
+        return ImagenTicket.objects.create(ticket=self.ticket, imagen=archivo, nombre_archivo=archivo.name)
+
+
+class VersionesImagenTests(ImagenesTemporalesMixin, CacheAisladaTestCase):
+    """Cada imagen adjunta tiene miniatura y versión de pantalla en WebP sin agrandar el original"""
+
+    def test_genera_versiones_webp(self):
+        imagen = self.adjuntar(4000, 3000)
+        self.assertTrue(generar_versiones(imagen))
+        imagen.refresh_from_db()
+        self.assertEqual((imagen.ancho, imagen.alto), (4000, 3000))
+        self.assertEqual((imagen.miniatura_ancho, imagen.miniatura_alto), (480, 360))
+        self.assertEqual((imagen.pantalla_ancho, imagen.pantalla_alto), (1600, 1200))
+        with Image.open(imagen.miniatura.path) as miniatura:
+            self.assertEqual(miniatura.format, 'WEBP')
+        self.assertIn(f'{imagen.miniatura.url} 480w', imagen.srcset)
+
+        imagen.eliminar_archivos()
+        for campo in (imagen.imagen, imagen.miniatura, imagen.pantalla):
+            self.assertFalse(campo.storage.exists(campo.name))
+
+    def test_imagen_chica_no_se_agranda(self):
+        imagen = self.adjuntar(300, 200, 'PNG')
+        generar_versiones(imagen)
+        self.assertEqual((imagen.pantalla_ancho, imagen.pantalla_alto), (300, 200))
+
+    def test_archivo_invalido_usa_el_original(self):
+        archivo = SimpleUploadedFile('foto.jpg', b'no es una imagen')
+        imagen = ImagenTicket.objects.create(ticket=self.ticket, imagen=archivo, nombre_archivo=archivo.name)
+        self.assertFalse(generar_versiones(imagen))
+        self.assertEqual(imagen.url_miniatura, imagen.imagen.url)
+        self.assertEqual(imagen.srcset, '')
+
+    def test_visualizar_ticket_usa_srcset(self):
+        imagen = self.adjuntar(2000, 1000)
+        generar_versiones(imagen)
+        sesion = self.client.session
+        sesion['usuario_id'] = self.creador.id
+        sesion.save()
+        respuesta = self.client.get(reverse('visualizar_ticket', args=[self.ticket.id]))
+        self.assertContains(respuesta, f'srcset="{imagen.srcset}"')
+        self.assertContains(respuesta, f'href="{imagen.imagen.url}"')
+
+
+class TrabajosImagenTests(ImagenesTemporalesMixin, CacheAisladaTestCase):
+    """Las versiones se generan en la cola de trabajos, con reintentos y backoff"""
+
+    def test_crear_ticket_solo_encola(self):
+        sesion = self.client.session
+        sesion['usuario_id'] = self.creador.id
+        sesion.save()
+        contenido = BytesIO()
+        Image.new('RGB', (800, 600), 'navy').save(contenido, 'JPEG')
+        self.client.post(reverse('crear_ticket'), {
+            'titulo': 'Monitor', 'descripcion': 'Parpadea', 'categoria': 'soporte_tecnico', 'nivel_urgencia': '2',
+            'imagenes': [SimpleUploadedFile('foto.jpg', contenido.getvalue(), content_type='image/jpeg')],
+        })
+        imagen = ImagenTicket.objects.get(ticket__titulo='Monitor')
+        self.assertEqual(imagen.estado_versiones, 'pendiente')
+        self.assertFalse(imagen.pantalla)
+        respuesta = self.client.get(reverse('visualizar_ticket', args=[imagen.ticket_id]))
+        self.assertContains(respuesta, 'Procesando…')
+
+        [trabajo_id] = tomar_trabajos(10, 'prueba')
+        self.assertEqual(procesar_trabajo(trabajo_id), 'completado')
+        imagen.refresh_from_db()
+        self.assertEqual(imagen.estado_versiones, 'lista')
+        self.assertEqual(imagen.pantalla_ancho, 800)
+
+    def test_encolar_dos_veces_no_duplica(self):
+        imagen = self.adjuntar(100, 100)
+        encolar_versiones(imagen)
+        encolar_versiones(imagen)
+        self.assertEqual(TrabajoImagen.objects.count(), 1)
+        self.assertEqual(tomar_trabajos(10, 'a'), [TrabajoImagen.objects.get().id])
+        self.assertEqual(tomar_trabajos(10, 'b'), [])
+
+    def test_archivo_invalido_no_se_reintenta(self):
+        archivo = SimpleUploadedFile('foto.jpg', b'no es una imagen')
+        imagen = ImagenTicket.objects.create(ticket=self.ticket, imagen=archivo, nombre_archivo=archivo.name)
+        encolar_versiones(imagen)
+        [trabajo_id] = tomar_trabajos(10, 'prueba')
+        procesar_trabajo(trabajo_id)
+        imagen.refresh_from_db()
+        self.assertEqual(imagen.estado_versiones, 'fallida')
+
+    def test_error_transitorio_reintenta_con_backoff(self):
+        imagen = self.adjuntar(100, 100)
+        encolar_versiones(imagen)
+        with mock.patch('usuarios.trabajos.generar_versiones', side_effect=OSError('disco lleno')):
+            for intento in range(1, MAX_INTENTOS + 1):
+                TrabajoImagen.objects.update(disponible_en=timezone.now())
+                [trabajo_id] = tomar_trabajos(10, 'prueba')
+                estatus = procesar_trabajo(trabajo_id)
+                trabajo = TrabajoImagen.objects.get(id=trabajo_id)
+                self.assertEqual(trabajo.intentos, intento)
+                if intento < MAX_INTENTOS:
+                    self.assertEqual(estatus, 'pendiente')
+                    self.assertGreater(trabajo.disponible_en, timezone.now())
+        self.assertEqual(estatus, 'fallido')
+        imagen.refresh_from_db()
+        self.assertEqual(imagen.estado_versiones, 'fallida')
+
+
+class AlmacenamientoDeduplicadoTests(ImagenesTemporalesMixin, CacheAisladaTestCase):
+    """Un archivo por contenido; se borra del disco al quitar su última referencia"""
+
+    def test_misma_imagen_se_guarda_una_vez(self):
+        primera = self.adjuntar(200, 100)
+        segunda = self.adjuntar(200, 100)
+        self.assertEqual(primera.imagen.name, segunda.imagen.name)
+        self.assertTrue(primera.imagen.name.startswith('blobs/'))
+        self.assertEqual(ArchivoContenido.objects.get(nombre=primera.imagen.name).referencias, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            primera.delete()
+        self.assertTrue(almacenamiento.exists(segunda.imagen.name))
+        self.assertEqual(ArchivoContenido.objects.get(nombre=segunda.imagen.name).referencias, 1)
+
+        # Al eliminar el ticket, la imagen se borra en cascada y con ella el último uso del archivo
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.delete()
+        self.assertFalse(almacenamiento.exists(segunda.imagen.name))
+        self.assertFalse(ArchivoContenido.objects.exists())
+
+    def test_convertir_archivos_existentes(self):
+        # Dos copias del mismo archivo, como las que dejaba ImageField antes de la conversión
+        viejo = FileSystemStorage()
+        nombres = [viejo.save(f'tickets/2025/07/foto{sufijo}.webp', ContentFile(b'mismo contenido')) for sufijo in ('', '_9fnilz4')]
+        for nombre in nombres:
+            ImagenTicket.objects.create(ticket=self.ticket, imagen=nombre, nombre_archivo='foto.webp')
+
+        call_command('convertir_almacenamiento', stdout=StringIO())
+
+        blobs = set(ImagenTicket.objects.values_list('imagen', flat=True))
+        self.assertEqual(len(blobs), 1)
+        [blob] = blobs
+        self.assertEqual(ArchivoContenido.objects.get(nombre=blob).referencias, 2)
+        self.assertTrue(almacenamiento.exists(blob))
+        for nombre in nombres:
+            self.assertFalse(viejo.exists(nombre))
+
+
+class SubidasImagenesTests(ImagenesTemporalesMixin, CacheAisladaTestCase):
+    """Las subidas se validan mientras llegan: lo que no es imagen no se guarda en ningún lado"""
+
+    def setUp(self):
+        super().setUp()
+        sesion = self.client.session
+        sesion['usuario_id'] = self.creador.id
+        sesion.save()
+
+    def crear_ticket(self, *archivos):
+        return self.client.post(reverse('crear_ticket'), {
+            'titulo': 'Monitor', 'descripcion': 'Parpadea', 'categoria': 'soporte_tecnico',
+            'nivel_urgencia': '2', 'imagenes': list(archivos),
+        }, follow=True)
+
+    def png_ruidoso(self, lado):
+        # Ruido: el PNG no se comprime y pasa de la cabecera retenida
+        contenido = BytesIO()
+        Image.frombytes('RGB', (lado, lado), os.urandom(lado * lado * 3)).save(contenido, 'PNG')
+        return SimpleUploadedFile('captura.png', contenido.getvalue(), content_type='image/png')
+
+    def test_imagen_valida_se_guarda(self):
+        # En memoria y, si el envío no cabe en FILE_UPLOAD_MAX_MEMORY_SIZE, en un temporal
+        for max_memoria in (settings.FILE_UPLOAD_MAX_MEMORY_SIZE, 0):
+            with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=max_memoria):
+                self.crear_ticket(self.png_ruidoso(400))
+        imagenes = ImagenTicket.objects.filter(ticket__titulo='Monitor')
+        self.assertEqual(len(imagenes), 2)
+        for imagen in imagenes:
+            self.assertGreater(imagen.imagen.size, BYTES_CABECERA)
+            with Image.open(imagen.imagen.path) as guardada:
+                guardada.verify()
+
+    def test_texto_con_extension_de_imagen_se_rechaza(self):
+        falso = SimpleUploadedFile('foto.jpg', b'x' * (BYTES_CABECERA * 2), content_type='image/jpeg')
+        # Aunque el envío no quepa en memoria, el archivo rechazado no llega a un temporal
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0), \
+                mock.patch('usuarios.subidas.TemporaryUploadedFile') as temporal:
+            respuesta = self.crear_ticket(falso)
+        temporal.assert_not_called()
+        self.assertContains(respuesta, 'no es una imagen válida')
+        self.assertFalse(Ticket.objects.filter(titulo='Monitor').exists())
+
+    def test_limites_de_tamano(self):
+        with override_settings(SUBIDAS_MAX_BYTES_ARCHIVO=100 * 1024):
+            respuesta = self.crear_ticket(self.png_ruidoso(400))
+        self.assertContains(respuesta, 'pesa más de')
+
+        with override_settings(SUBIDAS_MAX_BYTES_PETICION=100 * 1024):
+            respuesta = self.crear_ticket(self.png_ruidoso(400))
+        self.assertContains(respuesta, 'el máximo por envío')
+        self.assertFalse(Ticket.objects.filter(titulo='Monitor').exists())
+
+    def test_limite_por_envio_con_csrf(self):
+        # Con el token CSRF del formulario, como en el navegador: el envío que pasa del límite
+        # llega a la vista (no un 403 del middleware) y el usuario ve el motivo
+        cliente = Client(enforce_csrf_checks=True)
+        cliente.cookies = self.client.cookies
+        cliente.get(reverse('crear_ticket'))
+        token = cliente.cookies[settings.CSRF_COOKIE_NAME].value
+        with override_settings(SUBIDAS_MAX_BYTES_PETICION=100 * 1024):
+            respuesta = cliente.post(reverse('crear_ticket'), {
+                'csrfmiddlewaretoken': token, 'titulo': 'Monitor', 'descripcion': 'Parpadea',
+                'categoria': 'soporte_tecnico', 'nivel_urgencia': '2', 'imagenes': [self.png_ruidoso(400)],
+            }, follow=True)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'el máximo por envío')
+        self.assertFalse(Ticket.objects.filter(titulo='Monitor').exists())
+
+    def test_imagen_chica_dañada(self):
+        contenido = BytesIO()
+        Image.new('RGB', (50, 50), 'navy').save(contenido, 'PNG')
+        dañada = contenido.getvalue()[:-20]
+        respuesta = self.crear_ticket(SimpleUploadedFile('foto.png', dañada, content_type='image/png'))
+        self.assertContains(respuesta, 'dañada')
+
+
+class MediaProtegidaTests(ImagenesTemporalesMixin, CacheAisladaTestCase):
+    """Media con permisos del ticket, validadores de caché, Range y envío por el servidor web"""
+
+    def setUp(self):
+        super().setUp()
+        self.imagen = self.adjuntar(300, 200)
+        self.url = self.imagen.imagen.url
+        self.contenido = almacenamiento.open(self.imagen.imagen.name).read()
+
+    def iniciar_sesion(self, usuario):
+        sesion = self.client.session
+        sesion['usuario_id'] = usuario.id
+        sesion.save()
+
+    def test_solo_quien_ve_el_ticket(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        ajeno = Usuario.objects.create(nombre='Luis', apellido='Mora', email='luis@example.com', rol='usuario', admitido=True)
+        self.iniciar_sesion(ajeno)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        # Una foto de perfil la ve cualquiera con sesión
+        ajeno.foto_perfil = self.imagen.imagen.name
+        ajeno.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.iniciar_sesion(self.creador)
+        respuesta = self.client.get(self.url)
+        self.assertEqual(b''.join(respuesta.streaming_content), self.contenido)
+        sha256 = ArchivoContenido.objects.get(nombre=self.imagen.imagen.name).sha256
+        self.assertEqual(respuesta['ETag'], f'"{sha256}"')
+        self.assertIn('immutable', respuesta['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': respuesta['ETag']}).status_code, 304)
+
+    def test_range(self):
+        self.iniciar_sesion(self.creador)
+        tamano = len(self.contenido)
+        respuesta = self.client.get(self.url, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(respuesta.status_code, 206)
+        self.assertEqual(respuesta['Content-Range'], f'bytes 10-19/{tamano}')
+        self.assertEqual(b''.join(respuesta.streaming_content), self.contenido[10:20])
+
+        respuesta = self.client.get(self.url, headers={'Range': 'bytes=-5'})
+        self.assertEqual(b''.join(respuesta.streaming_content), self.contenido[-5:])
+        respuesta = self.client.get(self.url, headers={'Range': f'bytes={tamano}-'})
+        self.assertEqual(respuesta.status_code, 416)
+        # If-Range con otro ETag: el archivo cambió, se manda completo
+        respuesta = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"otro"'})
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_envio_por_proxy(self):
+        self.iniciar_sesion(self.creador)
+        with override_settings(MEDIA_ENVIO='x-accel-redirect'):
+            respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta['X-Accel-Redirect'], f'/media-interno/{self.imagen.imagen.name}')
+        self.assertEqual(respuesta.content, b'')
+        with override_settings(MEDIA_ENVIO='x-sendfile'):
+            respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta['X-Sendfile'], self.imagen.imagen.path)
+
+
+class LimpiarMediaTests(ImagenesTemporalesMixin, CacheAisladaTestCase):
+    """limpiar_media borra solo archivos sin referencia y más viejos que el periodo de gracia"""
+
+    def crear_archivo(self, nombre, horas):
+        ruta = os.path.join(self.media, nombre)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'contenido')
+        hace = timezone.now().timestamp() - horas * 3600
+        os.utime(ruta, (hace, hace))
+        return ruta
+
+    def test_borra_huerfanos_viejos(self):
+        imagen = self.adjuntar(120, 80)
+        os.utime(imagen.imagen.path, (0, 0))
+        viejo = self.crear_archivo('reportes/v.txt', horas=48)
+        reciente = self.crear_archivo('tickets/2025/07/subiendo.jpg', horas=1)
+        blob = self.adjuntar(60, 60)
+        ImagenTicket.objects.filter(id=blob.id).delete()  # sin ejecutar el on_commit: el blob queda huérfano
+        os.utime(blob.imagen.path, (0, 0))
+
+        salida = StringIO()
+        # Consulta solo los nombres de cada lote, nunca la lista completa de archivos en uso
+        with mock.patch('usuarios.management.commands.limpiar_media.LOTE_NOMBRES', 1), \
+                mock.patch('usuarios.almacenamiento.nombres_en_uso', side_effect=AssertionError):
+            call_command('limpiar_media', '--dry-run', stdout=salida)
+        self.assertIn('Se borrarían 2 archivos', salida.getvalue())
+        self.assertTrue(os.path.exists(viejo))
+
+        call_command('limpiar_media', stdout=StringIO())
+        self.assertFalse(os.path.exists(viejo))
+        self.assertFalse(os.path.exists(blob.imagen.path))
+        self.assertFalse(ArchivoContenido.objects.filter(nombre=blob.imagen.name).exists())
+        self.assertTrue(os.path.exists(reciente))
+        self.assertTrue(os.path.exists(imagen.imagen.path))
+
+
+class FotoPerfilTests(ImagenesTemporalesMixin, CacheAisladaTestCase):
+    """Cambiar la foto genera avatares de tamaño fijo e invalida solo la caché de ese usuario"""
+
+    def subir_foto(self, color):
+        contenido = BytesIO()
+        Image.new('RGB', (640, 480), color).save(contenido, 'JPEG')
+        return self.client.post(reverse('subir_foto_perfil'), {
+            'foto_perfil': SimpleUploadedFile('yo.jpg', contenido.getvalue(), content_type='image/jpeg'),
+        })
+
+    def test_avatares_e_invalidacion_puntual(self):
+        sesion = self.client.session
+        sesion['usuario_id'] = self.creador.id
+        sesion.save()
+        cache.set('otra:entrada', 'sigue')
+        sellos = cache.get_many([AMBITO_PERSONAL, AMBITO_GLOBAL])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subir_foto('navy')
+        usuario = obtener_usuario(self.creador.id)
+        for campo, lado in AVATARES:
+            with Image.open(getattr(usuario, campo).path) as avatar:
+                self.assertEqual((avatar.format, avatar.size), ('WEBP', (lado, lado)))
+        self.assertEqual(cache.get('otra:entrada'), 'sigue')
+        self.assertEqual(cache.get_many([AMBITO_PERSONAL, AMBITO_GLOBAL]), sellos)
+
+        anteriores = usuario.archivos_foto()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subir_foto('teal')
+        self.assertNotEqual(obtener_usuario(self.creador.id).url_avatar, usuario.url_avatar)
+        for nombre in anteriores:
+            self.assertFalse(almacenamiento.exists(nombre))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('eliminar_foto_perfil'))
+        self.assertEqual(obtener_usuario(self.creador.id).archivos_foto(), [])
+        self.assertFalse(ArchivoContenido.objects.exists())
+
+
+class DescargaZipTests(ImagenesTemporalesMixin, CacheAisladaTestCase):
+    """El ZIP de adjuntos se arma por bloques, con los mismos permisos que ver el ticket"""
+
+    def test_zip_de_ticket_y_reporte(self):
+        self.adjuntar(100, 100)
+        self.adjuntar(100, 100, 'BMP')
+        grande = ImagenTicket.objects.create(
+            ticket=self.ticket, nombre_archivo='foto.jpeg',
+            imagen=SimpleUploadedFile('grande.jpg', os.urandom(TAMANO_BLOQUE * 4)),
+        )
+        reporte = ReporteFinalizacion.objects.create(
+            ticket=self.ticket, titulo='Listo', reporte='Cambio de tóner', descripcion='-', creado_por=self.creador
+        )
+        ImagenReporte.objects.create(reporte=reporte, imagen=grande.imagen.name, nombre_archivo='../../evidencia.jpg')
+
+        ajeno = Usuario.objects.create(nombre='Luis', apellido='Mora', email='luis@example.com', rol='usuario', admitido=True)
+        sesion = self.client.session
+        sesion['usuario_id'] = ajeno.id
+        sesion.save()
+        self.assertRedirects(self.client.get(reverse('descargar_adjuntos', args=[self.ticket.id])), reverse('dashboard'), fetch_redirect_response=False)
+
+        sesion['usuario_id'] = self.creador.id
+        sesion.save()
+        respuesta = self.client.get(reverse('descargar_adjuntos', args=[self.ticket.id]))
+        partes = list(respuesta.streaming_content)
+        self.assertLessEqual(max(len(parte) for parte in partes), TAMANO_BLOQUE * 2)
+
+        with zipfile.ZipFile(BytesIO(b''.join(partes))) as archivo_zip:
+            self.assertIsNone(archivo_zip.testzip())
+            tipos = {info.filename: info.compress_type for info in archivo_zip.infolist()}
+            self.assertEqual(archivo_zip.read('reporte/evidencia.jpg'), grande.imagen.open('rb').read())
+        self.assertEqual(tipos, {
+            'ticket/foto.jpeg': zipfile.ZIP_STORED,
+            'ticket/foto.bmp': zipfile.ZIP_DEFLATED,
+            'ticket/foto (2).jpeg': zipfile.ZIP_STORED,
+            'reporte/evidencia.jpg': zipfile.ZIP_STORED,
+        })
+
+
+class BandejaCorreosTests(CacheAisladaTestCase):
+    """Los correos se guardan con el cambio que los origina y los manda el worker por lotes"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True)
+        self.tecnico = Usuario.objects.create(
+            nombre='Beto', apellido='Díaz', email='beto@example.com', rol='sistemas',
+            categoria_sistemas='soporte_tecnico', admitido=True,
+        )
+        self.ticket = Ticket.objects.create(
+            titulo='Impresora', descripcion='No imprime', categoria='soporte_tecnico',
+            usuario=self.creador, asignado_a=self.tecnico,
+        )
+
+    def test_completar_ticket_encola_y_el_worker_envia(self):
+        sesion = self.client.session
+        sesion['usuario_id'] = self.tecnico.id
+        sesion.save()
+        self.client.post(reverse('completar_ticket', args=[self.ticket.id]), {'reporte': 'Tóner', 'descripcion': 'Cambio'})
+        self.assertEqual(mail.outbox, [])
+        correo = CorreoSaliente.objects.get()
+        self.assertEqual((correo.estatus, correo.destinatarios), ('pendiente', ['ana@example.com']))
+
+        salida = StringIO()
+        call_command('enviar_correos', '--una-vez', stdout=salida)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Ticket Completado: Impresora')
+        self.assertEqual(CorreoSaliente.objects.get().estatus, 'enviado')
+        self.assertIn('1 enviados', salida.getvalue())
+
+    def test_reintentos_y_descartados(self):
+        rechazado = encolar_correo('Hola', 'Texto', ['nadie@example.com'])
+        temporal = encolar_correo('Hola', 'Texto', ['ana@example.com'])
+        bueno = encolar_correo('Hola', 'Texto', ['beto@example.com'])
+
+        envios_reales = mail.get_connection().send_messages
+
+        def enviar(mensajes):
+            destinatario = mensajes[0].to[0]
+            if destinatario == 'nadie@example.com':
+                raise smtplib.SMTPRecipientsRefused({destinatario: (550, b'No existe')})
+            if destinatario == 'ana@example.com':
+                raise smtplib.SMTPServerDisconnected('Conexión perdida')
+            return envios_reales(mensajes)
+
+        conexion = mail.get_connection()
+        with mock.patch('usuarios.correos.get_connection', return_value=conexion), \
+                mock.patch.object(conexion, 'send_messages', side_effect=enviar):
+            resultado = enviar_lote(tomar_trabajos(10, 'pruebas', modelo=CorreoSaliente))
+
+        self.assertEqual(resultado, {'enviado': 1, 'pendiente': 1, 'fallido': 1})
+        self.assertEqual(CorreoSaliente.objects.get(id=bueno.id).estatus, 'enviado')
+        self.assertEqual(CorreoSaliente.objects.get(id=rechazado.id).estatus, 'fallido')
+        temporal.refresh_from_db()
+        self.assertEqual((temporal.estatus, temporal.intentos), ('pendiente', 1))
+        self.assertGreater(temporal.disponible_en, timezone.now())
+
+
+class NotificacionesTests(CacheAisladaTestCase):
+    """Un ticket nuevo avisa al equipo de su categoría y a los admin según su preferencia"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True)
+        crear = lambda nombre, **datos: Usuario.objects.create(
+            nombre=nombre, apellido='X', email=f'{nombre.lower()}@example.com', admitido=True, **datos
+        )
+        crear('Soporte', rol='sistemas', categoria_sistemas='soporte_tecnico')
+        crear('Callado', rol='sistemas', categoria_sistemas='soporte_tecnico', notificaciones='ninguna')
+        crear('Redes', rol='sistemas', categoria_sistemas='infraestructura')
+        self.admin = crear('Jefa', rol='admin', notificaciones='resumen')
+
+    def crear_ticket(self, titulo):
+        return self.client.post(reverse('crear_ticket'), {
+            'titulo': titulo, 'descripcion': 'No funciona', 'categoria': 'soporte_tecnico', 'nivel_urgencia': 2,
+        })
+
+    def test_reparto_y_resumen(self):
+        sesion = self.client.session
+        sesion['usuario_id'] = self.creador.id
+        sesion.save()
+        self.crear_ticket('Impresora')
+        self.crear_ticket('Monitor')
+
+        inmediatos = CorreoSaliente.objects.order_by('id')
+        self.assertEqual([correo.destinatarios for correo in inmediatos], [['soporte@example.com']] * 2)
+        self.assertIn('Impresora', inmediatos[0].cuerpo)
+        self.assertEqual(NotificacionPendiente.objects.filter(usuario=self.admin).count(), 2)
+
+        # Destinatarios en una sola consulta, sin importar cuántos sean
+        ticket = Ticket.objects.get(titulo='Monitor')
+        with self.assertNumQueries(1):
+            destinatarios_ticket_nuevo(ticket)
+
+        call_command('enviar_resumenes', stdout=StringIO())
+        resumen = CorreoSaliente.objects.get(destinatarios=['jefa@example.com'])
+        self.assertIn('Hay 2 tickets nuevos', resumen.cuerpo)
+        self.assertIn('Monitor', resumen.cuerpo)
+        self.assertFalse(NotificacionPendiente.objects.exists())
+
+
+class EventosTicketsTests(CacheAisladaTestCase):
+    """Eventos SSE: se generan al COMMIT y cada conexión recibe solo los tickets que puede ver"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True)
+        self.soporte = Usuario.objects.create(nombre='Luis', apellido='Pérez', email='luis@example.com', rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True)
+        self.redes = Usuario.objects.create(nombre='Eva', apellido='Ruiz', email='eva@example.com', rol='sistemas', categoria_sistemas='infraestructura', admitido=True)
+
+    def test_eventos_al_confirmar(self):
+        with mock.patch('usuarios.eventos.difusor') as difusor:
+            with self.captureOnCommitCallbacks(execute=True):
+                ticket = Ticket.objects.create(titulo='Impresora', descripcion='-', categoria='soporte_tecnico', usuario=self.creador)
+            with self.captureOnCommitCallbacks(execute=True):
+                ticket = Ticket.objects.get(id=ticket.id)
+                ticket.asignado_a = self.soporte
+                ticket.estatus = 'en_proceso'
+                ticket.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                # Guardar sin cambios no anuncia nada
+                ticket.save()
+
+        publicados = [llamada.args[0] for llamada in difusor.return_value.publicar.call_args_list]
+        self.assertEqual([evento['tipo'] for evento in publicados], ['creado', 'asignado', 'estatus'])
+        self.assertEqual(publicados[1]['asignado_a_id'], self.soporte.id)
+        self.assertIsNone(publicados[1]['anterior_asignado_id'])
+
+    def test_reparto_segun_permisos(self):
+        evento = evento_ticket('creado', Ticket(id=1, titulo='Red', categoria='infraestructura', usuario=self.creador, estatus='pendiente', nivel_urgencia=2))
+
+        async def escuchar():
+            difusor = DifusorLocal()
+            suscripciones = {usuario.nombre: difusor.suscribir(usuario) for usuario in (self.creador, self.soporte, self.redes)}
+            # Publicar desde otro hilo, como lo hace on_commit en una vista síncrona
+            await asyncio.to_thread(difusor.publicar, evento)
+            await asyncio.sleep(0)
+            return {nombre: suscripcion.cola.qsize() for nombre, suscripcion in suscripciones.items()}
+
+        self.assertEqual(asyncio.run(escuchar()), {'Ana': 1, 'Luis': 0, 'Eva': 1})
+
+    async def test_canal_sse(self):
+        sesion = await self.async_client.asession()
+        sesion['usuario_id'] = self.soporte.id
+        await sesion.asave()
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = sesion.session_key
+
+        respuesta = await self.async_client.get(reverse('eventos_tickets'))
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        contenido = aiter(respuesta.streaming_content)
+        self.assertEqual(await anext(contenido), b'retry: 10000\n\n')
+
+        difusor().publicar({'tipo': 'urgencia', 'ticket_id': 7, 'usuario_id': self.creador.id, 'asignado_a_id': self.soporte.id,
+                            'anterior_asignado_id': None, 'categoria': 'infraestructura'})
+        self.assertIn(b'event: urgencia\ndata: {"tipo": "urgencia", "ticket_id": 7', await anext(contenido))
+        self.assertEqual(difusor().conexiones(), 1)
+        await contenido.aclose()
+
+    def test_conexion_listen_fuera_del_loop(self):
+        lector, escritor = socket.socketpair()
+        self.addCleanup(lector.close)
+        self.addCleanup(escritor.close)
+        intentos = [OSError('sin servidor'), mock.Mock(fileno=lector.fileno)]
+        hilos = []
+
+        def conectar():
+            hilos.append(threading.current_thread())
+            intento = intentos.pop(0)
+            if isinstance(intento, Exception):
+                raise intento
+            return intento
+
+        async def suscribir():
+            difusor_pg = DifusorPostgres()
+            loop = asyncio.get_running_loop()
+            with mock.patch.object(DifusorPostgres, '_conectar', side_effect=conectar) as conectar_mock, \
+                    mock.patch('usuarios.eventos.REINTENTO_LISTEN', 0), \
+                    mock.patch.object(loop, 'add_reader', wraps=loop.add_reader) as add_reader:
+                # Varias suscripciones mientras conecta abren una sola conexión
+                for usuario in (self.creador, self.soporte, self.redes):
+                    difusor_pg.suscribir(usuario)
+                self.assertFalse(add_reader.called)
+                await difusor_pg._conexion_pendiente
+                loop.remove_reader(lector.fileno())
+            return conectar_mock.call_count, add_reader.call_count, difusor_pg._escucha
+
+        llamadas, lectores, escucha = asyncio.run(suscribir())
+        # Un intento fallido y uno bueno; el lector se agrega solo con la conexión abierta
+        self.assertEqual((llamadas, lectores), (2, 1))
+        self.assertEqual(escucha.fileno(), lector.fileno())
+        # connect() corrió en hilos del executor, no en el del loop
+        self.assertNotIn(threading.main_thread(), hilos)
+
+    def test_sin_asgi(self):
+        sesion = self.client.session
+        sesion['usuario_id'] = self.soporte.id
+        sesion.save()
+        self.assertEqual(self.client.get(reverse('eventos_tickets')).status_code, 204)
+
+
+def cargar_rutas(vistas_async):
+    """Vuelve a cargar prueba1.urls como lo haría el servidor ASGI (True) o WSGI (False)"""
+    with override_settings(VISTAS_ASYNC=vistas_async):
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+class AccionesAsyncTests(CacheAisladaTestCase):
+    """Las acciones JSON del dashboard: vistas async bajo ASGI y síncronas bajo WSGI, con el mismo resultado"""
+
+    def setUp(self):
+        super().setUp()
+        cargar_rutas(True)
+        self.addCleanup(cargar_rutas, False)
+        self.admin = Usuario.objects.create(nombre='Jefa', apellido='X', email='jefa@example.com', rol='admin', admitido=True)
+        self.soporte = Usuario.objects.create(nombre='Luis', apellido='Pérez', email='luis@example.com', rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True)
+        self.ticket = Ticket.objects.create(titulo='Impresora', descripcion='-', categoria='soporte_tecnico', usuario=self.admin)
+
+    async def iniciar_sesion(self, usuario):
+        sesion = await self.async_client.asession()
+        await sesion.aset('usuario_id', usuario.id)
+        await sesion.asave()
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = sesion.session_key
+
+    async def test_acciones_bajo_asgi(self):
+        await self.iniciar_sesion(self.soporte)
+        respuesta = await self.async_client.post(reverse('aceptar_ticket', args=[self.ticket.id]))
+        self.assertTrue(respuesta.json()['success'])
+        ticket = await Ticket.objects.aget(id=self.ticket.id)
+        self.assertEqual((ticket.asignado_a_id, ticket.estatus), (self.soporte.id, 'en_proceso'))
+
+        await self.iniciar_sesion(self.admin)
+        respuesta = await self.async_client.post(reverse('cambiar_estatus', args=[self.ticket.id]), {'estatus': 'finalizado'})
+        self.assertIn('sin reporte', respuesta.json()['error'])
+        respuesta = await self.async_client.post(reverse('reasignar_ticket', args=[self.ticket.id]), {'nuevo_usuario_sistemas_id': ''})
+        self.assertTrue(respuesta.json()['success'])
+        ticket = await Ticket.objects.aget(id=self.ticket.id)
+        self.assertEqual((ticket.asignado_a_id, ticket.estatus), (None, 'generado'))
+        respuesta = await self.async_client.post(reverse('eliminar_ticket', args=[self.ticket.id]))
+        self.assertTrue(respuesta.json()['success'])
+        self.assertFalse(await Ticket.objects.filter(id=self.ticket.id).aexists())
+
+    async def test_siguiente_ticket(self):
+        await self.iniciar_sesion(self.soporte)
+        respuesta = await self.async_client.post(reverse('siguiente_ticket'))
+        self.assertEqual(respuesta.json()['url'], reverse('visualizar_ticket', args=[self.ticket.id]))
+        respuesta = await self.async_client.post(reverse('siguiente_ticket'))
+        self.assertEqual(respuesta.json()['error'], 'No hay tickets disponibles por ahora')
+
+    async def test_usuario_eliminado_limpia_sesion(self):
+        await self.iniciar_sesion(self.soporte)
+        await self.soporte.adelete()
+        respuesta = await self.async_client.post(reverse('aceptar_ticket', args=[self.ticket.id]))
+        self.assertEqual(respuesta.json()['error'], 'No autorizado')
+
+    async def test_urgencia_faltante(self):
+        await self.iniciar_sesion(self.admin)
+        self.assertIs(resolve(reverse('cambiar_urgencia', args=[self.ticket.id])).func, views_async.cambiar_urgencia)
+        respuesta = await self.async_client.post(reverse('cambiar_urgencia', args=[self.ticket.id]))
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_acciones_bajo_wsgi(self):
+        cargar_rutas(False)
+        # Bajo WSGI se resuelven las vistas síncronas: sin async_to_sync por petición
+        for nombre in ('aceptar_ticket', 'cambiar_urgencia', 'reasignar_ticket'):
+            vista = resolve(reverse(nombre, args=[self.ticket.id])).func
+            self.assertIs(vista, getattr(views, nombre))
+            self.assertFalse(iscoroutinefunction(vista))
+        self.assertTrue(iscoroutinefunction(views_async.cambiar_urgencia))
+
+        sesion = self.client.session
+        sesion['usuario_id'] = self.admin.id
+        sesion.save()
+        respuesta = self.client.post(reverse('cambiar_urgencia', args=[self.ticket.id]), {'urgencia': 4})
+        self.assertEqual(respuesta.json()['message'], 'Urgencia cambiada de "Media" a "Crítica"')
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.nivel_urgencia, 4)
+        self.assertEqual(self.client.post(reverse('cambiar_urgencia', args=[self.ticket.id]), {'urgencia': 'x'}).status_code, 400)
+        respuesta = self.client.post(reverse('reasignar_ticket', args=[self.ticket.id]), {'nuevo_usuario_sistemas_id': self.soporte.id})
+        self.assertTrue(respuesta.json()['success'])
+        self.assertEqual(respuesta.json()['message'], 'Ticket reasignado a Luis Pérez')
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class AsignacionConcurrenteTests(TransactionTestCase):
+    """Tomar un ticket es un UPDATE condicional: con varios hilos a la vez gana exactamente uno"""
+
+    HILOS = 8
+
+    def setUp(self):
+        cache.clear()
+        self.creador = Usuario.objects.create(nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True)
+        self.equipo = [
+            Usuario.objects.create(nombre=f'Soporte{numero}', apellido='X', email=f's{numero}@example.com',
+                                   rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True)
+            for numero in range(self.HILOS)
+        ]
+
+    def competir(self, tomar):
+        """Corre tomar(usuario) en un hilo por integrante del equipo, todos a la vez"""
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+
+        def intentar(usuario):
+            barrera.wait()
+            try:
+                while True:
+                    try:
+                        resultados.append((usuario.id, tomar(usuario)))
+                        break
+                    except OperationalError as error:
+                        # SQLite en memoria no espera el candado de otra conexión (PostgreSQL sí):
+                        # el intento no escribió nada y se repite
+                        if 'locked' not in str(error):
+                            raise
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=intentar, args=(usuario,)) for usuario in self.equipo]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+
+    def test_un_solo_ganador_por_ticket(self):
+        for numero in range(5):
+            ticket = Ticket.objects.create(titulo=f'Ticket {numero}', descripcion='-', categoria='soporte_tecnico', usuario=self.creador)
+            # Cada hilo con su propia instancia, leída antes de que nadie gane
+            instancias = {usuario.id: Ticket.objects.get(id=ticket.id) for usuario in self.equipo}
+            resultados = self.competir(lambda usuario: tomar_ticket(instancias[usuario.id], usuario))
+
+            self.assertEqual(len(resultados), self.HILOS)
+            ganadores = [usuario_id for usuario_id, (ganado, _) in resultados if ganado]
+            self.assertEqual(len(ganadores), 1)
+            # Los perdedores saben quién lo tiene
+            self.assertEqual({asignado.id for _, (ganado, asignado) in resultados if not ganado}, set(ganadores))
+            ticket.refresh_from_db()
+            self.assertEqual((ticket.asignado_a_id, ticket.estatus), (ganadores[0], 'en_proceso'))
+
+    def test_siguiente_sin_repetir(self):
+        for urgencia in (1, 3, 2, 4, 3):
+            Ticket.objects.create(titulo=f'Urgencia {urgencia}', descripcion='-', categoria='soporte_tecnico', usuario=self.creador, nivel_urgencia=urgencia)
+        Ticket.objects.create(titulo='Otra categoría', descripcion='-', categoria='infraestructura', usuario=self.creador, nivel_urgencia=4)
+
+        resultados = self.competir(tomar_siguiente)
+        entregados = [ticket.id for _, ticket in resultados if ticket is not None]
+        # Cinco tickets de soporte para ocho personas: nadie recibe uno repetido ni de otra categoría
+        self.assertEqual(len(entregados), 5)
+        self.assertEqual(len(set(entregados)), 5)
+        for usuario_id, ticket in resultados:
+            if ticket is not None:
+                self.assertEqual(Ticket.objects.get(id=ticket.id).asignado_a_id, usuario_id)
+
+    def test_siguiente_por_urgencia_y_antiguedad(self):
+        for titulo, urgencia in (('Vieja media', 2), ('Alta', 3), ('Nueva media', 2)):
+            Ticket.objects.create(titulo=titulo, descripcion='-', categoria='soporte_tecnico', usuario=self.creador, nivel_urgencia=urgencia)
+        orden = [tomar_siguiente(self.equipo[0]).titulo for _ in range(3)]
+        self.assertEqual(orden, ['Alta', 'Vieja media', 'Nueva media'])
+        self.assertIsNone(tomar_siguiente(self.equipo[0]))
+
+    def test_reasignar_con_datos_viejos(self):
+        ticket = Ticket.objects.create(titulo='Impresora', descripcion='-', categoria='soporte_tecnico', usuario=self.creador)
+        primera, segunda = Ticket.objects.get(id=ticket.id), Ticket.objects.get(id=ticket.id)
+        self.assertEqual(reasignar_ticket(primera, self.equipo[0]), (True, self.equipo[0]))
+        # La segunda lectura ya no coincide con la fila: no pisa la reasignación anterior
+        self.assertEqual(reasignar_ticket(segunda, self.equipo[1]), (False, self.equipo[0]))
+        # Al ganar, la instancia queda como la fila y la pestaña del asignado se invalida
+        self.assertEqual(primera.estatus, 'en_proceso')
+
+    def test_tomar_entre_leer_y_guardar(self):
+        admin = Usuario.objects.create(nombre='Jefa', apellido='X', email='jefa@example.com', rol='admin', admitido=True)
+        sesion = self.client.session
+        sesion['usuario_id'] = admin.id
+        sesion.save()
+        urgente = Ticket.objects.create(titulo='Impresora', descripcion='-', categoria='soporte_tecnico', usuario=self.creador)
+        en_espera = Ticket.objects.create(titulo='Monitor', descripcion='-', categoria='soporte_tecnico', usuario=self.creador)
+        leer, aleer = views.get_object_or_404, views_async.aget_object_or_404
+        sellos = {}
+
+        # Alguien del equipo toma el ticket justo después de que la vista lo leyó
+        def leer_y_tomar(*args, **kwargs):
+            ticket = leer(*args, **kwargs)
+            tomar_ticket(Ticket.objects.get(id=ticket.id), self.equipo[0])
+            sellos[self.equipo[0].id] = cache.get(ambito_asignado(self.equipo[0].id))
+            return ticket
+
+        async def aleer_y_tomar(*args, **kwargs):
+            ticket = await aleer(*args, **kwargs)
+            await atomar_ticket(await Ticket.objects.aget(id=ticket.id), self.equipo[1])
+            sellos[self.equipo[1].id] = await cache.aget(ambito_asignado(self.equipo[1].id))
+            return ticket
+
+        # La variante async (ASGI) y una vista síncrona
+        cargar_rutas(True)
+        self.addCleanup(cargar_rutas, False)
+        with mock.patch.object(views_async, 'aget_object_or_404', side_effect=aleer_y_tomar):
+            respuesta = self.client.post(reverse('cambiar_urgencia', args=[urgente.id]), {'urgencia': 4})
+        self.assertTrue(respuesta.json()['success'])
+        with mock.patch.object(views, 'get_object_or_404', side_effect=leer_y_tomar):
+            self.client.post(reverse('poner_en_espera', args=[en_espera.id]), {'motivo': 'Falta pieza'})
+
+        urgente.refresh_from_db()
+        en_espera.refresh_from_db()
+        # El guardado de la vista no regresa la asignación que leyó
+        self.assertEqual((urgente.asignado_a_id, urgente.estatus, urgente.nivel_urgencia), (self.equipo[1].id, 'en_proceso', 4))
+        self.assertEqual((en_espera.asignado_a_id, en_espera.estatus), (self.equipo[0].id, 'en_espera'))
+        # El guardado de la vista invalida la pestaña del asignado real, no la del que se leyó
+        for usuario_id, sello in sellos.items():
+            self.assertNotEqual(cache.get(ambito_asignado(usuario_id)), sello)
+
+
+class AutoasignacionTests(CacheAisladaTestCase):
+    """Autoasignación de tickets nuevos según la carga del equipo de la categoría"""
+
+    def setUp(self):
+        super().setUp()
+        self.creador = Usuario.objects.create(nombre='Ana', apellido='López', email='ana@example.com', rol='usuario', admitido=True)
+        self.luis = Usuario.objects.create(nombre='Luis', apellido='Pérez', email='luis@example.com', rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True)
+        self.eva = Usuario.objects.create(nombre='Eva', apellido='Ruiz', email='eva@example.com', rol='sistemas', categoria_sistemas='soporte_tecnico', admitido=True)
+        # Luis tiene una Crítica abierta (carga 4); Eva, dos Bajas (carga 2) y una finalizada
+        for asignado, urgencia, estatus in ((self.luis, 4, 'en_proceso'), (self.eva, 1, 'en_proceso'), (self.eva, 1, 'en_espera'), (self.eva, 3, 'finalizado')):
+            Ticket.objects.create(titulo='Previo', descripcion='-', categoria='soporte_tecnico', usuario=self.creador,
+                                  asignado_a=asignado, nivel_urgencia=urgencia, estatus=estatus)
+
+    def crear_ticket(self):
+        sesion = self.client.session
+        sesion['usuario_id'] = self.creador.id
+        sesion.save()
+        self.client.post(reverse('crear_ticket'), {
+            'titulo': 'Nuevo', 'descripcion': 'No funciona', 'categoria': 'soporte_tecnico', 'nivel_urgencia': 2,
+        })
+        return Ticket.objects.get(titulo='Nuevo')
+
+    def test_carga_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            candidatos = {c.id: (c.carga, c.finalizados) for c in candidatos_categoria('soporte_tecnico')}
+        self.assertEqual(candidatos, {self.luis.id: (4, 0), self.eva.id: (2, 1)})
+
+    @override_settings(AUTOASIGNACION='menor_carga')
+    def test_crear_ticket_asigna_a_menor_carga(self):
+        ticket = self.crear_ticket()
+        self.assertEqual((ticket.asignado_a_id, ticket.estatus, ticket.asignado_por_admin), (self.eva.id, 'en_proceso', True))
+
+    def test_desactivada(self):
+        self.assertIsNone(self.crear_ticket().asignado_a_id)
+
+    def test_estrategias(self):
+        equipo = [Candidato(1, carga=6, ultimo_ticket=9, finalizados=7), Candidato(2, carga=3, ultimo_ticket=8)]
+        ticket = Ticket(nivel_urgencia=2)
+        self.assertEqual(por_turnos(ticket, equipo).id, 2)
+        # Con 7 cerrados la carga de 1 pesa la cuarta parte: 1.5 contra 3
+        self.assertEqual(por_experiencia(ticket, equipo).id, 1)
+
+    def test_simulador(self):
+        salida = StringIO()
+        call_command('simular_asignacion', '--tickets', 300, '--personas', 3, stdout=salida)
+        for estrategia in ('turnos', 'menor_carga', 'experiencia'):
+            self.assertIn(f'📊 {estrategia}: media', salida.getvalue())
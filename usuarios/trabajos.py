@@ -0,0 +1,107 @@
+import os
+import random
+import socket
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .imagenes import generar_versiones
+from .models import ImagenTicket, ImagenReporte, TrabajoImagen
+
+MODELOS_IMAGEN = {'ticket': ImagenTicket, 'reporte': ImagenReporte}
+
+MAX_INTENTOS = 5
+# Espera antes del reintento n: 30 s, 1 min, 2 min, 4 min... con tope de una hora
+ESPERA_BASE = timedelta(seconds=30)
+ESPERA_MAXIMA = timedelta(hours=1)
+# Un trabajo 'procesando' más viejo que esto quedó huérfano (el worker murió): se vuelve a encolar
+TIEMPO_MAXIMO = timedelta(minutes=10)
+
+
+def encolar_versiones(adjunto):
+    """Encola la generación de versiones de un ImagenTicket/ImagenReporte recién guardado"""
+    modelo = 'reporte' if isinstance(adjunto, ImagenReporte) else 'ticket'
+    # ignore_conflicts: si ya hay un trabajo activo para la imagen, no se crea otro
+    TrabajoImagen.objects.bulk_create(
+        [TrabajoImagen(modelo=modelo, imagen_id=adjunto.id)], ignore_conflicts=True
+    )
+
+
+def nombre_worker():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def espera_reintento(intentos):
+    """Backoff exponencial con algo de azar para que los fallos simultáneos no se reintenten juntos"""
+    espera = min(ESPERA_BASE * 2 ** max(intentos - 1, 0), ESPERA_MAXIMA)
+    return espera * random.uniform(1, 1.2)
+
+
+def recuperar_huerfanos(modelo=TrabajoImagen):
+    """
+    Trabajos que un worker tomó y nunca terminó; devuelve cuántos se recuperaron. `modelo` es
+    cualquier cola con los campos de TrabajoImagen (estatus, intentos, disponible_en, tomado_*)
+    """
+    ahora = timezone.now()
+    huerfanos = modelo.objects.filter(estatus='procesando', tomado_en__lt=ahora - TIEMPO_MAXIMO)
+    fallidos = huerfanos.filter(intentos__gte=MAX_INTENTOS).update(
+        estatus='fallido', error='El worker no terminó el trabajo'
+    )
+    return fallidos + huerfanos.update(estatus='pendiente', disponible_en=ahora)
+
+
+def tomar_trabajos(limite, worker, modelo=TrabajoImagen):
+    """Marca como 'procesando' hasta `limite` trabajos disponibles y devuelve sus ids"""
+    ahora = timezone.now()
+    with transaction.atomic():
+        candidatos = modelo.objects.filter(
+            estatus='pendiente', disponible_en__lte=ahora
+        ).order_by('disponible_en', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Varios workers a la vez: cada uno se salta las filas que otro ya está tomando
+            candidatos = candidatos.select_for_update(skip_locked=True)
+        ids = list(candidatos.values_list('id', flat=True)[:limite])
+        # En SQLite no hay SKIP LOCKED; el filtro por estatus y tomado_por evita que dos
+        # workers se queden con el mismo trabajo
+        modelo.objects.filter(id__in=ids, estatus='pendiente').update(
+            estatus='procesando', intentos=F('intentos') + 1, tomado_por=worker, tomado_en=ahora
+        )
+    return list(modelo.objects.filter(
+        id__in=ids, estatus='procesando', tomado_por=worker, tomado_en=ahora
+    ).values_list('id', flat=True))
+
+
+def registrar_fallo(trabajo_id, error):
+    """Reprograma el trabajo con backoff, o lo da por fallido al agotar los intentos"""
+    trabajo = TrabajoImagen.objects.get(id=trabajo_id)
+    trabajo.error = str(error)[:2000]
+    if trabajo.intentos >= MAX_INTENTOS:
+        trabajo.estatus = 'fallido'
+        MODELOS_IMAGEN[trabajo.modelo].objects.filter(id=trabajo.imagen_id).update(estado_versiones='fallida')
+    else:
+        trabajo.estatus = 'pendiente'
+        trabajo.disponible_en = timezone.now() + espera_reintento(trabajo.intentos)
+    trabajo.save(update_fields=['estatus', 'error', 'disponible_en', 'fecha_edicion'])
+
+
+def procesar_trabajo(trabajo_id):
+    """
+    Ejecuta un trabajo ya tomado. Corre dentro de los procesos del pool del worker, así que
+    registra el resultado él mismo. Devuelve el estatus final del trabajo.
+    """
+    close_old_connections()
+    trabajo = TrabajoImagen.objects.get(id=trabajo_id)
+    adjunto = MODELOS_IMAGEN[trabajo.modelo].objects.filter(id=trabajo.imagen_id).first()
+    try:
+        # Si la imagen ya se eliminó no hay nada que hacer. Un archivo que no es imagen no
+        # se arregla reintentando: generar_versiones lo marca como fallido
+        if adjunto is not None:
+            generar_versiones(adjunto)
+    except Exception as error:
+        registrar_fallo(trabajo_id, error)
+        return TrabajoImagen.objects.values_list('estatus', flat=True).get(id=trabajo_id)
+
+    TrabajoImagen.objects.filter(id=trabajo_id).update(estatus='completado', error='')
+    return 'completado'
@@ -1,14 +1,58 @@
+import asyncio
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse
-from django.core.paginator import Paginator
-import os
-from django.core.mail import send_mail
-from django.db.models import Case, When, Value, IntegerField
-import pytz
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.http import require_safe
+from django.db import transaction
 from django.db.models import Q
+from django.urls import reverse
 from django.conf import settings
 from .models import Usuario, Ticket, ImagenTicket, ReporteFinalizacion, ImagenReporte, CancelacionTicket, MotivoEspera
+from .consultas import consultas_dashboard
+from .paginacion import paginar_pestana
+from .imagenes import cambiar_foto_perfil
+from .subidas import errores_subida
+from .trabajos import encolar_versiones
+from .correos import encolar_correo_ticket_completado
+from .notificaciones import notificar_ticket_nuevo
+from .fragmentos import FragmentosDashboard
+from .medios import adjuntos_ticket, puede_ver_archivo, respuesta_archivo, zip_adjuntos
+from .eventos import difusor, formato_sse
+from . import asignacion
+from .asignacion import autoasignar, guardar_ticket, tomar_siguiente, tomar_ticket
+
+# Segundos sin eventos tras los que se manda un comentario para que proxies y navegador no
+# den la conexión SSE por muerta
+LATIDO_EVENTOS_DEFAULT = 25
+
+# Variable de contexto (y de consultas_dashboard) con la lista de cada pestaña
+VARIABLES_PESTANA = {
+    'creados': 'mis_tickets_creados',
+    'asignados': 'tickets_asignados',
+    'disponibles': 'tickets_disponibles',
+    'todos': 'todos_los_tickets',
+}
+
+# Pestaña del servidor para cada data-tab de dashboard.html
+PESTANAS_POR_ID = {
+    'mis-tickets': 'creados',
+    'disponibles': 'disponibles',
+    'asignados': 'asignados',
+    'todos': 'todos',
+}
+
+def _ticket_ya_tomado(asignado):
+    """Respuesta para quien perdió la carrera por un ticket"""
+    if asignado is None:
+        return JsonResponse({'success': False, 'error': 'El ticket ya no está disponible'})
+    return JsonResponse({'success': False, 'error': f'El ticket ya está asignado a {asignado.nombre} {asignado.apellido}'})
+
+def _ticket_cambiado(asignado):
+    """Respuesta cuando otra persona reasignó o cerró el ticket mientras tanto"""
+    actual = f'{asignado.nombre} {asignado.apellido}' if asignado else 'nadie'
+    return JsonResponse({'success': False, 'error': f'El ticket cambió mientras tanto (ahora lo tiene {actual}). Recarga la página.'})
 
 def list_usuarios(request):
     # Manejar registro
@@ -86,196 +130,87 @@ def list_usuarios(request):
     # Mostrar formularios
     return render(request, 'usuarios/list_usuarios.html')
 
-def dashboard(request):
-    if 'usuario_id' not in request.session:
-        messages.warning(request, 'Debes iniciar sesión primero')
-        return redirect('list_usuarios')
-    
-    # Obtener el usuario actual
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
-    
-    # 🆕 OBTENER PARÁMETROS DE FILTRO
-    filtros = {
+def _filtros_dashboard(request):
+    """Parámetros de filtro del dashboard tomados de la query string"""
+    return {
         'search': request.GET.get('search', '').strip(),
         'urgency': request.GET.get('urgency', ''),
         'status': request.GET.get('status', ''),
         'date_from': request.GET.get('date_from', ''),
         'date_to': request.GET.get('date_to', ''),
     }
-    
-    # 🆕 FUNCIÓN HELPER PARA APLICAR FILTROS
-    def aplicar_filtros(queryset, tab_context='general'):
-        # Filtro por búsqueda (título)
-        if filtros['search']:
-            queryset = queryset.filter(titulo__icontains=filtros['search'])
-        
-        # Filtro por urgencia
-        if filtros['urgency']:
-            queryset = queryset.filter(nivel_urgencia=int(filtros['urgency']))
-        
-        # 🔧 Filtro por estatus - NO aplicar en tickets disponibles
-        if filtros['status'] and tab_context != 'disponibles':
-            queryset = queryset.filter(estatus=filtros['status'])
-        
-        # Filtro por rango de fechas
-        if filtros['date_from']:
-            from datetime import datetime
-            fecha_desde = datetime.strptime(filtros['date_from'], '%Y-%m-%d').date()
-            queryset = queryset.filter(fecha_creacion__date__gte=fecha_desde)
-        
-        if filtros['date_to']:
-            from datetime import datetime
-            fecha_hasta = datetime.strptime(filtros['date_to'], '%Y-%m-%d').date()
-            queryset = queryset.filter(fecha_creacion__date__lte=fecha_hasta)
-        
-        return queryset
-    
-    # Obtener reportes pendientes para el usuario actual
-    reportes_pendientes = []
-    tickets_anteriores = []
-    if usuario_actual.rol != 'sistemas':
-        # Reportes no vistos
-        reportes_pendientes = ReporteFinalizacion.objects.filter(
-            ticket__usuario=usuario_actual,
-            ticket__estatus='finalizado',
-            visto_por_usuario=False
-        )
-        # Tickets anteriores (reportes ya vistos)
-        tickets_anteriores = ReporteFinalizacion.objects.filter(
-            ticket__usuario=usuario_actual,
-            ticket__estatus='finalizado',
-            visto_por_usuario=True
-        )
-    
-    # 🔧 MODIFICADO: Mis tickets creados con filtros
-    mis_tickets_creados_query = Ticket.objects.filter(
-        usuario=usuario_actual
-    ).exclude(estatus='finalizado').order_by(
-        Case(
-            When(estatus='generado', then=Value(1)),
-            When(estatus='en_espera', then=Value(2)),
-            When(estatus='en_proceso', then=Value(3)),
-            When(estatus='finalizado', then=Value(4)),
-            When(estatus='cancelado', then=Value(5)),
-            output_field=IntegerField(),
-        ),
-        '-fecha_creacion'
-    )
-    
-    # Aplicar filtros
-    mis_tickets_creados_query = aplicar_filtros(mis_tickets_creados_query)
 
-    # Paginación para mis tickets creados
-    paginator_creados = Paginator(mis_tickets_creados_query, 10)
-    page_creados = request.GET.get('page_creados', 1)
-    mis_tickets_creados = paginator_creados.get_page(page_creados)
-    
-    # Para sistemas y admin: tickets asignados y disponibles
-    tickets_asignados = []
-    tickets_disponibles = []
-    usuarios_sistemas = []
-    todos_los_tickets_query = Ticket.objects.none()
-    
-    if usuario_actual.rol in ['sistemas', 'admin']:
-        # 🔧 MODIFICADO: Tickets asignados con filtros
-        tickets_asignados_query = Ticket.objects.filter(asignado_a=usuario_actual).order_by(
-            Case(
-                When(estatus='generado', then=Value(1)),
-                When(estatus='en_espera', then=Value(2)),
-                When(estatus='en_proceso', then=Value(3)),
-                When(estatus='finalizado', then=Value(4)),
-                When(estatus='cancelado', then=Value(5)),
-                output_field=IntegerField(),
-            ),
-            '-fecha_creacion'
-        )
-        
-        # Aplicar filtros
-        tickets_asignados_query = aplicar_filtros(tickets_asignados_query)
-        
-        # Paginación para tickets asignados
-        paginator_asignados = Paginator(tickets_asignados_query, 10)
-        page_asignados = request.GET.get('page_asignados', 1)
-        tickets_asignados = paginator_asignados.get_page(page_asignados)
-        
-        # 🔧 MODIFICADO: Tickets disponibles con filtros
-        if usuario_actual.rol == 'sistemas':
-            # Tickets disponibles para la categoría del usuario de sistemas
-            tickets_disponibles_query = Ticket.objects.filter(
-                categoria=usuario_actual.categoria_sistemas,
-                asignado_a__isnull=True,
-                estatus='generado'
-            ).order_by(
-                Case(
-                    When(estatus='generado', then=Value(1)),
-                    When(estatus='en_espera', then=Value(2)),
-                    When(estatus='en_proceso', then=Value(3)),
-                    When(estatus='finalizado', then=Value(4)),
-                    When(estatus='cancelado', then=Value(5)),
-                    output_field=IntegerField(),
-                ),
-                '-fecha_creacion'
-            )
-        elif usuario_actual.rol == 'admin':
-            # Admin puede ver todos los tickets disponibles
-            tickets_disponibles_query = Ticket.objects.filter(
-                asignado_a__isnull=True,
-                estatus='generado'
-            ).order_by(
-                Case(
-                    When(estatus='generado', then=Value(1)),
-                    When(estatus='en_espera', then=Value(2)),
-                    When(estatus='en_proceso', then=Value(3)),
-                    When(estatus='finalizado', then=Value(4)),
-                    When(estatus='cancelado', then=Value(5)),
-                    output_field=IntegerField(),
-                ),
-                '-fecha_creacion'
-            )
-        
-        # Aplicar filtros a tickets disponibles (SIN filtro de estatus)
-        tickets_disponibles_query = aplicar_filtros(tickets_disponibles_query, 'disponibles')
-        
-        # Paginación para tickets disponibles
-        paginator_disponibles = Paginator(tickets_disponibles_query, 10)
-        page_disponibles = request.GET.get('page_disponibles', 1)
-        tickets_disponibles = paginator_disponibles.get_page(page_disponibles)
-        
-        # Para admin: obtener todos los usuarios de sistemas
-        if usuario_actual.rol == 'admin':
-            usuarios_sistemas = Usuario.objects.filter(rol__in=['sistemas', 'admin'])
-            
-            # Sincronizar estatus de tickets asignados que aún están como 'generado'
-            tickets_desincronizados = Ticket.objects.filter(
-                asignado_a__isnull=False,
-                estatus='generado'
-            )
-            if tickets_desincronizados.exists():
-                tickets_desincronizados.update(estatus='en_proceso')
-            
-            # 🔧 MODIFICADO: Todos los tickets con filtros
-            todos_los_tickets_query = Ticket.objects.filter(
-                Q(asignado_a__isnull=False) |
-                Q(estatus__in=['en_proceso', 'en_espera'])
-            ).exclude(
-                estatus__in=['finalizado', 'cancelado']
-            ).order_by(
-                Case(
-                    When(estatus='en_espera', then=Value(1)),
-                    When(estatus='en_proceso', then=Value(2)),
-                    When(estatus='generado', then=Value(3)),
-                    output_field=IntegerField(),
-                ),
-                '-fecha_creacion'
+
+def _pestanas_del_usuario(usuario):
+    """Pestañas visibles según el rol"""
+    pestanas = ['creados']
+    if usuario.rol in ['sistemas', 'admin']:
+        pestanas += ['disponibles', 'asignados']
+    if usuario.rol == 'admin':
+        pestanas.append('todos')
+    return pestanas
+
+
+def _pestana_inicial(request, pestanas):
+    """La pestaña que se está paginando, si no la última que abrió el usuario (cookie de dashboard.js)"""
+    for pestana in pestanas:
+        if f'page_{pestana}' in request.GET or f'cursor_{pestana}' in request.GET:
+            return pestana
+    pestana = PESTANAS_POR_ID.get(request.COOKIES.get('dashboard_pestana'))
+    return pestana if pestana in pestanas else 'creados'
+
+
+def _fragmentos_dashboard(request, usuario_actual, pestanas, filtros):
+    """FragmentosDashboard con el HTML de `pestanas` listo: de caché o consultado y renderizado"""
+    hay_filtros = any(filtros.values())
+    
+    # HTML de cada pestaña desde caché; solo se consultan y renderizan las que cambiaron
+    fragmentos = FragmentosDashboard(request, usuario_actual, pestanas)
+    
+    faltantes = fragmentos.faltantes()
+    if faltantes:
+        # Totales desde las tablas de contadores (sin COUNT sobre tickets)
+        contadores = fragmentos.contadores()
+        # Todas las listas del dashboard se construyen en un solo lugar (ver consultas.py)
+        consultas = consultas_dashboard(usuario_actual, filtros)
+        contexto_pestanas = {
+            'es_admin': usuario_actual.rol == 'admin',
+            'es_sistemas': usuario_actual.rol == 'sistemas',
+            'opciones_estatus': Ticket.ESTATUS,
+            # Para admin: usuarios de sistemas en los selects de asignación
+            'usuarios_sistemas': Usuario.objects.filter(rol__in=['sistemas', 'admin']) if usuario_actual.rol == 'admin' else [],
+            # Tickets anteriores (no aplica para sistemas)
+            'tickets_anteriores': consultas.get('tickets_anteriores', []),
+        }
+        # La consistencia asignado_a/estatus la garantiza un trigger en la base de datos
+        # (migración 0022), así que este GET ya no escribe nada
+        for pestana in faltantes:
+            nombre = VARIABLES_PESTANA[pestana]
+            contexto = dict(contexto_pestanas)
+            contexto[nombre] = paginar_pestana(
+                request, consultas[nombre], pestana, hay_filtros, total_conocido=contadores[pestana]
             )
-            
-            # Aplicar filtros
-            todos_los_tickets_query = aplicar_filtros(todos_los_tickets_query)
+            fragmentos.guardar(pestana, contexto)
+    return fragmentos
+
+
+def dashboard(request):
+    if 'usuario_id' not in request.session:
+        messages.warning(request, 'Debes iniciar sesión primero')
+        return redirect('list_usuarios')
+    
+    # Obtener el usuario actual
+    usuario_actual = request.usuario_actual
     
-    # Paginación para todos los tickets
-    paginator_todos = Paginator(todos_los_tickets_query, 10)
-    page_todos = request.GET.get('page_todos', 1)
-    todos_los_tickets = paginator_todos.get_page(page_todos)
+    # 🆕 OBTENER PARÁMETROS DE FILTRO
+    filtros = _filtros_dashboard(request)
+    hay_filtros = any(filtros.values())
+    
+    # Solo se construye la pestaña inicial; dashboard.js pide las demás al abrirlas
+    pestanas = _pestanas_del_usuario(usuario_actual)
+    fragmentos = _fragmentos_dashboard(request, usuario_actual, [_pestana_inicial(request, pestanas)], filtros)
+    # Badges desde las tablas de contadores
+    contadores = fragmentos.contadores()
     
     # Pasar todos los datos de sesión al template
     categoria_display = None
@@ -290,31 +225,49 @@ def dashboard(request):
         'es_admin': usuario_actual.rol == 'admin',
         'es_sistemas': usuario_actual.rol == 'sistemas',
         'categoria_display': categoria_display,
-        'mis_tickets_creados': mis_tickets_creados,
-        'tickets_asignados': tickets_asignados,
-        'tickets_disponibles': tickets_disponibles,
-        'usuarios_sistemas': usuarios_sistemas,
-        'todos_los_tickets': todos_los_tickets,
-        'reportes_pendientes': reportes_pendientes,
-        'tickets_anteriores': tickets_anteriores,
+        'fragmentos': fragmentos.html(),
         'opciones_estatus': Ticket.ESTATUS,
         'opciones_urgencia': Ticket.NIVELES_URGENCIA,
-        'motivos_espera': MotivoEspera.objects.all(),
         'usuario_actual': usuario_actual,
         # 🆕 CONTEXTO DE FILTROS
         'filtros_activos': filtros,
-        'tiene_filtros': any(filtros.values()),
+        'tiene_filtros': hay_filtros,
+        'contadores': contadores,
     }
     return render(request, 'usuarios/dashboard.html', context)
+
+
+def dashboard_pestana(request, pestana):
+    """HTML de una sola pestaña del dashboard; dashboard.js lo pide al abrirla, paginar o filtrar"""
+    if 'usuario_id' not in request.session:
+        return JsonResponse({'success': False, 'error': 'Debes iniciar sesión primero'}, status=401)
+    
+    usuario_actual = request.usuario_actual
+    if pestana not in _pestanas_del_usuario(usuario_actual):
+        return JsonResponse({'success': False, 'error': 'Pestaña no disponible'}, status=404)
+    
+    fragmentos = _fragmentos_dashboard(request, usuario_actual, [pestana], _filtros_dashboard(request))
+    return HttpResponse(fragmentos.html()[pestana])
+
+def _imagenes_validas(request):
+    """
+    Las imágenes se validan mientras llegan (usuarios.subidas); las rechazadas no se guardan.
+    Muestra los motivos y devuelve False si hubo alguna, para no guardar el formulario a medias
+    """
+    errores = errores_subida(request)
+    for error in errores:
+        messages.error(request, error)
+    return not errores
+
 def crear_ticket(request):
     if 'usuario_id' not in request.session:
         messages.warning(request, 'Debes iniciar sesión primero')
         return redirect('list_usuarios')
     
     # Obtener el usuario actual
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
-    if request.method == 'POST':
+    if request.method == 'POST' and _imagenes_validas(request):
         titulo = request.POST.get('titulo')
         descripcion = request.POST.get('descripcion')
         observaciones = request.POST.get('observaciones', '')
@@ -324,62 +277,43 @@ def crear_ticket(request):
         
         if titulo and descripcion and categoria:
             try:
-                usuario = Usuario.objects.get(id=request.session['usuario_id'])
+                usuario = usuario_actual
                 
-                # Crear ticket sin asignación automática
-                ticket = Ticket.objects.create(
-                    titulo=titulo,
-                    descripcion=descripcion,
-                    observaciones=observaciones,
-                    categoria=categoria,
-                    nivel_urgencia=nivel_urgencia,
-                    usuario=usuario,
-                    asignado_a=None  # Sin asignación automática
-                )
+                # El ticket, sus imágenes y los avisos al equipo se guardan juntos
+                with transaction.atomic():
+                    # Crear ticket sin asignar; la autoasignación (si está activa) va al final
+                    ticket = Ticket.objects.create(
+                        titulo=titulo,
+                        descripcion=descripcion,
+                        observaciones=observaciones,
+                        categoria=categoria,
+                        nivel_urgencia=nivel_urgencia,
+                        usuario=usuario,
+                        asignado_a=None
+                    )
                 
-                # Procesar imágenes
-                imagenes = request.FILES.getlist('imagenes')
+                    # Procesar imágenes
+                    imagenes = request.FILES.getlist('imagenes')
                 
-                for i, imagen in enumerate(imagenes, 1):
-                    
-                    # Validar que sea una imagen
-                    if not imagen.content_type.startswith('image/'):
-                        messages.error(request, f'El archivo "{imagen.name}" no es una imagen válida. Solo se permiten archivos de imagen.')
-                        # Preparar contexto para mostrar error
-                        context = {
-                            'nombre_completo': request.session.get('usuario_nombre', 'Usuario'),
-                            'email': request.session.get('usuario_email', ''),
-                            'rol': usuario_actual.rol,
-                            'es_admin': usuario_actual.rol == 'admin',
-                            'es_sistemas': usuario_actual.rol == 'sistemas',
-                            'usuario_actual': usuario_actual,
-                        }
-                        return render(request, 'usuarios/crear_ticket.html', context)
-                    
-                    # Validar extensión
-                    extensiones_validas = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-                    nombre_archivo = imagen.name.lower()
-                    if not any(nombre_archivo.endswith(ext) for ext in extensiones_validas):
-                        messages.error(request, f'El archivo "{imagen.name}" no tiene una extensión válida. Solo se permiten: JPG, JPEG, PNG, GIF, BMP, WEBP.')
-                        # Preparar contexto para mostrar error
-                        context = {
-                            'nombre_completo': request.session.get('usuario_nombre', 'Usuario'),
-                            'email': request.session.get('usuario_email', ''),
-                            'rol': usuario_actual.rol,
-                            'es_admin': usuario_actual.rol == 'admin',
-                            'es_sistemas': usuario_actual.rol == 'sistemas',
-                            'usuario_actual': usuario_actual,
-                        }
-                        return render(request, 'usuarios/crear_ticket.html', context)
-                    
-                    # Crear la imagen
-                    imagen_ticket = ImagenTicket.objects.create(
-                        ticket=ticket,
-                        imagen=imagen,
-                        nombre_archivo=imagen.name
-                    )
+                    for imagen in imagenes:
+                        # Crear la imagen; sus versiones reducidas las genera el worker
+                        imagen_ticket = ImagenTicket.objects.create(
+                            ticket=ticket,
+                            imagen=imagen,
+                            nombre_archivo=imagen.name
+                        )
+                        encolar_versiones(imagen_ticket)
+                
+                    # Avisar al equipo de la categoría y a los admin (correo o resumen, según su preferencia)
+                    notificar_ticket_nuevo(ticket)
                 
-                messages.success(request, 'Ticket creado exitosamente. Ahora aparecerá en la lista de tickets disponibles para el equipo de sistemas correspondiente.')
+                    # settings.AUTOASIGNACION: elegir a alguien del equipo según su carga
+                    asignado = autoasignar(ticket)
+                
+                if asignado:
+                    messages.success(request, f'Ticket creado exitosamente y asignado a {asignado.nombre} {asignado.apellido}.')
+                else:
+                    messages.success(request, 'Ticket creado exitosamente. Ahora aparecerá en la lista de tickets disponibles para el equipo de sistemas correspondiente.')
                 
                 return redirect('dashboard')
             except Exception as e:
@@ -403,7 +337,7 @@ def aceptar_ticket(request, ticket_id):
     if 'usuario_id' not in request.session:
         return JsonResponse({'success': False, 'error': 'No autorizado'})
     
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     # Verificar que sea usuario de sistemas o admin
     if usuario_actual.rol not in ['sistemas', 'admin']:
@@ -413,7 +347,7 @@ def aceptar_ticket(request, ticket_id):
         ticket = get_object_or_404(Ticket, id=ticket_id)
         
         # Verificar que el ticket no esté ya asignado
-        if ticket.asignado_a is not None:
+        if ticket.asignado_a_id is not None:
             return JsonResponse({'success': False, 'error': 'El ticket ya está asignado'})
         
         # Verificar que el usuario de sistemas tenga la categoría correcta (no aplica para admin)
@@ -424,11 +358,11 @@ def aceptar_ticket(request, ticket_id):
         # if ticket.usuario == usuario_actual:
         #     return JsonResponse({'success': False, 'error': 'No puedes aceptar tu propio ticket'})
         
-        # Asignar el ticket al usuario actual
-        ticket.asignado_a = usuario_actual
-        ticket.estatus = 'en_proceso'
-        ticket.asignado_por_admin = False # Indica que fue aceptado por el usuario, no por un admin
-        ticket.save()
+        # Asignar el ticket al usuario actual solo si nadie lo tomó mientras tanto (un UPDATE condicional).
+        # asignado_por_admin=False indica que fue aceptado por el usuario, no por un admin
+        ganado, asignado = tomar_ticket(ticket, usuario_actual, por_admin=False)
+        if not ganado:
+            return _ticket_ya_tomado(asignado)
         
         return JsonResponse({'success': True, 'message': f'Ticket "{ticket.titulo}" aceptado exitosamente'})
     
@@ -440,14 +374,14 @@ def completar_ticket(request, ticket_id):
         return redirect('list_usuarios')
     
     ticket = get_object_or_404(Ticket, id=ticket_id)
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     # Verificar que el ticket esté asignado al usuario actual
     if ticket.asignado_a != usuario_actual:
         messages.error(request, 'No tienes permisos para completar este ticket')
         return redirect('dashboard')
     
-    if request.method == 'POST':
+    if request.method == 'POST' and _imagenes_validas(request):
         # CAMBIADO: El título del reporte será igual al título del ticket
         titulo = ticket.titulo  # Usar el título del ticket original
         reporte = request.POST.get('reporte')
@@ -457,62 +391,34 @@ def completar_ticket(request, ticket_id):
         # CAMBIADO: Solo validar reporte y descripción (título ya no es del form)
         if reporte and descripcion:
             try:
-                # Crear el reporte de finalización
-                reporte_finalizacion = ReporteFinalizacion.objects.create(
-                    ticket=ticket,
-                    titulo=titulo,  # Usar título del ticket
-                    reporte=reporte,
-                    descripcion=descripcion,
-                    observaciones=observaciones,
-                    creado_por=usuario_actual
-                )
-                
-                # Procesar imágenes del reporte
-                imagenes = request.FILES.getlist('imagenes')
-                for imagen in imagenes:
-                    # Validar que sea una imagen
-                    if not imagen.content_type.startswith('image/'):
-                        messages.error(request, f'El archivo "{imagen.name}" no es una imagen válida. Solo se permiten archivos de imagen.')
-                        # Preparar contexto para mostrar error
-                        context = {
-                            'ticket': ticket,
-                            'nombre_completo': request.session.get('usuario_nombre', 'Usuario'),
-                            'email': request.session.get('usuario_email', ''),
-                            'rol': usuario_actual.rol,
-                            'es_admin': usuario_actual.rol == 'admin',
-                            'es_sistemas': usuario_actual.rol == 'sistemas',
-                            'usuario_actual': usuario_actual,
-                        }
-                        return render(request, 'usuarios/completar_ticket.html', context)
-                    
-                    # Validar extensión
-                    extensiones_validas = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-                    nombre_archivo = imagen.name.lower()
-                    if not any(nombre_archivo.endswith(ext) for ext in extensiones_validas):
-                        messages.error(request, f'El archivo "{imagen.name}" no tiene una extensión válida. Solo se permiten: JPG, JPEG, PNG, GIF, BMP, WEBP.')
-                        # Preparar contexto para mostrar error
-                        context = {
-                            'ticket': ticket,
-                            'nombre_completo': request.session.get('usuario_nombre', 'Usuario'),
-                            'email': request.session.get('usuario_email', ''),
-                            'rol': usuario_actual.rol,
-                            'es_admin': usuario_actual.rol == 'admin',
-                            'es_sistemas': usuario_actual.rol == 'sistemas',
-                            'usuario_actual': usuario_actual,
-                        }
-                        return render(request, 'usuarios/completar_ticket.html', context)
-                    
-                    ImagenReporte.objects.create(
-                        reporte=reporte_finalizacion,
-                        imagen=imagen,
-                        nombre_archivo=imagen.name
+                # El reporte, el cambio de estatus y el correo se guardan juntos o no se guarda nada
+                with transaction.atomic():
+                    # Crear el reporte de finalización
+                    reporte_finalizacion = ReporteFinalizacion.objects.create(
+                        ticket=ticket,
+                        titulo=titulo,  # Usar título del ticket
+                        reporte=reporte,
+                        descripcion=descripcion,
+                        observaciones=observaciones,
+                        creado_por=usuario_actual
                     )
                 
-                # Cambiar el estatus del ticket a finalizado
-                ticket.estatus = 'finalizado'
-                ticket.save()
-                # Enviar correo al usuario que creó el ticket
-                enviar_correo_ticket_completado(ticket)
+                    # Procesar imágenes del reporte
+                    imagenes = request.FILES.getlist('imagenes')
+                    for imagen in imagenes:
+                        imagen_reporte = ImagenReporte.objects.create(
+                            reporte=reporte_finalizacion,
+                            imagen=imagen,
+                            nombre_archivo=imagen.name
+                        )
+                        encolar_versiones(imagen_reporte)
+                
+                    # Cambiar el estatus del ticket a finalizado
+                    ticket.estatus = 'finalizado'
+                    guardar_ticket(ticket, ['estatus', 'fecha_edicion'])
+                    # Correo al usuario que creó el ticket: queda en la bandeja de salida y lo
+                    # manda el worker (manage.py enviar_correos), sin esperar al servidor de correo
+                    encolar_correo_ticket_completado(ticket)
                 
                 messages.success(request, 'Ticket completado exitosamente')
                 return redirect('dashboard')
@@ -541,7 +447,7 @@ def editar_ticket(request, ticket_id):
         return redirect('list_usuarios')
     
     ticket = get_object_or_404(Ticket, id=ticket_id)
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     
     # Verificar que el usuario actual sea el creador del ticket
@@ -554,7 +460,7 @@ def editar_ticket(request, ticket_id):
         messages.error(request, 'Solo se pueden editar tickets en estatus "Generado"')
         return redirect('dashboard')
     
-    if request.method == 'POST':
+    if request.method == 'POST' and _imagenes_validas(request):
         # Actualizar todos los campos
         ticket.titulo = request.POST.get('titulo')
         ticket.descripcion = request.POST.get('descripcion')
@@ -563,7 +469,9 @@ def editar_ticket(request, ticket_id):
         ticket.nivel_urgencia = int(request.POST.get('nivel_urgencia'))
         
         try:
-            ticket.save()
+            # Solo los campos del formulario: un save() completo regresaría la asignación leída
+            # arriba y desharía a quien tomó el ticket mientras tanto (ver guardar_ticket)
+            guardar_ticket(ticket, ['titulo', 'descripcion', 'observaciones', 'categoria', 'nivel_urgencia', 'fecha_edicion'])
             
             # Manejar eliminación de imágenes existentes
             imagenes_eliminar = request.POST.get('imagenes_eliminar', '')
@@ -571,56 +479,20 @@ def editar_ticket(request, ticket_id):
             if imagenes_eliminar:
                 ids_eliminar = [int(id_img) for id_img in imagenes_eliminar.split(',') if id_img.strip()]
                 
-                imagenes_a_eliminar = ImagenTicket.objects.filter(id__in=ids_eliminar, ticket=ticket)
-                
-                for img_eliminar in imagenes_a_eliminar:
-                    # Eliminar archivo físico
-                    if img_eliminar.imagen and os.path.exists(img_eliminar.imagen.path):
-                        os.remove(img_eliminar.imagen.path)
-                imagenes_a_eliminar.delete()
+                # Los archivos (original y versiones) los libera la señal post_delete; un
+                # archivo compartido con otra imagen se conserva
+                ImagenTicket.objects.filter(id__in=ids_eliminar, ticket=ticket).delete()
             
             # Procesar nuevas imágenes
             imagenes = request.FILES.getlist('imagenes')
             
-            for i, imagen in enumerate(imagenes, 1):
-                
-                # Validar que sea una imagen
-                if not imagen.content_type.startswith('image/'):
-                    messages.error(request, f'El archivo "{imagen.name}" no es una imagen válida. Solo se permiten archivos de imagen.')
-                    # Preparar contexto para mostrar error
-                    context = {
-                        'ticket': ticket,
-                        'nombre_completo': request.session.get('usuario_nombre', 'Usuario'),
-                        'email': request.session.get('usuario_email', ''),
-                        'rol': usuario_actual.rol,
-                        'es_admin': usuario_actual.rol == 'admin',
-                        'es_sistemas': usuario_actual.rol == 'sistemas',
-                        'usuario_actual': usuario_actual,
-                    }
-                    return render(request, 'usuarios/editar_ticket.html', context)
-                
-                # Validar extensión
-                extensiones_validas = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-                nombre_archivo = imagen.name.lower()
-                if not any(nombre_archivo.endswith(ext) for ext in extensiones_validas):
-                    messages.error(request, f'El archivo "{imagen.name}" no tiene una extensión válida. Solo se permiten: JPG, JPEG, PNG, GIF, BMP, WEBP.')
-                    # Preparar contexto para mostrar error
-                    context = {
-                        'ticket': ticket,
-                        'nombre_completo': request.session.get('usuario_nombre', 'Usuario'),
-                        'email': request.session.get('usuario_email', ''),
-                        'rol': usuario_actual.rol,
-                        'es_admin': usuario_actual.rol == 'admin',
-                        'es_sistemas': usuario_actual.rol == 'sistemas',
-                        'usuario_actual': usuario_actual,
-                    }
-                    return render(request, 'usuarios/editar_ticket.html', context)
-                
+            for imagen in imagenes:
                 nueva_imagen = ImagenTicket.objects.create(
                     ticket=ticket,
                     imagen=imagen,
                     nombre_archivo=imagen.name
                 )
+                encolar_versiones(nueva_imagen)
             
             messages.success(request, 'Ticket actualizado exitosamente')
             return redirect('dashboard')
@@ -640,12 +512,33 @@ def editar_ticket(request, ticket_id):
     
     return render(request, 'usuarios/editar_ticket.html', context)
 
+def siguiente_ticket(request):
+    """'Dame el siguiente': asigna al usuario el ticket más urgente y más antiguo de su cola"""
+    if 'usuario_id' not in request.session:
+        return JsonResponse({'success': False, 'error': 'No autorizado'})
+    
+    usuario_actual = request.usuario_actual
+    if usuario_actual.rol not in ['sistemas', 'admin']:
+        return JsonResponse({'success': False, 'error': 'Sin permisos'})
+    
+    if request.method == 'POST':
+        ticket = tomar_siguiente(usuario_actual)
+        if ticket is None:
+            return JsonResponse({'success': False, 'error': 'No hay tickets disponibles por ahora'})
+        return JsonResponse({
+            'success': True,
+            'message': f'Te tocó el ticket "{ticket.titulo}"',
+            'url': reverse('visualizar_ticket', args=[ticket.id]),
+        })
+    
+    return JsonResponse({'success': False, 'error': 'Método no permitido'})
+
 def cambiar_estatus(request, ticket_id):
     if 'usuario_id' not in request.session:
         return JsonResponse({'success': False, 'error': 'No autorizado'})
     
     # Verificar que sea admin
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     if usuario_actual.rol != 'admin':
         return JsonResponse({'success': False, 'error': 'Sin permisos'})
     
@@ -655,12 +548,12 @@ def cambiar_estatus(request, ticket_id):
         
         # No permitir cambiar a finalizado si no hay reporte
         if nuevo_estatus == 'finalizado':
-            if not hasattr(ticket, 'reporte_finalizacion'):
+            if not ReporteFinalizacion.objects.filter(ticket_id=ticket.id).exists():
                 return JsonResponse({'success': False, 'error': 'No se puede marcar como finalizado sin reporte del encargado'})
         
         if nuevo_estatus in dict(Ticket.ESTATUS).keys():
             ticket.estatus = nuevo_estatus
-            ticket.save()
+            guardar_ticket(ticket, ['estatus', 'fecha_edicion'])
             return JsonResponse({'success': True})
     
     return JsonResponse({'success': False, 'error': 'Datos inválidos'})
@@ -670,18 +563,21 @@ def cambiar_urgencia(request, ticket_id):
         return JsonResponse({'success': False, 'error': 'No autorizado'})
     
     # Verificar que sea admin
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     if usuario_actual.rol != 'admin':
         return JsonResponse({'success': False, 'error': 'Sin permisos'})
     
     if request.method == 'POST':
+        try:
+            nueva_urgencia = int(request.POST.get('urgencia'))
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Falta la urgencia o no es un número'}, status=400)
         ticket = get_object_or_404(Ticket, id=ticket_id)
-        nueva_urgencia = request.POST.get('urgencia')
         
-        if int(nueva_urgencia) in dict(Ticket.NIVELES_URGENCIA).keys():
+        if nueva_urgencia in dict(Ticket.NIVELES_URGENCIA).keys():
             urgencia_anterior = ticket.get_nivel_urgencia_display()
-            ticket.nivel_urgencia = int(nueva_urgencia) 
-            ticket.save()
+            ticket.nivel_urgencia = nueva_urgencia
+            guardar_ticket(ticket, ['nivel_urgencia', 'fecha_edicion'])
             
             urgencia_nueva = ticket.get_nivel_urgencia_display()
             
@@ -697,7 +593,7 @@ def eliminar_ticket(request, ticket_id):
         return JsonResponse({'success': False, 'error': 'No autorizado'})
     
     # Verificar que sea admin
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     if usuario_actual.rol != 'admin':
         return JsonResponse({'success': False, 'error': 'Sin permisos'})
     
@@ -715,7 +611,7 @@ def admin_usuarios(request):
         return redirect('list_usuarios')
     
     # Verificar que sea admin
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     if usuario_actual.rol != 'admin':
         messages.error(request, 'No tienes permisos para acceder a esta página')
         return redirect('dashboard')
@@ -811,7 +707,7 @@ def rechazar_usuario(request, usuario_id):
         return redirect('list_usuarios')
     
     # Verificar que sea admin
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     if usuario_actual.rol != 'admin':
         messages.error(request, 'No tienes permisos para realizar esta acción')
         return redirect('dashboard')
@@ -847,7 +743,7 @@ def editar_usuario(request, usuario_id):
         return redirect('list_usuarios')
     
     # Verificar que sea admin
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     if usuario_actual.rol != 'admin':
         messages.error(request, 'No tienes permisos para realizar esta acción')
         return redirect('dashboard')
@@ -888,7 +784,7 @@ def eliminar_usuario(request, usuario_id):
         return redirect('list_usuarios')
     
     # Verificar que sea admin
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     if usuario_actual.rol != 'admin':
         messages.error(request, 'No tienes permisos para realizar esta acción')
         return redirect('dashboard')
@@ -925,7 +821,7 @@ def ver_reporte(request, ticket_id):
         return redirect('list_usuarios')
     
     ticket = get_object_or_404(Ticket, id=ticket_id)
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     # Verificar que el usuario actual sea el creador del ticket
     if ticket.usuario != usuario_actual:
@@ -960,7 +856,7 @@ def asignar_ticket(request, ticket_id):
     if 'usuario_id' not in request.session:
         return JsonResponse({'success': False, 'error': 'No autorizado'})
     
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     # Verificar que sea admin
     if usuario_actual.rol != 'admin':
@@ -971,7 +867,7 @@ def asignar_ticket(request, ticket_id):
         usuario_sistemas_id = request.POST.get('usuario_sistemas_id')
         
         # Verificar que el ticket no esté ya asignado
-        if ticket.asignado_a is not None:
+        if ticket.asignado_a_id is not None:
             return JsonResponse({'success': False, 'error': 'El ticket ya está asignado'})
         
         # Obtener el usuario de sistemas
@@ -984,11 +880,10 @@ def asignar_ticket(request, ticket_id):
         if ticket.categoria != usuario_sistemas.categoria_sistemas:
             return JsonResponse({'success': False, 'error': 'El usuario no pertenece al departamento correcto'})
         
-        # Asignar el ticket
-        ticket.asignado_a = usuario_sistemas
-        ticket.estatus = 'en_proceso'
-        ticket.asignado_por_admin = True  # Indica que fue asignado por un admin
-        ticket.save()
+        # Asignar el ticket si sigue libre (asignado_por_admin=True: lo asignó un admin)
+        ganado, asignado = tomar_ticket(ticket, usuario_sistemas, por_admin=True)
+        if not ganado:
+            return _ticket_ya_tomado(asignado)
         
         return JsonResponse({'success': True, 'message': f'Ticket asignado a {usuario_sistemas.nombre} {usuario_sistemas.apellido}'})
     
@@ -999,7 +894,7 @@ def cancelar_ticket(request, ticket_id):
         return redirect('list_usuarios')
     
     ticket = get_object_or_404(Ticket, id=ticket_id)
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     # Si el ticket ya está cancelado, mostrar información de cancelación
     if ticket.estatus == 'cancelado':
@@ -1051,7 +946,7 @@ def cancelar_ticket(request, ticket_id):
                 
                 # Cambiar el estatus del ticket a cancelado
                 ticket.estatus = 'cancelado'
-                ticket.save()
+                guardar_ticket(ticket, ['estatus', 'fecha_edicion'])
                 
                 messages.success(request, 'Ticket cancelado exitosamente')
                 return redirect('dashboard')
@@ -1076,7 +971,7 @@ def reasignar_ticket(request, ticket_id):
     if 'usuario_id' not in request.session:
         return JsonResponse({'success': False, 'error': 'No autorizado'})
     
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     # Verificar que sea admin
     if usuario_actual.rol != 'admin':
@@ -1092,9 +987,9 @@ def reasignar_ticket(request, ticket_id):
         
         # Si se selecciona "sin asignar"
         if nuevo_usuario_sistemas_id == '':
-            ticket.asignado_a = None
-            ticket.estatus = 'generado'
-            ticket.save()
+            ganado, asignado = asignacion.reasignar_ticket(ticket, None)
+            if not ganado:
+                return _ticket_cambiado(asignado)
             return JsonResponse({'success': True, 'message': f'Ticket "{ticket.titulo}" desasignado exitosamente'})
         
         # Obtener el nuevo usuario de sistemas
@@ -1108,11 +1003,10 @@ def reasignar_ticket(request, ticket_id):
         if nuevo_usuario_sistemas.rol == 'sistemas' and ticket.categoria != nuevo_usuario_sistemas.categoria_sistemas:
             return JsonResponse({'success': False, 'error': 'El usuario no pertenece al departamento correcto'})
         
-        # Reasignar el ticket
-        ticket.asignado_a = nuevo_usuario_sistemas
-        if ticket.estatus == 'generado':
-            ticket.estatus = 'en_proceso'
-        ticket.save()
+        # Reasignar el ticket si nadie lo cambió desde que se leyó
+        ganado, asignado = asignacion.reasignar_ticket(ticket, nuevo_usuario_sistemas)
+        if not ganado:
+            return _ticket_cambiado(asignado)
         
         return JsonResponse({'success': True, 'message': f'Ticket reasignado a {nuevo_usuario_sistemas.nombre} {nuevo_usuario_sistemas.apellido}'})
     
@@ -1124,7 +1018,7 @@ def poner_en_espera(request, ticket_id):
         return redirect('list_usuarios')
     
     ticket = get_object_or_404(Ticket, id=ticket_id)
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     # Si el ticket ya está en espera y tiene motivo, mostrar el motivo (solo lectura)
     if ticket.estatus == 'en_espera' and hasattr(ticket, 'motivo_espera'):
@@ -1175,7 +1069,7 @@ def poner_en_espera(request, ticket_id):
                 
                 # Cambiar el estatus del ticket a en espera
                 ticket.estatus = 'en_espera'
-                ticket.save()
+                guardar_ticket(ticket, ['estatus', 'fecha_edicion'])
                 
                 messages.success(request, f'Ticket "{ticket.titulo}" puesto en espera exitosamente')
                 return redirect('dashboard')
@@ -1197,56 +1091,17 @@ def poner_en_espera(request, ticket_id):
     
     return render(request, 'usuarios/espera_ticket.html', context)
 
-def enviar_correo_ticket_completado(ticket):
-    """Envía correo cuando un ticket es completado"""
-    try:
-        # Convertir fecha a zona horaria de México
-        zona_mexico = pytz.timezone('America/Mexico_City')
-        fecha_mexico = ticket.fecha_edicion.astimezone(zona_mexico)
-        
-        asunto = f'Ticket Completado: {ticket.titulo}'
-        mensaje = f'''
-            Hola {ticket.usuario.nombre},
-
-            Tu ticket ha sido completado:
-
-            Título: {ticket.titulo}
-            Descripción: {ticket.descripcion}
-            Fecha de completado: {fecha_mexico.strftime('%d/%m/%Y %H:%M')}
-
-            Puedes revisar el reporte de completado ingresando al sistema.
-
-            Saludos,
-            Sistema de Tickets
-        '''
-        
-        send_mail(
-            asunto,
-            mensaje,
-            settings.DEFAULT_FROM_EMAIL,
-            [ticket.usuario.email],
-            fail_silently=True,
-        )
-    except Exception as e:
-         pass
-
 def visualizar_ticket(request, ticket_id):
     if 'usuario_id' not in request.session:
         messages.warning(request, 'Debes iniciar sesión primero')
         return redirect('list_usuarios')
     
     ticket = get_object_or_404(Ticket, id=ticket_id)
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     
     # Verificar permisos para visualizar el ticket
     # El creador, el asignado, y los admin/sistemas pueden ver cualquier ticket
-    puede_ver = (
-        ticket.usuario == usuario_actual or  # Es el creador
-        ticket.asignado_a == usuario_actual or  # Está asignado a él
-        usuario_actual.rol in ['admin', 'sistemas']  # Es admin o sistemas
-    )
-    
-    if not puede_ver:
+    if not ticket.puede_verlo(usuario_actual):
         messages.error(request, 'No tienes permisos para visualizar este ticket')
         return redirect('dashboard')
     
@@ -1263,13 +1118,31 @@ def visualizar_ticket(request, ticket_id):
     
     return render(request, 'usuarios/visualizar_ticket.html', context)
 
+def descargar_adjuntos(request, ticket_id):
+    """ZIP con las imágenes del ticket y de su reporte, armado mientras se descarga"""
+    if 'usuario_id' not in request.session:
+        messages.warning(request, 'Debes iniciar sesión primero')
+        return redirect('list_usuarios')
+
+    ticket = get_object_or_404(Ticket, id=ticket_id)
+    if not ticket.puede_verlo(request.usuario_actual):
+        messages.error(request, 'No tienes permisos para visualizar este ticket')
+        return redirect('dashboard')
+
+    respuesta = StreamingHttpResponse(zip_adjuntos(adjuntos_ticket(ticket)), content_type='application/zip')
+    respuesta['Content-Disposition'] = f'attachment; filename="ticket-{ticket.id}-imagenes.zip"'
+    # El contenido se arma al vuelo: que ningún proxy lo guarde ni lo retenga completo
+    respuesta['Cache-Control'] = 'private, no-store'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
 def aceptar_usuario(request, usuario_id):
     if 'usuario_id' not in request.session:
         messages.warning(request, 'Debes iniciar sesión primero')
         return redirect('list_usuarios')
     
     # Verificar que sea admin
-    usuario_actual = Usuario.objects.get(id=request.session['usuario_id'])
+    usuario_actual = request.usuario_actual
     if usuario_actual.rol != 'admin':
         messages.error(request, 'No tienes permisos para realizar esta acción')
         return redirect('dashboard')
@@ -1287,20 +1160,10 @@ def subir_foto_perfil(request):
     if 'usuario_id' not in request.session:
         return redirect('list_usuarios')
     
-    if request.method == 'POST' and request.FILES.get('foto_perfil'):
+    if request.method == 'POST' and _imagenes_validas(request) and request.FILES.get('foto_perfil'):
         try:
-            usuario = Usuario.objects.get(id=request.session['usuario_id'])
-            
-            if usuario.foto_perfil:
-                usuario.foto_perfil.delete()
-            
-            usuario.foto_perfil = request.FILES['foto_perfil']
-            usuario.save()
-            
-            # Limpiar caché
-            from django.core.cache import cache
-            cache.clear()
-            
+            # Solo se invalida la caché de este usuario; las URLs de la foto cambian con su contenido
+            cambiar_foto_perfil(request.usuario_actual, request.FILES['foto_perfil'])
             messages.success(request, 'Foto de perfil actualizada correctamente')
         except Exception as e:
             messages.error(request, f'Error al subir la foto: {str(e)}')
@@ -1312,15 +1175,9 @@ def eliminar_foto_perfil(request):
         return redirect('list_usuarios')
     
     try:
-        usuario = Usuario.objects.get(id=request.session['usuario_id'])
+        usuario = request.usuario_actual
         if usuario.foto_perfil:
-            usuario.foto_perfil.delete()
-            usuario.save()
-            
-            # Limpiar caché
-            from django.core.cache import cache
-            cache.clear()
-            
+            cambiar_foto_perfil(usuario, None)
             messages.success(request, 'Foto de perfil eliminada correctamente')
         else:
             messages.info(request, 'No tienes foto de perfil para eliminar')
@@ -1329,8 +1186,68 @@ def eliminar_foto_perfil(request):
     
     return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
 
+def cambiar_notificaciones(request):
+    if 'usuario_id' not in request.session:
+        return redirect('list_usuarios')
+
+    preferencia = request.POST.get('notificaciones')
+    if request.method == 'POST' and preferencia in dict(Usuario.NOTIFICACIONES):
+        usuario = request.usuario_actual
+        usuario.notificaciones = preferencia
+        usuario.save(update_fields=['notificaciones'])
+        messages.success(request, f'Notificaciones: {usuario.get_notificaciones_display()}')
+
+    return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
+
 def logout_view(request):
     usuario_nombre = request.session.get('usuario_nombre', 'Usuario')
     request.session.flush()
     messages.info(request, f'Hasta pronto, {usuario_nombre.split()[0]}')
     return redirect('list_usuarios')
+
+
+@require_safe
+async def eventos_tickets(request):
+    """
+    Canal Server-Sent Events con los tickets creados, asignados o con cambio de estatus o
+    urgencia que el usuario puede ver. Solo bajo ASGI: con WSGI cada conexión ocuparía un hilo
+    del servidor, así que se responde 204 y el navegador deja de reconectar.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    if request.usuario_actual is None:
+        return HttpResponse(status=403)
+
+    latido = getattr(settings, 'LATIDO_EVENTOS', LATIDO_EVENTOS_DEFAULT)
+    suscripcion = difusor().suscribir(request.usuario_actual)
+
+    async def flujo():
+        try:
+            # Si se corta, el navegador reconecta solo tras 10 s
+            yield 'retry: 10000\n\n'
+            while True:
+                try:
+                    evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=latido)
+                except asyncio.TimeoutError:
+                    yield ': latido\n\n'
+                    continue
+                yield formato_sse(evento)
+        finally:
+            # También al cerrar el cliente la conexión (el servidor cancela el generador)
+            difusor().cancelar(suscripcion)
+
+    respuesta = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+@require_safe
+def servir_media(request, nombre):
+    """
+    Archivos de MEDIA_ROOT con control de acceso (las mismas reglas que visualizar_ticket).
+    Sin permiso se responde 404 para no revelar qué archivos existen.
+    """
+    if request.usuario_actual is None or not puede_ver_archivo(request.usuario_actual, nombre):
+        raise Http404('Archivo no encontrado')
+    return respuesta_archivo(request, nombre)
@@ -0,0 +1,234 @@
+"""
+Variantes async de las acciones JSON del dashboard, para el despliegue ASGI.
+
+Hacen lo mismo que sus pares de views.py con el ORM async: bajo ASGI no ocupan un hilo
+mientras esperan a la base de datos. Bajo WSGI cada una pasaría por async_to_sync (un event
+loop y un salto de hilo por consulta), así que prueba1/urls.py solo las usa con
+settings.VISTAS_ASYNC, que activa prueba1/asgi.py; con WSGI se sirven las de views.py.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.urls import reverse
+
+from .asignacion import aguardar_ticket, areasignar_ticket, atomar_ticket, tomar_siguiente
+from .models import ReporteFinalizacion, Ticket, Usuario
+from .views import _ticket_cambiado, _ticket_ya_tomado
+
+
+async def aceptar_ticket(request, ticket_id):
+    if await request.session.aget('usuario_id') is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'})
+    
+    usuario_actual = request.usuario_actual
+    
+    # Verificar que sea usuario de sistemas o admin
+    if usuario_actual.rol not in ['sistemas', 'admin']:
+        return JsonResponse({'success': False, 'error': 'Sin permisos'})
+    
+    if request.method == 'POST':
+        ticket = await aget_object_or_404(Ticket, id=ticket_id)
+        
+        # Verificar que el ticket no esté ya asignado
+        if ticket.asignado_a_id is not None:
+            return JsonResponse({'success': False, 'error': 'El ticket ya está asignado'})
+        
+        # Verificar que el usuario de sistemas tenga la categoría correcta (no aplica para admin)
+        if usuario_actual.rol == 'sistemas' and ticket.categoria != usuario_actual.categoria_sistemas:
+            return JsonResponse({'success': False, 'error': 'No tienes permisos para este tipo de ticket'})
+        
+        # Verificar que no sea su propio ticket (opcional - comenta estas líneas si quieres permitirlo)
+        # if ticket.usuario == usuario_actual:
+        #     return JsonResponse({'success': False, 'error': 'No puedes aceptar tu propio ticket'})
+        
+        # Asignar el ticket al usuario actual solo si nadie lo tomó mientras tanto (un UPDATE condicional).
+        # asignado_por_admin=False indica que fue aceptado por el usuario, no por un admin
+        ganado, asignado = await atomar_ticket(ticket, usuario_actual, por_admin=False)
+        if not ganado:
+            return _ticket_ya_tomado(asignado)
+        
+        return JsonResponse({'success': True, 'message': f'Ticket "{ticket.titulo}" aceptado exitosamente'})
+    
+    return JsonResponse({'success': False, 'error': 'Método no permitido'})
+
+
+async def siguiente_ticket(request):
+    """'Dame el siguiente': asigna al usuario el ticket más urgente y más antiguo de su cola"""
+    if await request.session.aget('usuario_id') is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'})
+    
+    usuario_actual = request.usuario_actual
+    if usuario_actual.rol not in ['sistemas', 'admin']:
+        return JsonResponse({'success': False, 'error': 'Sin permisos'})
+    
+    if request.method == 'POST':
+        # select_for_update necesita una transacción, que no existe en el ORM async
+        ticket = await sync_to_async(tomar_siguiente)(usuario_actual)
+        if ticket is None:
+            return JsonResponse({'success': False, 'error': 'No hay tickets disponibles por ahora'})
+        return JsonResponse({
+            'success': True,
+            'message': f'Te tocó el ticket "{ticket.titulo}"',
+            'url': reverse('visualizar_ticket', args=[ticket.id]),
+        })
+    
+    return JsonResponse({'success': False, 'error': 'Método no permitido'})
+
+
+async def cambiar_estatus(request, ticket_id):
+    if await request.session.aget('usuario_id') is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'})
+    
+    # Verificar que sea admin
+    usuario_actual = request.usuario_actual
+    if usuario_actual.rol != 'admin':
+        return JsonResponse({'success': False, 'error': 'Sin permisos'})
+    
+    if request.method == 'POST':
+        ticket = await aget_object_or_404(Ticket, id=ticket_id)
+        nuevo_estatus = request.POST.get('estatus')
+        
+        # No permitir cambiar a finalizado si no hay reporte
+        if nuevo_estatus == 'finalizado':
+            if not await ReporteFinalizacion.objects.filter(ticket_id=ticket.id).aexists():
+                return JsonResponse({'success': False, 'error': 'No se puede marcar como finalizado sin reporte del encargado'})
+        
+        if nuevo_estatus in dict(Ticket.ESTATUS).keys():
+            ticket.estatus = nuevo_estatus
+            await aguardar_ticket(ticket, ['estatus', 'fecha_edicion'])
+            return JsonResponse({'success': True})
+    
+    return JsonResponse({'success': False, 'error': 'Datos inválidos'})
+
+
+async def cambiar_urgencia(request, ticket_id):
+    if await request.session.aget('usuario_id') is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'})
+    
+    # Verificar que sea admin
+    usuario_actual = request.usuario_actual
+    if usuario_actual.rol != 'admin':
+        return JsonResponse({'success': False, 'error': 'Sin permisos'})
+    
+    if request.method == 'POST':
+        try:
+            nueva_urgencia = int(request.POST.get('urgencia'))
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Falta la urgencia o no es un número'}, status=400)
+        ticket = await aget_object_or_404(Ticket, id=ticket_id)
+        
+        if nueva_urgencia in dict(Ticket.NIVELES_URGENCIA).keys():
+            urgencia_anterior = ticket.get_nivel_urgencia_display()
+            ticket.nivel_urgencia = nueva_urgencia
+            await aguardar_ticket(ticket, ['nivel_urgencia', 'fecha_edicion'])
+            
+            urgencia_nueva = ticket.get_nivel_urgencia_display()
+            
+            return JsonResponse({
+                'success': True, 
+                'message': f'Urgencia cambiada de "{urgencia_anterior}" a "{urgencia_nueva}"'
+            })
+    
+    return JsonResponse({'success': False, 'error': 'Datos inválidos'})
+
+
+async def eliminar_ticket(request, ticket_id):
+    if await request.session.aget('usuario_id') is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'})
+    
+    # Verificar que sea admin
+    usuario_actual = request.usuario_actual
+    if usuario_actual.rol != 'admin':
+        return JsonResponse({'success': False, 'error': 'Sin permisos'})
+    
+    if request.method == 'POST':
+        ticket = await aget_object_or_404(Ticket, id=ticket_id)
+        titulo_eliminado = ticket.titulo
+        await ticket.adelete()
+        return JsonResponse({'success': True, 'message': f'Ticket "{titulo_eliminado}" eliminado exitosamente'})
+    
+    return JsonResponse({'success': False, 'error': 'Método no permitido'})
+
+
+async def asignar_ticket(request, ticket_id):
+    if await request.session.aget('usuario_id') is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'})
+    
+    usuario_actual = request.usuario_actual
+    
+    # Verificar que sea admin
+    if usuario_actual.rol != 'admin':
+        return JsonResponse({'success': False, 'error': 'Sin permisos'})
+    
+    if request.method == 'POST':
+        ticket = await aget_object_or_404(Ticket, id=ticket_id)
+        usuario_sistemas_id = request.POST.get('usuario_sistemas_id')
+        
+        # Verificar que el ticket no esté ya asignado
+        if ticket.asignado_a_id is not None:
+            return JsonResponse({'success': False, 'error': 'El ticket ya está asignado'})
+        
+        # Obtener el usuario de sistemas
+        try:
+            usuario_sistemas = await Usuario.objects.aget(id=usuario_sistemas_id, rol='sistemas')
+        except Usuario.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Usuario de sistemas no encontrado'})
+        
+        # Verificar que el usuario de sistemas tenga la categoría correcta
+        if ticket.categoria != usuario_sistemas.categoria_sistemas:
+            return JsonResponse({'success': False, 'error': 'El usuario no pertenece al departamento correcto'})
+        
+        # Asignar el ticket si sigue libre (asignado_por_admin=True: lo asignó un admin)
+        ganado, asignado = await atomar_ticket(ticket, usuario_sistemas, por_admin=True)
+        if not ganado:
+            return _ticket_ya_tomado(asignado)
+        
+        return JsonResponse({'success': True, 'message': f'Ticket asignado a {usuario_sistemas.nombre} {usuario_sistemas.apellido}'})
+    
+    return JsonResponse({'success': False, 'error': 'Método no permitido'})
+
+
+async def reasignar_ticket(request, ticket_id):
+    if await request.session.aget('usuario_id') is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'})
+    
+    usuario_actual = request.usuario_actual
+    
+    # Verificar que sea admin
+    if usuario_actual.rol != 'admin':
+        return JsonResponse({'success': False, 'error': 'Sin permisos'})
+    
+    if request.method == 'POST':
+        ticket = await aget_object_or_404(Ticket, id=ticket_id)
+        nuevo_usuario_sistemas_id = request.POST.get('nuevo_usuario_sistemas_id')
+        
+        # Verificar que el ticket no esté finalizado o cancelado
+        if ticket.estatus in ['finalizado', 'cancelado']:
+            return JsonResponse({'success': False, 'error': 'No se puede reasignar un ticket finalizado o cancelado'})
+        
+        # Si se selecciona "sin asignar"
+        if nuevo_usuario_sistemas_id == '':
+            ganado, asignado = await areasignar_ticket(ticket, None)
+            if not ganado:
+                return _ticket_cambiado(asignado)
+            return JsonResponse({'success': True, 'message': f'Ticket "{ticket.titulo}" desasignado exitosamente'})
+        
+        # Obtener el nuevo usuario de sistemas
+        try:
+            nuevo_usuario_sistemas = await Usuario.objects.aget(id=nuevo_usuario_sistemas_id, rol__in=['sistemas', 'admin'])
+        except Usuario.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Usuario de sistemas no encontrado'})
+        
+        # Verificar que el usuario de sistemas tenga la categoría correcta
+       # Los admin pueden asignarse cualquier ticket, los de sistemas deben coincidir la categoría
+        if nuevo_usuario_sistemas.rol == 'sistemas' and ticket.categoria != nuevo_usuario_sistemas.categoria_sistemas:
+            return JsonResponse({'success': False, 'error': 'El usuario no pertenece al departamento correcto'})
+        
+        # Reasignar el ticket si nadie lo cambió desde que se leyó
+        ganado, asignado = await areasignar_ticket(ticket, nuevo_usuario_sistemas)
+        if not ganado:
+            return _ticket_cambiado(asignado)
+        
+        return JsonResponse({'success': True, 'message': f'Ticket reasignado a {nuevo_usuario_sistemas.nombre} {nuevo_usuario_sistemas.apellido}'})
+    
+    return JsonResponse({'success': False, 'error': 'Método no permitido'})